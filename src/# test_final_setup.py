@@ -2,8 +2,8 @@
 import os
 from dotenv import load_dotenv
 from colorama import init, Fore
-from azure.cosmos import CosmosClient
-from gremlin_python.driver import client, serializer
+from client_registry import CLIENTS
+from gremlin_streaming import stream_results
 
 # Initialize colorama
 init()
@@ -15,10 +15,7 @@ def test_final_setup():
         
         # Test NoSQL Connection
         print(f"\n{Fore.YELLOW}Testing NoSQL API:{Fore.RESET}")
-        cosmos_client = CosmosClient(
-            url=os.getenv("COSMOS_ENDPOINT"),
-            credential=str(os.getenv("COSMOS_KEY"))
-        )
+        cosmos_client = CLIENTS.cosmos(credential=str(os.getenv("COSMOS_KEY")))
         database = cosmos_client.get_database_client("DualApiDB")
         container = database.get_container_client("DualApiContainer")
         
@@ -34,12 +31,9 @@ def test_final_setup():
         
         # Test Gremlin Connection
         print(f"\n{Fore.YELLOW}Testing Gremlin API:{Fore.RESET}")
-        gremlin_client = client.Client(
-            os.getenv("GREMLIN_ENDPOINT"),
-            'g',
-            username=f"/dbs/DualApiDB/colls/DualApiContainer",
-            password=os.getenv("GREMLIN_PRIMARY_KEY"),
-            message_serializer=serializer.GraphSONSerializersV2d0()
+        gremlin_client = CLIENTS.gremlin(
+            database="DualApiDB", collection="DualApiContainer",
+            password=os.getenv("GREMLIN_PRIMARY_KEY")
         )
         
         # Test Gremlin queries
@@ -50,10 +44,9 @@ def test_final_setup():
         }
         
         for name, query in queries.items():
-            result = gremlin_client.submit(query).all().result()
+            result = list(stream_results(gremlin_client, query))
             print(f"{Fore.GREEN}✓ {name}: {result}{Fore.RESET}")
         
-        gremlin_client.close()
         print(f"\n{Fore.GREEN}Final setup verified successfully{Fore.RESET}")
         
     except Exception as e:
@@ -6,19 +6,16 @@ import os
 import time
 from typing import Dict, List, Optional
 from openai import AzureOpenAI
-from azure.cosmos import CosmosClient
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field
+from client_registry import CLIENTS
 
 # Load environment variables
 load_dotenv()
 
 try:
     # Initialize Cosmos DB client
-    cosmos_client = CosmosClient(
-        url=os.getenv("COSMOS_ENDPOINT"),
-        credential=str(os.getenv("COSMOS_KEY"))
-    )
+    cosmos_client = CLIENTS.cosmos(credential=str(os.getenv("COSMOS_KEY")))
 
     database = cosmos_client.get_database_client("GroundZeroDB")
     container = database.get_container_client("GZC_IDE")
@@ -0,0 +1,465 @@
+"""
+Ingestion throughput benchmark for the dual-API pipeline
+
+Drives DocumentProcessor, DualContainerCreator, the bulk registry loader and the
+relationship linker against the local Cosmos and Gremlin stand-ins with synthetic data, sweeping
+batch size, concurrency and serializer. Each sweep point runs in a fresh process so peak RSS is per point.
+With BENCH_COSMOS_RU_PER_SECOND set, the dual-schema write rate under a fixed and a
+synthetic partition key is compared as well.
+Results (docs/s, request latency percentiles, peak RSS, RU per document) are
+written as JSON for comparison between versions.
+
+Configured through environment variables, e.g.
+    BENCH_DOCS=20000 BENCH_BATCH_SIZES=1,25,50 BENCH_CONCURRENCY=1,8 python benchmark.py
+"""
+
+import os
+import io
+import sys
+import atexit
+import shutil
+import json
+import time
+import uuid
+import random
+import asyncio
+import tempfile
+import platform
+import resource
+import itertools
+import contextlib
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from azure.cosmos import PartitionKey
+from gremlin_python.driver import client
+from colorama import Fore, init
+
+# Initialize colorama for colored output
+init()
+
+# The stand-ins need no credentials, only names
+os.environ.setdefault("DATABASE_NAME", "BenchDB")
+os.environ.setdefault("CONTAINER_NAME", "BenchContainer")
+os.environ.setdefault("PARTITION_KEY", "/pk")
+# Measure raw writes, without graph statistics upkeep
+os.environ.setdefault("GRAPH_STATS_CONTAINER", "")
+# Measure raw writes without hash-index skipping, and keep known vertex ids in memory only
+os.environ["HASH_INDEX_PATH"] = ""
+os.environ["VERTEX_ID_CACHE_PATH"] = ""
+# Any other local state (dead letters, continuation token) goes to a directory of this
+# process, removed at exit, instead of the current directory
+_STATE_DIR = tempfile.mkdtemp(prefix="benchmark-")
+atexit.register(shutil.rmtree, _STATE_DIR, ignore_errors=True)
+os.environ["DEAD_LETTER_PATH"] = os.path.join(_STATE_DIR, "dead_letter.jsonl")
+os.environ["CONTINUATION_TOKEN_FILE"] = os.path.join(_STATE_DIR, ".continuation_token")
+
+from cosmos_standin import CosmosStandIn
+from gremlin_standin import GremlinStandIn
+from instrumentation import InstrumentedGremlinClient
+from client_registry import GREMLIN_POOL_SIZE
+from gremlin_serialization import SERIALIZERS
+from dual_api_document_processor import DocumentProcessor
+from createnewdualcontainer import DualContainerCreator, REGISTRY_PARTITION_KEYS
+from registry_loader import BulkRegistryLoader
+from relationship_linker import RelationshipLinker
+from partition_keys import partition_strategy
+from resilience import execute_with_retry
+
+
+def _int_list(value):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+BENCH_DOCS = int(os.getenv("BENCH_DOCS", "5000"))
+BENCH_API_ITEMS = int(os.getenv("BENCH_API_ITEMS", "500"))
+BENCH_BATCH_SIZES = _int_list(os.getenv("BENCH_BATCH_SIZES", "1,10,25,50"))
+BENCH_CONCURRENCY = _int_list(os.getenv("BENCH_CONCURRENCY", "1,4,8"))
+BENCH_SERIALIZERS = [
+    s for s in os.getenv("BENCH_SERIALIZERS", "graphson_v2,graphson_v2_fast,graphson_v3").split(",") if s
+]
+# Document shape: extra string fields of the given size on top of id/name/age/pk
+BENCH_EXTRA_FIELDS = int(os.getenv("BENCH_EXTRA_FIELDS", "4"))
+BENCH_FIELD_SIZE = int(os.getenv("BENCH_FIELD_SIZE", "64"))
+BENCH_PARTITIONS = int(os.getenv("BENCH_PARTITIONS", "16"))
+# Physical partitions the stand-in splits each container's throughput over
+BENCH_FEED_RANGES = int(os.getenv("BENCH_FEED_RANGES", "8"))
+# Simulated network round trip and provisioned throughput of the stand-ins (0 = unlimited)
+BENCH_GREMLIN_LATENCY_MS = float(os.getenv("BENCH_GREMLIN_LATENCY_MS", "2"))
+BENCH_GREMLIN_RU_PER_SECOND = float(os.getenv("BENCH_GREMLIN_RU_PER_SECOND", "0"))
+BENCH_COSMOS_RU_PER_SECOND = float(os.getenv("BENCH_COSMOS_RU_PER_SECOND", "0"))
+BENCH_SEED = int(os.getenv("BENCH_SEED", "42"))
+BENCH_OUTPUT = os.getenv("BENCH_OUTPUT", "benchmark_results.json")
+
+def synthetic_documents(count, extra_fields=BENCH_EXTRA_FIELDS, field_size=BENCH_FIELD_SIZE,
+                        partitions=BENCH_PARTITIONS, seed=BENCH_SEED):
+    """Person documents as DocumentProcessor reads them from the NoSQL container"""
+    rng = random.Random(seed)
+    documents = []
+    for i in range(count):
+        document = {
+            "id": f"person-{i}",
+            "name": f"Person {i}",
+            "age": rng.randint(18, 90),
+            "pk": f"p{i % partitions}"
+        }
+        for f in range(extra_fields):
+            document[f"field{f}"] = "".join(rng.choices("abcdefghijklmnopqrstuvwxyz", k=field_size))
+        documents.append(document)
+    return documents
+
+
+def synthetic_api_items(count, seed=BENCH_SEED):
+    """api_registry items shaped like the DualContainerCreator example"""
+    rng = random.Random(seed)
+    items = []
+    for i in range(count):
+        items.append({
+            "id": f"api-{i}",
+            "type": "api_registry",
+            "name": f"API {i}",
+            "source": {"discoveryUrl": f"https://api{i}.example.com", "discoveredAt": "2024-12-08T10:30:00Z"},
+            "specification": {
+                "type": rng.choice(["REST", "GraphQL", "gRPC"]),
+                "version": f"{rng.randint(1, 5)}.0",
+                "format": "OpenAPI",
+                "specificationHash": uuid.UUID(int=rng.getrandbits(128)).hex
+            },
+            "capabilities": {"features": [f"feature-{rng.randint(0, 50)}" for _ in range(3)]},
+            "techStack": {"languages": rng.sample(["Python", "Java", "Node.js", "Go", "Rust"], 2)},
+            "usage": {"complexityScore": round(rng.random(), 2), "popularityRank": rng.randint(1, 100)},
+            "analysis": {"securityScore": round(rng.random(), 2)},
+            "relationshipIds": [f"feature-{rng.randint(0, 50)}" for _ in range(2)]
+        })
+    return items
+
+
+class LatencyRecorder:
+    """Registry-shaped sink for InstrumentedGremlinClient that keeps every sample"""
+
+    def __init__(self):
+        self.latencies_ms = []
+        self.statuses = {}
+
+    def observe(self, api, op, status, latency_ms, charge=None, payload_bytes=None):
+        self.latencies_ms.append(latency_ms)
+        self.statuses[str(status)] = self.statuses.get(str(status), 0) + 1
+
+    def percentiles(self):
+        samples = sorted(self.latencies_ms)
+        if not samples:
+            return {"p50": None, "p95": None, "p99": None}
+        # Nearest-rank percentiles over the raw request latencies
+        return {
+            f"p{int(q * 100)}": round(samples[min(len(samples) - 1, int(q * len(samples)))], 3)
+            for q in (0.50, 0.95, 0.99)
+        }
+
+
+def _cosmos_charge(cosmos):
+    return sum(
+        container.total_charge
+        for database in cosmos.databases.values()
+        for container in database.containers.values()
+    )
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _gremlin_client(server, serializer_name, recorder):
+    return InstrumentedGremlinClient(client.Client(
+        server.url,
+        "g",
+        username=f"/dbs/{os.getenv('DATABASE_NAME')}/colls/{os.getenv('CONTAINER_NAME')}",
+        password="standin",
+        message_serializer=SERIALIZERS[serializer_name](),
+        pool_size=GREMLIN_POOL_SIZE
+    ), registry=recorder)
+
+
+def _standins():
+    cosmos = CosmosStandIn(ru_per_second=BENCH_COSMOS_RU_PER_SECOND)
+    server = GremlinStandIn(port=0, latency_ms=BENCH_GREMLIN_LATENCY_MS,
+                            ru_per_second=BENCH_GREMLIN_RU_PER_SECOND)
+    return cosmos, server
+
+
+def run_processor_case(case):
+    """Ingest case['docs'] documents through DocumentProcessor and measure it"""
+    documents = synthetic_documents(case["docs"])
+    cosmos, server = _standins()
+    container = cosmos.create_database_if_not_exists(os.getenv("DATABASE_NAME")) \
+        .create_container_if_not_exists(os.getenv("CONTAINER_NAME"), PartitionKey(path="/pk"))
+    for document in documents:
+        container.upsert_item(document)
+    seeded_charge = _cosmos_charge(cosmos)
+    del documents
+
+    recorder = LatencyRecorder()
+    with server, contextlib.redirect_stdout(io.StringIO()):
+        processor = DocumentProcessor(cosmos_client=cosmos,
+                                      gremlin_client=_gremlin_client(server, case["serializer"], recorder))
+        # Measure raw writes: no read-back checks
+        processor.verifier.mode = "off"
+        started = time.perf_counter()
+        if case["concurrency"] > 1:
+            asyncio.run(processor.process_documents_concurrent(
+                concurrency=case["concurrency"], resume=False, batch_size=case["batch_size"]
+            ))
+        else:
+            asyncio.run(processor.process_documents(resume=False, batch_size=case["batch_size"]))
+        elapsed = time.perf_counter() - started
+        processor.close()
+        written = len(server.graph.vertices)
+
+    return dict(case, **{
+        "elapsed_s": round(elapsed, 3),
+        "docs_per_s": round(written / elapsed, 1) if elapsed > 0 else None,
+        "written": written,
+        "failed": len(processor.failed_documents),
+        "requests": len(recorder.latencies_ms),
+        "request_statuses": recorder.statuses,
+        "latency_ms": recorder.percentiles(),
+        "peak_rss_mb": _peak_rss_mb(),
+        "gremlin_ru_per_doc": round(server.total_charge / written, 3) if written else None,
+        "cosmos_ru_per_doc": round((_cosmos_charge(cosmos) - seeded_charge) / case["docs"], 3)
+    })
+
+
+def run_registry_case(case):
+    """Register case['docs'] api_items one by one or through the bulk loader and measure it"""
+    items = synthetic_api_items(case["docs"])
+    cosmos, server = _standins()
+    recorder = LatencyRecorder()
+    # Provision the registry container at the benchmark's throughput before the creator opens it
+    cosmos.create_database_if_not_exists(os.getenv("DATABASE_NAME")).create_container_if_not_exists(
+        os.getenv("CONTAINER_NAME"), REGISTRY_PARTITION_KEYS.partition_key(),
+        offer_throughput=BENCH_COSMOS_RU_PER_SECOND
+    )
+    with server, contextlib.redirect_stdout(io.StringIO()):
+        creator = DualContainerCreator(cosmos_client=cosmos,
+                                       gremlin_client=_gremlin_client(server, case["serializer"], recorder))
+        if case["target"] == "registry_loader":
+            loader = BulkRegistryLoader(creator, concurrency=case["concurrency"],
+                                        batch_size=case["batch_size"])
+            with tempfile.TemporaryDirectory() as tmp:
+                path = _write_registry_file(items, tmp)
+                started = time.perf_counter()
+                loader.load(path, os.path.join(tmp, "report.jsonl"))
+                elapsed = time.perf_counter() - started
+            loader.close()
+        else:
+            started = time.perf_counter()
+            for item in items:
+                creator.add_api_registry_item(item)
+            elapsed = time.perf_counter() - started
+        creator.close_connections()
+        written = len(server.graph.vertices)
+
+    return dict(case, **{
+        "elapsed_s": round(elapsed, 3),
+        "docs_per_s": round(len(items) / elapsed, 1) if elapsed > 0 else None,
+        "written": written,
+        "failed": len(items) - written,
+        "requests": len(recorder.latencies_ms),
+        "request_statuses": recorder.statuses,
+        "latency_ms": recorder.percentiles(),
+        "peak_rss_mb": _peak_rss_mb(),
+        "gremlin_ru_per_doc": round(server.total_charge / len(items), 3) if items else None,
+        "cosmos_ru_per_doc": round(_cosmos_charge(cosmos) / len(items), 3) if items else None
+    })
+
+
+def _write_registry_file(items, directory):
+    path = os.path.join(directory, "api_registry.jsonl")
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(json.dumps(item) + "\n" for item in items)
+    return path
+
+
+def run_linker_case(case):
+    """Link the relationshipIds of case['docs'] already loaded api_items as edges and measure it"""
+    items = synthetic_api_items(case["docs"])
+    rng = random.Random(BENCH_SEED)
+    for item in items:
+        # Point every relationship at another loaded item, so every pair resolves
+        item["relationshipIds"] = [f"api-{rng.randrange(len(items))}" for _ in range(2)]
+    cosmos, server = _standins()
+    recorder = LatencyRecorder()
+    with server, contextlib.redirect_stdout(io.StringIO()):
+        # Loading the vertices is set-up, measured by the registry_loader cases
+        loading_client = _gremlin_client(server, case["serializer"], LatencyRecorder())
+        creator = DualContainerCreator(cosmos_client=cosmos, gremlin_client=loading_client)
+        loader = BulkRegistryLoader(creator)
+        with tempfile.TemporaryDirectory() as tmp:
+            loader.load(_write_registry_file(items, tmp), os.path.join(tmp, "report.jsonl"))
+        loader.close()
+        loaded_charge = server.total_charge
+
+        linker = RelationshipLinker(_gremlin_client(server, case["serializer"], recorder),
+                                    batch_size=case["batch_size"])
+        started = time.perf_counter()
+        result = linker.link(items)
+        elapsed = time.perf_counter() - started
+        linker.close()
+        linker.gremlin_client.close()
+        creator.close_connections()
+
+    return dict(case, **{
+        "elapsed_s": round(elapsed, 3),
+        "docs_per_s": round(len(items) / elapsed, 1) if elapsed > 0 else None,
+        "edges": result["linked"],
+        "failed": len(result["failed"]) + len(result["unresolved"]),
+        "requests": len(recorder.latencies_ms),
+        "request_statuses": recorder.statuses,
+        "round_trips": linker.round_trips,
+        "latency_ms": recorder.percentiles(),
+        "peak_rss_mb": _peak_rss_mb(),
+        "gremlin_ru_per_doc": round((server.total_charge - loaded_charge) / len(items), 3) if items else None
+    })
+
+
+def run_partition_case(case):
+    """Write dual-schema edges under one fixed pk or under synthetic keys and measure it"""
+    cosmos = CosmosStandIn(ru_per_second=BENCH_COSMOS_RU_PER_SECOND, feed_range_count=BENCH_FEED_RANGES)
+    container = cosmos.create_database_if_not_exists(os.getenv("DATABASE_NAME")) \
+        .create_container_if_not_exists("PartitionBench", PartitionKey(path="/pk"),
+                                        offer_throughput=BENCH_COSMOS_RU_PER_SECOND)
+    keys = partition_strategy("synthetic")
+    edges = [{"id": f"edge-{i}", "label": "INFLUENCES", "type": "edge", "pk": "relationship",
+              "_fromId": f"theme-{i}", "_toId": f"theme-{i + 1}"} for i in range(case["docs"])]
+    if case["partition_keys"] == "synthetic":
+        for edge in edges:
+            keys.assign(edge)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=case["concurrency"]) as pool, \
+            contextlib.redirect_stdout(io.StringIO()):
+        list(pool.map(lambda edge: execute_with_retry(lambda: container.create_item(body=edge)), edges))
+    elapsed = time.perf_counter() - started
+
+    return dict(case, **{
+        "elapsed_s": round(elapsed, 3),
+        "docs_per_s": round(len(edges) / elapsed, 1) if elapsed > 0 else None,
+        "written": len(container.items),
+        "request_statuses": container.requests,
+        "peak_rss_mb": _peak_rss_mb(),
+        "cosmos_ru_per_doc": round(container.total_charge / len(edges), 3) if edges else None
+    })
+
+
+CASE_RUNNERS = {
+    "document_processor": run_processor_case,
+    "dual_container_creator": run_registry_case,
+    "registry_loader": run_registry_case,
+    "relationship_linker": run_linker_case,
+    "partition_keys": run_partition_case
+}
+
+
+def _run_case(case):
+    return CASE_RUNNERS[case["target"]](case)
+
+
+def build_cases():
+    cases = [
+        {"target": "document_processor", "docs": BENCH_DOCS, "batch_size": batch_size,
+         "concurrency": concurrency, "serializer": serializer_name}
+        for batch_size, concurrency, serializer_name
+        in itertools.product(BENCH_BATCH_SIZES, BENCH_CONCURRENCY, BENCH_SERIALIZERS)
+    ]
+    if BENCH_API_ITEMS:
+        cases.extend(
+            {"target": "dual_container_creator", "docs": BENCH_API_ITEMS, "batch_size": 1,
+             "concurrency": 1, "serializer": serializer_name}
+            for serializer_name in BENCH_SERIALIZERS
+        )
+        cases.extend(
+            {"target": "registry_loader", "docs": BENCH_API_ITEMS, "batch_size": batch_size,
+             "concurrency": concurrency, "serializer": serializer_name}
+            for batch_size, concurrency, serializer_name
+            in itertools.product(BENCH_BATCH_SIZES, BENCH_CONCURRENCY, BENCH_SERIALIZERS)
+        )
+        # The linker writes its batches one after another
+        cases.extend(
+            {"target": "relationship_linker", "docs": BENCH_API_ITEMS, "batch_size": batch_size,
+             "concurrency": 1, "serializer": serializer_name}
+            for batch_size, serializer_name in itertools.product(BENCH_BATCH_SIZES, BENCH_SERIALIZERS)
+        )
+    # Without a throughput limit every key writes equally fast
+    if BENCH_COSMOS_RU_PER_SECOND:
+        cases.extend(
+            {"target": "partition_keys", "docs": BENCH_API_ITEMS, "concurrency": max(BENCH_CONCURRENCY),
+             "partition_keys": partition_keys}
+            for partition_keys in ("fixed", "synthetic")
+        )
+    return cases
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def run_benchmark(cases=None, output=BENCH_OUTPUT):
+    cases = cases or build_cases()
+    # One spawned process per case, so peak RSS and driver state never leak between cases
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for number, case in enumerate(cases, 1):
+        label = case["target"] + "".join(
+            f" {key.replace('_size', '')}={value}"
+            for key, value in case.items() if key not in ("target", "docs")
+        )
+        print(Fore.BLUE + f"[{number}/{len(cases)}] {label}")
+        try:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                result = pool.submit(_run_case, case).result()
+        except Exception as e:
+            print(Fore.RED + f"  failed: {e}")
+            results.append(dict(case, error=str(e)))
+            continue
+        results.append(result)
+        if "latency_ms" not in result:
+            print(Fore.GREEN + f"  {result['docs_per_s']} docs/s, {result['cosmos_ru_per_doc']} RU/doc "
+                               f"(NoSQL), peak RSS {result['peak_rss_mb']} MB")
+            continue
+        latency = result["latency_ms"]
+        print(Fore.GREEN + f"  {result['docs_per_s']} docs/s, p50/p95/p99 {latency['p50']}/{latency['p95']}/"
+                           f"{latency['p99']} ms, {result['gremlin_ru_per_doc']} RU/doc (Gremlin), "
+                           f"peak RSS {result['peak_rss_mb']} MB")
+
+    report = {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "git_commit": _git_commit(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count()
+        },
+        "settings": {
+            "docs": BENCH_DOCS, "api_items": BENCH_API_ITEMS, "extra_fields": BENCH_EXTRA_FIELDS,
+            "field_size": BENCH_FIELD_SIZE, "partitions": BENCH_PARTITIONS,
+            "gremlin_latency_ms": BENCH_GREMLIN_LATENCY_MS,
+            "gremlin_ru_per_second": BENCH_GREMLIN_RU_PER_SECOND,
+            "cosmos_ru_per_second": BENCH_COSMOS_RU_PER_SECOND,
+            "feed_ranges": BENCH_FEED_RANGES,
+            "seed": BENCH_SEED
+        },
+        "results": results
+    }
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(Fore.GREEN + f"Wrote {len(results)} results to {output}")
+    return report
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,190 @@
+"""
+Process-wide Cosmos DB and Gremlin clients
+
+Every CosmosClient pays a TLS handshake and an account read when it is built, and
+every Gremlin client a websocket handshake per pooled connection plus SASL auth on
+each connection's first request. Entry points and the classes they build take their
+clients from CLIENTS instead, so the process holds one client per Cosmos account and
+one per Gremlin database/collection. Clients are connected (and their Gremlin
+connections authenticated) when first requested and closed together at exit.
+
+Shared clients ignore close(), so callers keep their usual cleanup; CLIENTS.close()
+is what shuts them down.
+"""
+
+import os
+import time
+import atexit
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from azure.core.pipeline.transport import RequestsTransport
+from azure.cosmos import CosmosClient
+from gremlin_python.driver import client
+from colorama import Fore, init
+from dotenv import load_dotenv
+from gremlin_serialization import serializer_class
+from token_provider import CachedTokenProvider, RotatingGremlinClient
+
+# Initialize colorama for colored output
+init()
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Websocket connections per Gremlin client; concurrent submitters beyond this wait for one
+GREMLIN_POOL_SIZE = int(os.getenv("GREMLIN_POOL_SIZE", "8"))
+# Threads completing Gremlin results; 0 keeps the driver default (5 x CPU count)
+GREMLIN_MAX_WORKERS = int(os.getenv("GREMLIN_MAX_WORKERS", "0"))
+# Hosts (gateway and regional endpoints) the Cosmos HTTP pool keeps, and connections per host
+COSMOS_POOL_CONNECTIONS = int(os.getenv("COSMOS_POOL_CONNECTIONS", "10"))
+COSMOS_POOL_MAXSIZE = int(os.getenv("COSMOS_POOL_MAXSIZE", "32"))
+# Authenticate every pooled Gremlin connection up front instead of on its first real request
+CLIENT_WARMUP = os.getenv("CLIENT_WARMUP", "true").lower() == "true"
+
+WARMUP_QUERY = "g.inject(0)"
+
+
+class SharedClient:
+    """A registry-owned client; everything but close() goes to the real client"""
+
+    def __init__(self, wrapped):
+        self._client = wrapped
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    def close(self):
+        # Owned by the registry, which closes it once for the whole process
+        pass
+
+
+def cosmos_transport(pool_connections=COSMOS_POOL_CONNECTIONS, pool_maxsize=COSMOS_POOL_MAXSIZE):
+    """HTTP transport whose connection pool is sized for concurrent callers.
+
+    The SDK's default adapter keeps 10 connections per host, so more threads than that
+    sharing one client open and drop a connection per request.
+    """
+    session = requests.Session()
+    # The SDK retries on its own; urllib3 must not retry underneath it
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                          max_retries=Retry(total=False, redirect=False, raise_on_status=False))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return RequestsTransport(session=session, session_owner=True)
+
+
+class ClientRegistry:
+    def __init__(self, pool_size=GREMLIN_POOL_SIZE, max_workers=GREMLIN_MAX_WORKERS,
+                 pool_connections=COSMOS_POOL_CONNECTIONS, pool_maxsize=COSMOS_POOL_MAXSIZE,
+                 warmup=CLIENT_WARMUP):
+        self.pool_size = pool_size
+        self.max_workers = max_workers or None
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.warmup = warmup
+        self._clients = {}
+        self._token_provider = None
+        self._lock = threading.Lock()
+
+    def token_provider(self):
+        """AAD token provider shared by every client that authenticates with Entra ID"""
+        with self._lock:
+            if self._token_provider is None:
+                self._token_provider = CachedTokenProvider()
+            return self._token_provider
+
+    def _get(self, key, create):
+        # Creation is rare and happens at start-up, so it simply holds the lock
+        with self._lock:
+            shared = self._clients.get(key)
+            if shared is None:
+                shared = SharedClient(create())
+                self._clients[key] = shared
+            return shared
+
+    def cosmos(self, endpoint=None, credential=None):
+        """Client for a Cosmos account; credential defaults to COSMOS_KEY"""
+        endpoint = endpoint or os.getenv("COSMOS_ENDPOINT")
+        credential = credential or os.getenv("COSMOS_KEY")
+        # Keys are compared by value, token credentials by identity
+        key = ("cosmos", endpoint, credential if isinstance(credential, str) else id(credential))
+        return self._get(key, lambda: CosmosClient(
+            endpoint, credential=credential,
+            transport=cosmos_transport(self.pool_connections, self.pool_maxsize)
+        ))
+
+    def gremlin(self, endpoint=None, database=None, collection=None, password=None, token_scope=None,
+                message_serializer=None):
+        """Client for one graph; authenticates with GREMLIN_KEY, or with AAD tokens for token_scope.
+
+        The serializer defaults to the GREMLIN_SERIALIZER choice.
+        """
+        message_serializer = message_serializer or serializer_class()
+        endpoint = endpoint or os.getenv("GREMLIN_ENDPOINT")
+        database = database or os.getenv("GREMLIN_DATABASE")
+        collection = collection or os.getenv("GREMLIN_COLLECTION")
+
+        def build(secret):
+            return client.Client(
+                endpoint, "g",
+                username=f"/dbs/{database}/colls/{collection}",
+                password=secret,
+                message_serializer=message_serializer(),
+                pool_size=self.pool_size,
+                max_workers=self.max_workers
+            )
+
+        def create():
+            if token_scope:
+                # The bearer-token password is rotated on refresh without dropping in-flight requests
+                gremlin_client = RotatingGremlinClient(build, self.token_provider(), token_scope)
+            else:
+                gremlin_client = build(password or os.getenv("GREMLIN_KEY"))
+            if self.warmup:
+                self._warm_up(gremlin_client, endpoint)
+            return gremlin_client
+
+        key = ("gremlin", endpoint, database, collection, token_scope, message_serializer.__name__)
+        return self._get(key, create)
+
+    def _warm_up(self, gremlin_client, endpoint):
+        # The driver connects its websockets on construction, but Cosmos authenticates each
+        # connection on its first request; one in-flight request per connection covers the pool
+        started = time.perf_counter()
+        try:
+            futures = [gremlin_client.submit_async(WARMUP_QUERY) for _ in range(self.pool_size)]
+            for future in futures:
+                future.result().all().result()
+            print(Fore.BLUE + f"Warmed up {self.pool_size} Gremlin connections to {endpoint} "
+                              f"in {time.perf_counter() - started:.2f}s")
+        except Exception as e:
+            print(Fore.YELLOW + f"Gremlin warm-up failed, connections will authenticate on first use: {e}")
+
+    def close(self):
+        """Close every client; later requests build new ones"""
+        with self._lock:
+            clients, self._clients = list(self._clients.values()), {}
+            token_provider, self._token_provider = self._token_provider, None
+        for shared in clients:
+            try:
+                shared._client.close()
+            except Exception as e:
+                print(Fore.YELLOW + f"Error closing client: {e}")
+        if token_provider is not None:
+            token_provider.close()
+
+
+CLIENTS = ClientRegistry()
+atexit.register(CLIENTS.close)
+
+
+if __name__ == "__main__":
+    # Second requests for the same account and graph are served from the registry
+    for attempt in ("first", "second"):
+        started = time.perf_counter()
+        CLIENTS.cosmos()
+        CLIENTS.gremlin()
+        print(Fore.GREEN + f"{attempt} request for both clients: {time.perf_counter() - started:.3f}s")
+    CLIENTS.close()
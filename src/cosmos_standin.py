@@ -0,0 +1,787 @@
+"""
+Local Cosmos DB NoSQL stand-in with synthetic RU accounting
+
+An in-memory replacement for the CosmosClient / DatabaseProxy / ContainerProxy
+calls this project makes: database and container creation, create/upsert/
+replace/read/patch/delete of items, simple SELECT queries with paging, read_all_items,
+feed ranges, the change feed and indexing policies. Every operation is charged
+synthetic RU, reported in x-ms-request-charge, and each container throttles with
+429s once its provisioned throughput is spent, so batching and backoff can be
+benchmarked deterministically. Throughput is split evenly across the feed ranges
+(the physical partitions), so writes concentrated on one partition key value
+throttle early, as they do on the service. Pass an instance wherever a CosmosClient is accepted.
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import zlib
+import threading
+from azure.cosmos import exceptions
+
+# Default provisioned throughput for containers created without offer_throughput (0 = unlimited)
+STANDIN_COSMOS_RU_PER_SECOND = float(os.getenv("STANDIN_COSMOS_RU_PER_SECOND", "0"))
+STANDIN_COSMOS_LATENCY_MS = float(os.getenv("STANDIN_COSMOS_LATENCY_MS", "0"))
+STANDIN_COSMOS_FEED_RANGES = int(os.getenv("STANDIN_COSMOS_FEED_RANGES", "4"))
+STANDIN_COSMOS_PAGE_SIZE = int(os.getenv("STANDIN_COSMOS_PAGE_SIZE", "100"))
+# Like the SDK, throttled requests are retried after retry-after this many times before a 429 surfaces
+STANDIN_COSMOS_THROTTLE_RETRIES = int(os.getenv("STANDIN_COSMOS_THROTTLE_RETRIES", "9"))
+
+# Synthetic charge model, roughly in line with Cosmos DB costs for ~1 KB items
+RU_PER_POINT_READ_KB = 1.0
+RU_PER_WRITE = 5.0
+RU_PER_WRITE_KB = 1.0
+RU_PER_INDEXED_PATH = 0.2
+RU_PER_QUERY_PAGE = 2.5
+RU_PER_ITEM_SCANNED = 0.01
+RU_PER_INDEX_LOOKUP = 0.5
+RU_PER_ITEM_RETURNED = 0.05
+# Operations the service accepts in one patch request
+PATCH_MAX_OPERATIONS = 10
+
+# What the service applies when a container is created without a policy: index everything
+DEFAULT_INDEXING_POLICY = {"indexingMode": "consistent", "automatic": True,
+                           "includedPaths": [{"path": "/*"}], "excludedPaths": []}
+
+SYSTEM_PROPERTIES = ("_rid", "_self", "_etag", "_attachments", "_ts", "_lsn")
+
+
+def _error(status, message, headers=None, error_class=exceptions.CosmosHttpResponseError):
+    error = error_class(status_code=status, message=message)
+    error.headers = dict(headers or {})
+    return error
+
+
+def _size_kb(item):
+    return len(json.dumps(item, default=str).encode("utf-8")) / 1024
+
+
+def _lookup(item, path):
+    """Value at a /a/b style path (or a dotted c.a.b path), None when undefined"""
+    value = item
+    for part in path.strip("/").replace(".", "/").split("/"):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+def _patch_parts(path):
+    # JSON pointer escapes: ~1 is "/", ~0 is "~"
+    return [part.replace("~1", "/").replace("~0", "~") for part in path.strip("/").split("/")]
+
+
+def _apply_patch(item, operation):
+    """Apply one patch operation in place; returns an error message or None"""
+    op, parts = operation["op"], _patch_parts(operation["path"])
+    parent = item
+    for part in parts[:-1]:
+        if not isinstance(parent, dict) or part not in parent:
+            return f"Path {operation['path']} does not exist"
+        parent = parent[part]
+    leaf = parts[-1]
+    if not isinstance(parent, dict):
+        return f"Path {operation['path']} is not an object member"
+    if op in ("add", "set"):
+        parent[leaf] = operation["value"]
+    elif op == "replace":
+        if leaf not in parent:
+            return f"Path {operation['path']} does not exist"
+        parent[leaf] = operation["value"]
+    elif op == "remove":
+        if parent.pop(leaf, None) is None:
+            return f"Path {operation['path']} does not exist"
+    elif op == "incr":
+        # Like the service, a missing leaf is created with the increment as its value
+        current = parent.get(leaf, 0)
+        if not isinstance(current, (int, float)):
+            return f"Path {operation['path']} is not a number"
+        parent[leaf] = current + operation["value"]
+    else:
+        return f"Unsupported patch operation '{op}'"
+    return None
+
+
+def _leaf_paths(value, prefix=""):
+    if isinstance(value, dict):
+        for key, child in value.items():
+            yield from _leaf_paths(child, f"{prefix}/{key}")
+    elif isinstance(value, list):
+        for child in value:
+            yield from _leaf_paths(child, f"{prefix}/[]")
+    else:
+        yield prefix
+
+
+def _longest_match(path, patterns):
+    """Length of the most specific index path pattern covering path, or -1"""
+    best = -1
+    for pattern in patterns:
+        base = pattern.rstrip("*").rstrip("?").rstrip("/")
+        if path == base or path.startswith(base + "/") or (base == "" and pattern.startswith("/*")):
+            best = max(best, len(base))
+    return best
+
+
+def is_path_indexed(path, indexing_policy=None):
+    """Whether the range index covers path; as in Cosmos, the most specific pattern wins"""
+    policy = indexing_policy or {}
+    if policy.get("indexingMode") == "none" or policy.get("automatic") is False:
+        return False
+    included = [p["path"] for p in policy.get("includedPaths", [{"path": "/*"}])]
+    excluded = [p["path"] for p in policy.get("excludedPaths", []) if p["path"] != '/"_etag"/?']
+    return _longest_match(path, included) > _longest_match(path, excluded)
+
+
+def indexed_path_count(item, indexing_policy=None):
+    """Number of index terms the indexing policy would write for item"""
+    policy = indexing_policy or {}
+    if policy.get("indexingMode") == "none" or policy.get("automatic") is False:
+        return 0
+    leaves = sum(1 for path in _leaf_paths(item)
+                 if not path.startswith("/_") and is_path_indexed(path, policy))
+    # One extra term per composite index whose paths are all present
+    composites = sum(1 for composite in policy.get("compositeIndexes", [])
+                     if all(_lookup(item, entry["path"]) is not None for entry in composite))
+    return leaves + composites
+
+
+class _RuBucket:
+    """Per-second RU budget of one container or physical partition"""
+
+    def __init__(self, ru_per_second):
+        self.ru_per_second = ru_per_second
+        self.available = ru_per_second
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def check(self):
+        """Raise a 429 with retry-after when the budget is spent"""
+        if self.ru_per_second <= 0:
+            return
+        with self.lock:
+            now = time.monotonic()
+            self.available = min(self.ru_per_second,
+                                 self.available + (now - self.updated) * self.ru_per_second)
+            self.updated = now
+            if self.available <= 0:
+                retry_after_ms = -self.available / self.ru_per_second * 1000 + 1
+                raise _error(429, "Request rate is large", {
+                    "x-ms-retry-after-ms": f"{retry_after_ms:.0f}", "x-ms-request-charge": "0"
+                })
+
+    def charge(self, ru):
+        if self.ru_per_second > 0:
+            with self.lock:
+                self.available -= ru
+
+
+# SELECT [TOP n] [VALUE] <projection> FROM <alias> [WHERE <conditions>] [ORDER BY <alias.path> [ASC|DESC]]
+_SELECT = re.compile(
+    r"^\s*SELECT\s+(?:TOP\s+(?P<top>\d+)\s+)?(?P<value>VALUE\s+)?(?P<projection>.+?)\s+"
+    r"FROM\s+(?P<alias>\w+)"
+    r"(?:\s+WHERE\s+(?P<where>.+?))?"
+    r"(?:\s+ORDER\s+BY\s+(?P<order>[\w.]+)(?:\s+(?P<direction>ASC|DESC))?)?\s*$",
+    re.IGNORECASE | re.DOTALL
+)
+_CONDITION = re.compile(
+    r"^\s*(?P<path>\w+(?:\.\w+)+)\s*(?P<op>=|!=|<>|<=|>=|<|>)\s*(?P<value>.+?)\s*$", re.DOTALL
+)
+_COMPARATORS = {
+    "=": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<>": lambda a, b: a != b,
+    "<": lambda a, b: a is not None and a < b,
+    ">": lambda a, b: a is not None and a > b,
+    "<=": lambda a, b: a is not None and a <= b,
+    ">=": lambda a, b: a is not None and a >= b
+}
+
+
+def _literal(text, parameters):
+    text = text.strip()
+    if text.startswith("@"):
+        if text not in parameters:
+            raise _error(400, f"Parameter {text} is not defined")
+        return parameters[text]
+    if text[:1] in ("'", '"'):
+        return text[1:-1]
+    if text in ("true", "false"):
+        return text == "true"
+    if text == "null":
+        return None
+    try:
+        return float(text) if "." in text else int(text)
+    except ValueError:
+        raise _error(400, f"Unsupported literal in query: {text}")
+
+
+class _Query:
+    """The simple SELECT forms the project runs"""
+
+    def __init__(self, query, parameters=None):
+        match = _SELECT.match(query)
+        if not match:
+            raise _error(400, f"Unsupported query: {query}")
+        self.alias = match.group("alias")
+        self.top = int(match.group("top")) if match.group("top") else None
+        self.value = bool(match.group("value"))
+        self.projection = match.group("projection").strip()
+        params = {p["name"]: p["value"] for p in (parameters or [])}
+        self.conditions = []
+        if match.group("where"):
+            for clause in re.split(r"\s+AND\s+", match.group("where"), flags=re.IGNORECASE):
+                condition = _CONDITION.match(clause)
+                if not condition:
+                    raise _error(400, f"Unsupported WHERE clause: {clause}")
+                self.conditions.append((
+                    self._path(condition.group("path")),
+                    _COMPARATORS[condition.group("op")],
+                    _literal(condition.group("value"), params)
+                ))
+        self.order = self._path(match.group("order")) if match.group("order") else None
+        self.descending = (match.group("direction") or "").upper() == "DESC"
+
+    def _path(self, dotted):
+        alias, _, path = dotted.partition(".")
+        if alias != self.alias:
+            raise _error(400, f"Unknown alias '{alias}'")
+        return path
+
+    def matches(self, item):
+        return all(compare(_lookup(item, path), value) for path, compare, value in self.conditions)
+
+    def run(self, items):
+        selected = [item for item in items if self.matches(item)]
+        if self.order:
+            selected.sort(key=lambda item: (_lookup(item, self.order) is None, _lookup(item, self.order)),
+                          reverse=self.descending)
+        if self.top is not None:
+            selected = selected[:self.top]
+        if re.fullmatch(r"COUNT\(\s*1\s*\)", self.projection, re.IGNORECASE):
+            count = len(selected)
+            return [count] if self.value else [{"$1": count}]
+        if self.projection == "*":
+            return selected
+        if self.value:
+            path = self._path(self.projection)
+            return [_lookup(item, path) for item in selected]
+        fields = []
+        for field in self.projection.split(","):
+            expression, _, name = field.strip().partition(" AS ")
+            path = self._path(expression.strip())
+            fields.append((name.strip() or path.split(".")[-1], path))
+        return [{name: _lookup(item, path) for name, path in fields} for item in selected]
+
+
+class _Connection:
+    """Stands in for container.client_connection"""
+
+    def __init__(self):
+        self.last_response_headers = {}
+
+
+class _Page:
+    def __init__(self, items):
+        self._items = items
+
+    def __iter__(self):
+        return iter(self._items)
+
+
+class _PageIterator:
+    """Iterates pages of a result and exposes continuation_token like the SDK"""
+
+    def __init__(self, fetch, continuation_token):
+        self._fetch = fetch
+        self.continuation_token = continuation_token
+        self._started = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._started and self.continuation_token is None:
+            raise StopIteration
+        self._started = True
+        items, self.continuation_token = self._fetch(self.continuation_token)
+        if not items and self.continuation_token is None:
+            raise StopIteration
+        return _Page(items)
+
+
+class ItemPager:
+    """Lazy query result: iterate items directly or page by page with by_page()"""
+
+    def __init__(self, fetch):
+        self._fetch = fetch
+
+    def by_page(self, continuation_token=None):
+        return _PageIterator(self._fetch, continuation_token)
+
+    def __iter__(self):
+        for page in self.by_page():
+            yield from page
+
+
+class ContainerStandIn:
+    def __init__(self, database, container_id, partition_key, ru_per_second, indexing_policy=None):
+        self.database = database
+        self.id = container_id
+        paths = partition_key["paths"] if isinstance(partition_key, dict) else [partition_key]
+        self.partition_key_paths = list(paths)
+        self.partition_key_kind = partition_key.get("kind", "Hash") \
+            if isinstance(partition_key, dict) else "Hash"
+        self.indexing_policy = indexing_policy or json.loads(json.dumps(DEFAULT_INDEXING_POLICY))
+        self.throughput = ru_per_second
+        self.client_connection = _Connection()
+        self.items = {}
+        self.total_charge = 0.0
+        self.requests = {}
+        self._bucket = _RuBucket(ru_per_second)
+        # Point operations also spend the budget of the physical partition owning their key
+        ranges = database.client.feed_range_count
+        self._partition_buckets = [_RuBucket(ru_per_second / ranges) for _ in range(ranges)]
+        self._lsn = 0
+        self._lock = threading.RLock()
+
+    # Accounting
+
+    def _begin(self, partition=None):
+        if self.database.client.latency_ms:
+            time.sleep(self.database.client.latency_ms / 1000)
+        for attempt in range(self.database.client.throttle_retries + 1):
+            try:
+                self._bucket.check()
+                if partition is not None:
+                    self._partition_buckets[partition].check()
+                return
+            except exceptions.CosmosHttpResponseError as e:
+                self._finish(429, 0.0, None, e.headers)
+                if attempt == self.database.client.throttle_retries:
+                    raise
+                time.sleep(float(e.headers["x-ms-retry-after-ms"]) / 1000)
+
+    def _finish(self, status, charge, response_hook, extra_headers=None, result=None, partition=None):
+        charge = round(charge, 2)
+        self._bucket.charge(charge)
+        if partition is not None:
+            self._partition_buckets[partition].charge(charge)
+        self.total_charge += charge
+        self.requests[status] = self.requests.get(status, 0) + 1
+        headers = {
+            "x-ms-request-charge": str(charge),
+            "x-ms-activity-id": str(uuid.uuid4()),
+            "x-ms-status-code": str(status)
+        }
+        headers.update(extra_headers or {})
+        self.client_connection.last_response_headers = headers
+        if response_hook is not None:
+            response_hook(headers, result)
+        return headers
+
+    def _fail(self, status, message, charge, error_class=exceptions.CosmosHttpResponseError):
+        headers = self._finish(status, charge, None)
+        raise _error(status, message, headers, error_class)
+
+    def _write_charge(self, item):
+        return (RU_PER_WRITE + RU_PER_WRITE_KB * _size_kb(item)
+                + RU_PER_INDEXED_PATH * indexed_path_count(item, self.indexing_policy))
+
+    # Partitioning
+
+    def partition_key_value(self, item):
+        values = [_lookup(item, path) for path in self.partition_key_paths]
+        return values[0] if len(values) == 1 else tuple(values)
+
+    def _key(self, item_id, partition_key):
+        if isinstance(partition_key, list):
+            partition_key = tuple(partition_key)
+        return (json.dumps(partition_key, default=str), item_id)
+
+    def _range_of(self, item, range_count):
+        return self._range_of_value(self.partition_key_value(item), range_count)
+
+    def _range_of_value(self, partition_key, range_count):
+        pk = json.dumps(partition_key, default=str)
+        return zlib.crc32(pk.encode("utf-8")) % range_count
+
+    def _partition_of(self, partition_key):
+        return self._range_of_value(partition_key, len(self._partition_buckets))
+
+    # Item operations
+
+    def _store(self, body):
+        stored = {k: v for k, v in body.items() if k not in SYSTEM_PROPERTIES}
+        self._lsn += 1
+        stored.update({
+            "_rid": stored.get("_rid") or uuid.uuid4().hex[:16],
+            "_etag": f'"{uuid.uuid4()}"',
+            "_ts": int(time.time()),
+            "_lsn": self._lsn
+        })
+        self.items[self._key(stored["id"], self.partition_key_value(stored))] = stored
+        return dict(stored)
+
+    def create_item(self, body, response_hook=None, **kwargs):
+        partition = self._partition_of(self.partition_key_value(body))
+        self._begin(partition)
+        if "id" not in body:
+            self._fail(400, "The input content is invalid because the required property 'id' is missing",
+                       1.0)
+        with self._lock:
+            if self._key(body["id"], self.partition_key_value(body)) in self.items:
+                self._fail(409, "Entity with the specified id already exists in the system.",
+                           1.0, exceptions.CosmosResourceExistsError)
+            stored = self._store(body)
+        self._finish(201, self._write_charge(body), response_hook, {"etag": stored["_etag"]}, stored,
+                     partition)
+        return stored
+
+    def upsert_item(self, body, response_hook=None, **kwargs):
+        partition = self._partition_of(self.partition_key_value(body))
+        self._begin(partition)
+        if "id" not in body:
+            self._fail(400, "The input content is invalid because the required property 'id' is missing",
+                       1.0)
+        with self._lock:
+            existed = self._key(body["id"], self.partition_key_value(body)) in self.items
+            stored = self._store(body)
+        # Replacing an item also removes its old index entries
+        charge = self._write_charge(body) * (2 if existed else 1)
+        self._finish(200 if existed else 201, charge, response_hook, {"etag": stored["_etag"]}, stored,
+                     partition)
+        return stored
+
+    def replace_item(self, item, body, response_hook=None, **kwargs):
+        partition = self._partition_of(self.partition_key_value(body))
+        self._begin(partition)
+        item_id = item["id"] if isinstance(item, dict) else item
+        with self._lock:
+            if self._key(item_id, self.partition_key_value(body)) not in self.items:
+                self._fail(404, "Entity with the specified id does not exist in the system.",
+                           1.0, exceptions.CosmosResourceNotFoundError)
+            stored = self._store(body)
+        self._finish(200, self._write_charge(body) * 2, response_hook, {"etag": stored["_etag"]}, stored,
+                     partition)
+        return stored
+
+    def read_item(self, item, partition_key, response_hook=None, **kwargs):
+        partition = self._partition_of(partition_key)
+        self._begin(partition)
+        item_id = item["id"] if isinstance(item, dict) else item
+        stored = self.items.get(self._key(item_id, partition_key))
+        if stored is None:
+            self._fail(404, "Entity with the specified id does not exist in the system.",
+                       1.0, exceptions.CosmosResourceNotFoundError)
+        self._finish(200, max(1.0, RU_PER_POINT_READ_KB * _size_kb(stored)), response_hook,
+                     {"etag": stored["_etag"]}, stored, partition)
+        return dict(stored)
+
+    def delete_item(self, item, partition_key, response_hook=None, **kwargs):
+        partition = self._partition_of(partition_key)
+        self._begin(partition)
+        item_id = item["id"] if isinstance(item, dict) else item
+        with self._lock:
+            stored = self.items.pop(self._key(item_id, partition_key), None)
+        if stored is None:
+            self._fail(404, "Entity with the specified id does not exist in the system.",
+                       1.0, exceptions.CosmosResourceNotFoundError)
+        self._finish(204, self._write_charge(stored), response_hook, partition=partition)
+
+    def patch_item(self, item, partition_key, patch_operations, response_hook=None, **kwargs):
+        """add/set/replace/remove/incr operations on /a/b paths, applied atomically"""
+        partition = self._partition_of(partition_key)
+        self._begin(partition)
+        item_id = item["id"] if isinstance(item, dict) else item
+        if len(patch_operations) > PATCH_MAX_OPERATIONS:
+            self._fail(400, f"Patch supports at most {PATCH_MAX_OPERATIONS} operations", 1.0)
+        with self._lock:
+            stored = self.items.get(self._key(item_id, partition_key))
+            if stored is None:
+                self._fail(404, "Entity with the specified id does not exist in the system.",
+                           1.0, exceptions.CosmosResourceNotFoundError)
+            patched = json.loads(json.dumps(stored))
+            for operation in patch_operations:
+                error = _apply_patch(patched, operation)
+                if error:
+                    self._fail(400, error, 1.0)
+            stored = self._store(patched)
+        self._finish(200, self._write_charge(stored), response_hook, {"etag": stored["_etag"]}, stored,
+                     partition)
+        return stored
+
+    # Queries
+
+    def _scope(self, feed_range=None, partition_key=None):
+        with self._lock:
+            items = list(self.items.values())
+        if partition_key is not None:
+            key = tuple(partition_key) if isinstance(partition_key, list) else partition_key
+            items = [item for item in items if self.partition_key_value(item) == key]
+        if feed_range is not None:
+            index, count = feed_range["Range"]["index"], feed_range["Range"]["count"]
+            items = [item for item in items if self._range_of(item, count) == index]
+        return items
+
+    def _scan_charge(self, parsed, scope):
+        """RU to find the query's candidates: index lookups plus every item that must be loaded.
+
+        Filters on indexed paths are served from the index; a composite index covering
+        several of them counts as one lookup. Without any usable index the whole scope
+        is loaded and filtered.
+        """
+        policy = self.indexing_policy
+        indexed = [(path, compare, value) for path, compare, value in parsed.conditions
+                   if is_path_indexed("/" + path.replace(".", "/"), policy)]
+        loaded = sum(1 for item in scope
+                     if all(compare(_lookup(item, path), value) for path, compare, value in indexed))
+        lookup_paths = {"/" + path.replace(".", "/") for path, _, _ in indexed}
+        if parsed.order:
+            lookup_paths.add("/" + parsed.order.replace(".", "/"))
+        lookups = len(lookup_paths)
+        for composite in policy.get("compositeIndexes", []):
+            covered = {entry["path"] for entry in composite}
+            if len(lookup_paths) > 1 and lookup_paths <= covered:
+                lookups = 1
+                break
+        return RU_PER_ITEM_SCANNED * loaded + RU_PER_INDEX_LOOKUP * lookups
+
+    def _paged(self, run, max_item_count, response_hook, scan_charge):
+        page_size = max_item_count or STANDIN_COSMOS_PAGE_SIZE
+        results = {}
+
+        def fetch(continuation):
+            self._begin()
+            if "all" not in results:
+                results["all"] = run()
+            offset = int(continuation) if continuation else 0
+            items = results["all"][offset:offset + page_size]
+            following = offset + page_size
+            token = str(following) if following < len(results["all"]) else None
+            # The scan is charged on the first page, returned items on every page
+            charge = RU_PER_QUERY_PAGE + RU_PER_ITEM_RETURNED * len(items) + \
+                (scan_charge() if offset == 0 else 0)
+            headers = {"x-ms-continuation": token} if token else {}
+            self._finish(200, charge, response_hook, headers, {"Documents": items, "_count": len(items)})
+            return [dict(i) if isinstance(i, dict) else i for i in items], token
+
+        return ItemPager(fetch)
+
+    def query_items(self, query, parameters=None, partition_key=None, enable_cross_partition_query=None,
+                    max_item_count=None, feed_range=None, response_hook=None, **kwargs):
+        parsed = _Query(query, parameters)
+        if parsed.order and not is_path_indexed("/" + parsed.order.replace(".", "/"), self.indexing_policy):
+            raise _error(400, f"Order-by item requires a corresponding range index: {parsed.order}")
+        return self._paged(
+            lambda: parsed.run(self._scope(feed_range, partition_key)),
+            max_item_count, response_hook,
+            lambda: self._scan_charge(parsed, self._scope(feed_range, partition_key))
+        )
+
+    def read_all_items(self, max_item_count=None, response_hook=None, **kwargs):
+        return self.query_items("SELECT * FROM c", max_item_count=max_item_count, response_hook=response_hook)
+
+    def read_feed_ranges(self, **kwargs):
+        count = self.database.client.feed_range_count
+        return [{"Range": {"index": i, "count": count}} for i in range(count)]
+
+    def query_items_change_feed(self, feed_range=None, start_time=None, continuation=None,
+                                max_item_count=None, response_hook=None, **kwargs):
+        """Latest version of every item changed after the continuation, in write order.
+
+        The continuation for the next call is returned in the etag response header.
+        """
+        if continuation:
+            saved = json.loads(continuation)
+            feed_range, since = saved["range"], saved["lsn"]
+        else:
+            since = 0 if start_time in (None, "Beginning") else self._lsn
+        page_size = max_item_count or STANDIN_COSMOS_PAGE_SIZE
+        state = {"lsn": since}
+
+        def fetch(token):
+            self._begin()
+            changed = sorted(
+                (item for item in self._scope(feed_range) if item["_lsn"] > state["lsn"]),
+                key=lambda item: item["_lsn"]
+            )[:page_size]
+            if changed:
+                state["lsn"] = changed[-1]["_lsn"]
+            etag = json.dumps({"range": feed_range, "lsn": state["lsn"]})
+            charge = RU_PER_QUERY_PAGE + RU_PER_ITEM_RETURNED * len(changed)
+            self._finish(200 if changed else 304, charge, response_hook, {"etag": etag}, changed)
+            return [dict(i) for i in changed], (etag if len(changed) == page_size else None)
+
+        return ItemPager(fetch)
+
+    def read(self, response_hook=None, **kwargs):
+        properties = {
+            "id": self.id,
+            "partitionKey": {"paths": self.partition_key_paths, "kind": self.partition_key_kind},
+            "indexingPolicy": self.indexing_policy
+        }
+        self._finish(200, 1.0, response_hook, result=properties)
+        return properties
+
+
+class DatabaseStandIn:
+    def __init__(self, client, database_id):
+        self.client = client
+        self.id = database_id
+        self.containers = {}
+
+    def create_container_if_not_exists(self, id, partition_key, offer_throughput=None,
+                                       indexing_policy=None, **kwargs):
+        container = self.containers.get(id)
+        if container is None:
+            throughput = offer_throughput if offer_throughput is not None else self.client.ru_per_second
+            container = ContainerStandIn(self, id, partition_key, throughput, indexing_policy)
+            self.containers[id] = container
+        return container
+
+    def create_container(self, id, partition_key, offer_throughput=None, indexing_policy=None, **kwargs):
+        if id in self.containers:
+            raise _error(409, f"Container {id} already exists",
+                         error_class=exceptions.CosmosResourceExistsError)
+        return self.create_container_if_not_exists(id, partition_key, offer_throughput, indexing_policy)
+
+    def replace_container(self, container, partition_key, indexing_policy=None, **kwargs):
+        container_id = container if isinstance(container, str) else container.id
+        if container_id not in self.containers:
+            raise _error(404, f"Container {container_id} does not exist",
+                         error_class=exceptions.CosmosResourceNotFoundError)
+        replaced = self.containers[container_id]
+        # Like the service, properties left out are reset to their defaults
+        replaced.indexing_policy = indexing_policy or json.loads(json.dumps(DEFAULT_INDEXING_POLICY))
+        return replaced
+
+    def get_container_client(self, container):
+        container_id = container if isinstance(container, str) else container.id
+        if container_id not in self.containers:
+            # The real SDK only fails on first use; default to a /pk container
+            self.containers[container_id] = ContainerStandIn(
+                self, container_id, {"paths": ["/pk"], "kind": "Hash"}, self.client.ru_per_second
+            )
+        return self.containers[container_id]
+
+    def delete_container(self, container):
+        container_id = container if isinstance(container, str) else container.id
+        self.containers.pop(container_id, None)
+
+
+class CosmosStandIn:
+    """In-memory CosmosClient replacement"""
+
+    def __init__(self, ru_per_second=STANDIN_COSMOS_RU_PER_SECOND, latency_ms=STANDIN_COSMOS_LATENCY_MS,
+                 feed_range_count=STANDIN_COSMOS_FEED_RANGES, throttle_retries=STANDIN_COSMOS_THROTTLE_RETRIES):
+        self.ru_per_second = ru_per_second
+        self.latency_ms = latency_ms
+        self.throttle_retries = throttle_retries
+        self.feed_range_count = feed_range_count
+        self.databases = {}
+
+    def create_database_if_not_exists(self, id, **kwargs):
+        return self.get_database_client(id)
+
+    def get_database_client(self, database):
+        database_id = database if isinstance(database, str) else database.id
+        if database_id not in self.databases:
+            self.databases[database_id] = DatabaseStandIn(self, database_id)
+        return self.databases[database_id]
+
+    def async_client(self):
+        """azure.cosmos.aio-shaped view over the same data"""
+        return AsyncCosmosStandIn(self)
+
+    def close(self):
+        pass
+
+
+class _AsyncPage:
+    def __init__(self, page):
+        self._items = list(page)
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for item in self._items:
+            yield item
+
+
+class _AsyncPageIterator:
+    def __init__(self, pages):
+        self._pages = pages
+
+    @property
+    def continuation_token(self):
+        return self._pages.continuation_token
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return _AsyncPage(next(self._pages))
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class _AsyncPager:
+    def __init__(self, pager):
+        self._pager = pager
+
+    def by_page(self, continuation_token=None):
+        return _AsyncPageIterator(self._pager.by_page(continuation_token))
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        async for page in self.by_page():
+            async for item in page:
+                yield item
+
+
+class _AsyncContainer:
+    def __init__(self, container):
+        self._container = container
+
+    def __getattr__(self, name):
+        attr = getattr(self._container, name)
+        if name in ("query_items", "read_all_items", "query_items_change_feed"):
+            return lambda *args, **kwargs: _AsyncPager(attr(*args, **kwargs))
+        if not callable(attr):
+            return attr
+
+        async def call(*args, **kwargs):
+            return attr(*args, **kwargs)
+        return call
+
+
+class _AsyncDatabase:
+    def __init__(self, database):
+        self._database = database
+
+    def get_container_client(self, container):
+        return _AsyncContainer(self._database.get_container_client(container))
+
+
+class AsyncCosmosStandIn:
+    def __init__(self, client):
+        self._client = client
+
+    def get_database_client(self, database):
+        return _AsyncDatabase(self._client.get_database_client(database))
+
+    async def close(self):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
@@ -1,11 +1,17 @@
 # createnewdualcontainer.py
 
 import os
-from azure.cosmos import CosmosClient, PartitionKey, exceptions
-from gremlin_python.driver import client, serializer
+from azure.cosmos import exceptions
 from gremlin_python.driver.protocol import GremlinServerError
 from dotenv import load_dotenv
 from colorama import Fore, init
+from client_registry import CLIENTS
+from gremlin_templates import register_template
+from hash_index import ContentHashIndex, HASH_INDEX_PATH, index_namespace
+from graph_stats import open_graph_statistics
+from partition_keys import partition_strategy
+from resilience import DeadLetterQueue, execute_with_retry
+from instrumentation import InstrumentedContainer, InstrumentedGremlinClient, METRICS
 
 # Initialize colorama
 init(autoreset=True)
@@ -13,19 +19,60 @@ init(autoreset=True)
 # Load environment variables from .env file
 load_dotenv()
 
+# Throughput provisioned when the registry container is first created; it caps bulk load rates
+REGISTRY_OFFER_THROUGHPUT = int(os.getenv("REGISTRY_OFFER_THROUGHPUT", "400"))
+# Existing registry containers are partitioned on /id; any other strategy needs a new container
+# (see partition_migration.py). Synthetic keys are prefixed by the api_item type.
+REGISTRY_PARTITION_KEY_STRATEGY = os.getenv("REGISTRY_PARTITION_KEY_STRATEGY", "id")
+REGISTRY_PARTITION_KEYS = partition_strategy(REGISTRY_PARTITION_KEY_STRATEGY, prefix_field="type")
+
+def api_vertex_bindings(api_item):
+    return {
+        "api_id": api_item["id"],
+        "vpk": REGISTRY_PARTITION_KEYS.graph_key("API", api_item["id"]),
+        "name": api_item["name"],
+        "api_type": api_item["type"],
+        "version": api_item["specification"]["version"]
+    }
+
+
+# The vertex id is the api_item id, so relationshipIds resolve with a plain g.V(ids); its pk
+# spreads API vertices over the graph's partitions
+ADD_API_VERTEX = register_template(
+    "add_api_vertex",
+    "g.addV('API').property('id', api_id).property('pk', vpk).property('api_id', api_id)"
+    ".property('name', name).property('type', api_type).property('version', version)"
+    ".property('status', 'active')",
+    ["api_id", "vpk", "name", "api_type", "version"],
+    binder=api_vertex_bindings
+)
+
+# Vertex properties derived from top-level api_item fields
+API_VERTEX_PROPERTIES = {"name": ("name", "name"), "type": ("type", "api_type"),
+                         "specification": ("version", "version")}
+
+
+def update_api_vertex_template(fields):
+    """Template that rewrites only the vertex properties derived from the given fields"""
+    steps = [API_VERTEX_PROPERTIES[field] for field in fields]
+    script = "g.V().has('API', 'api_id', api_id)" + "".join(
+        f".property('{prop}', {param})" for prop, param in steps
+    )
+    return register_template(
+        "update_api_vertex_" + "_".join(fields), script,
+        ["api_id"] + [param for _, param in steps], binder=api_vertex_bindings
+    )
+
 class DualContainerCreator:
-    def __init__(self):
+    def __init__(self, cosmos_client=None, gremlin_client=None):
         # Debug: Check if environment variables are loaded
         cosmos_endpoint = os.getenv("COSMOS_ENDPOINT")
         cosmos_key = os.getenv("COSMOS_KEY")
         print(Fore.YELLOW + f"COSMOS_ENDPOINT: {cosmos_endpoint}")
         print(Fore.YELLOW + f"COSMOS_KEY is set: {bool(cosmos_key)}")
 
-        # Initialize Cosmos client for SQL API
-        self.cosmos_client = CosmosClient(
-            cosmos_endpoint,
-            credential=cosmos_key
-        )
+        # Initialize Cosmos client for SQL API (or use an injected one, e.g. the local stand-in)
+        self.cosmos_client = cosmos_client or CLIENTS.cosmos(cosmos_endpoint, credential=cosmos_key)
 
         # Database and container names for SQL API
         self.database_name_sql = os.getenv("DATABASE_NAME")
@@ -40,11 +87,11 @@ class DualContainerCreator:
 
         # Create SQL container if it does not exist
         try:
-            self.container_sql = self.database_sql.create_container_if_not_exists(
+            self.container_sql = InstrumentedContainer(self.database_sql.create_container_if_not_exists(
                 id=self.container_name_sql,
-                partition_key=PartitionKey(path="/id"),
-                offer_throughput=400
-            )
+                partition_key=REGISTRY_PARTITION_KEYS.partition_key(),
+                offer_throughput=REGISTRY_OFFER_THROUGHPUT
+            ))
             print(Fore.GREEN + f"SQL Container '{self.container_name_sql}' is ready.")
         except exceptions.CosmosHttpResponseError as e:
             print(Fore.RED + f"Error creating SQL container: {e.message}")
@@ -55,13 +102,12 @@ class DualContainerCreator:
         print(Fore.YELLOW + f"GREMLIN_ENDPOINT: {gremlin_endpoint}")
         print(Fore.YELLOW + f"GREMLIN_KEY is set: {bool(gremlin_key)}")
 
-        self.gremlin_client = client.Client(
+        self.gremlin_client = InstrumentedGremlinClient(gremlin_client or CLIENTS.gremlin(
             gremlin_endpoint,
-            'g',
-            username=f"/dbs/{os.getenv('GREMLIN_DATABASE')}/colls/{os.getenv('GREMLIN_COLLECTION')}",
-            password=gremlin_key,
-            message_serializer=serializer.GraphSONSerializersV2d0()
-        )
+            os.getenv('GREMLIN_DATABASE'),
+            os.getenv('GREMLIN_COLLECTION'),
+            password=gremlin_key
+        ))
 
         # Gremlin database and graph names
         self.database_name_gremlin = os.getenv("GREMLIN_DATABASE")
@@ -70,6 +116,22 @@ class DualContainerCreator:
         # Create Gremlin graph
         self.create_gremlin_graph()
 
+        # Content hashes of registered items; specificationHash stands in for the spec subtree
+        self.hash_index = ContentHashIndex(
+            HASH_INDEX_PATH,
+            namespace=index_namespace(
+                "api_registry", cosmos_endpoint, self.database_name_sql, self.container_name_sql,
+                gremlin_endpoint, self.database_name_gremlin, self.graph_name_gremlin
+            ),
+            hash_overrides={"specification": lambda spec: spec.get("specificationHash")}
+        ) if HASH_INDEX_PATH else None
+
+        # Writes that exhaust their throttling retries are kept here for replay
+        self.dead_letter = DeadLetterQueue()
+
+        # Label counts and partition keys of the graph, maintained on every vertex write
+        self.stats = open_graph_statistics(self.cosmos_client, create=True)
+
     def create_gremlin_graph(self):
         try:
             # Typically, Gremlin graphs are created via Azure Portal or specific API calls.
@@ -79,30 +141,88 @@ class DualContainerCreator:
             print(Fore.RED + f"Error setting up Gremlin graph: {e}")
 
     def add_api_registry_item(self, api_item):
+        REGISTRY_PARTITION_KEYS.assign(api_item)
+        status, changed = self.hash_index.diff(api_item) if self.hash_index else ("new", set())
+        if status == "unchanged":
+            print(Fore.BLUE + f"API Registry Item '{api_item['id']}' unchanged, skipped.")
+            return
         try:
-            self.container_sql.create_item(body=api_item)
-            print(Fore.GREEN + f"API Registry Item '{api_item['id']}' created successfully.")
-            self.add_api_vertex(api_item)
+            if status == "new":
+                execute_with_retry(
+                    lambda: self.container_sql.create_item(body=api_item),
+                    op="cosmos.create_item", payload=api_item, dead_letter=self.dead_letter
+                )
+                print(Fore.GREEN + f"API Registry Item '{api_item['id']}' created successfully.")
+                vertex_ok = self.add_api_vertex(api_item)
+            else:
+                execute_with_retry(
+                    lambda: self.container_sql.upsert_item(body=api_item),
+                    op="cosmos.upsert_item", payload=api_item, dead_letter=self.dead_letter
+                )
+                print(Fore.GREEN + f"API Registry Item '{api_item['id']}' updated ({', '.join(sorted(changed))}).")
+                vertex_ok = self.update_api_vertex(api_item, changed)
+            if vertex_ok and self.hash_index:
+                self.hash_index.record(api_item)
         except exceptions.CosmosHttpResponseError as e:
             print(Fore.RED + f"Error creating API Registry item: {e.message}")
 
+    def _submit_gremlin(self, template, bindings):
+        # Throttled submissions are retried; exhausted ones go to the dead-letter file
+        return execute_with_retry(
+            lambda: template.submit(self.gremlin_client, **bindings).all().result(),
+            op="gremlin.submit",
+            payload={"script": template.script, "bindings": bindings},
+            dead_letter=self.dead_letter
+        )
+
+    def record_api_vertices(self, api_items):
+        if self.stats is None:
+            return
+        for api_item in api_items:
+            self.stats.record_vertex("API", api_vertex_bindings(api_item)["vpk"], api_item["id"])
+        self.stats.flush()
+
     def add_api_vertex(self, api_item):
         try:
-            script = (
-                f"g.addV('API')"
-                f".property('api_id', '{api_item['id']}')"
-                f".property('name', '{api_item['name']}')"
-                f".property('type', '{api_item['type']}')"
-                f".property('version', '{api_item['specification']['version']}')"
-                f".property('status', 'active')"
-            )
-            self.gremlin_client.submitAsync(script).result()
+            self._submit_gremlin(ADD_API_VERTEX, ADD_API_VERTEX.bind(**api_vertex_bindings(api_item)))
             print(Fore.GREEN + f"API Vertex '{api_item['id']}' added successfully.")
+            self.record_api_vertices([api_item])
+            return True
         except GremlinServerError as e:
             print(Fore.RED + f"Error adding API vertex: {e}")
+            return False
+
+    def update_api_vertex(self, api_item, changed_fields):
+        # Only the vertex properties whose source fields changed are rewritten
+        fields = [field for field in API_VERTEX_PROPERTIES if field in changed_fields]
+        if not fields:
+            return True
+        try:
+            template = update_api_vertex_template(fields)
+            if not self._submit_gremlin(template, template.bind_document(api_item)):
+                print(Fore.RED + f"API Vertex '{api_item['id']}' not found, nothing updated.")
+                return False
+            print(Fore.GREEN + f"API Vertex '{api_item['id']}' updated: {', '.join(fields)}.")
+            return True
+        except GremlinServerError as e:
+            print(Fore.RED + f"Error updating API vertex: {e}")
+            return False
+
+    def replay_dead_letters(self):
+        """Re-run NoSQL and Gremlin writes that previously exhausted their retries"""
+        return self.dead_letter.replay({
+            "cosmos.create_item": lambda item: self.container_sql.create_item(body=item),
+            "cosmos.upsert_item": lambda item: self.container_sql.upsert_item(body=item),
+            "gremlin.submit": lambda payload: self.gremlin_client.submit(
+                payload["script"], payload["bindings"]
+            ).all().result()
+        })
 
     def close_connections(self):
+        METRICS.report()
         self.gremlin_client.close()
+        if self.hash_index:
+            self.hash_index.close()
 
 if __name__ == "__main__":
     creator = DualContainerCreator()
@@ -4,12 +4,26 @@ Dual API Document Processor for Advanced Decision Engine
 
 import os
 import asyncio
-from azure.identity import DefaultAzureCredential
-from azure.cosmos import CosmosClient, PartitionKey
-from gremlin_python.driver import client, serializer
+import contextlib
+from azure.cosmos import PartitionKey
+from azure.cosmos.aio import CosmosClient as AsyncCosmosClient
 from colorama import Fore, init
 from dotenv import load_dotenv
 import sys
+import time
+from gremlin_python.driver.protocol import GremlinServerError
+from client_registry import CLIENTS, GREMLIN_POOL_SIZE
+from gremlin_templates import register_template, vertex_lookup, edge_lookup
+from hash_index import ContentHashIndex, HASH_INDEX_PATH, index_namespace
+from graph_verifier import GraphVerifier
+from graph_stats import open_graph_statistics
+from resilience import (
+    DeadLetterQueue, execute_with_retry, execute_with_retry_async, classify_error, CONFLICT_STATUS_CODE,
+    WRITE_CREATED, WRITE_CONFLICT, WRITE_FAILED
+)
+from token_provider import AsyncTokenAdapter, cosmos_scope
+from taxonomy import flatten_taxonomy, TAXONOMY_VERTEX_TEMPLATES, ADD_CHILD_EDGE, CHILD_EDGE_LABEL
+from instrumentation import InstrumentedContainer, InstrumentedGremlinClient, METRICS
 
 # Initialize colorama for colored output
 init()
@@ -17,29 +31,121 @@ init()
 # Load environment variables from .env file
 load_dotenv()
 
+# Streaming ingestion settings
+DEFAULT_PAGE_SIZE = int(os.getenv("PAGE_SIZE", "100"))
+CONTINUATION_TOKEN_FILE = os.getenv("CONTINUATION_TOKEN_FILE", ".continuation_token")
+
+# Batched Gremlin write settings
+DEFAULT_BATCH_SIZE = int(os.getenv("GREMLIN_BATCH_SIZE", "25"))
+MAX_REQUEST_RU = float(os.getenv("GREMLIN_MAX_REQUEST_RU", "1000"))
+ESTIMATED_RU_PER_VERTEX = float(os.getenv("GREMLIN_RU_PER_VERTEX", "15"))
+
+# Concurrent pipeline settings
+DEFAULT_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", "1"))
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "16"))
+RU_BUDGET_PER_SECOND = float(os.getenv("RU_BUDGET_PER_SECOND", "0"))
+TAXONOMY_BATCH_SIZE = int(os.getenv("TAXONOMY_BATCH_SIZE", "50"))
+
+PERSON_LABEL = "person"
+
+def person_bindings(document):
+    return {
+        "vid": document["id"],
+        "vname": document["name"],
+        "vage": document["age"],
+        "vpk": document["pk"]
+    }
+
+
+ADD_PERSON = register_template(
+    "add_person",
+    "g.addV('person').property('id', vid).property('name', vname)"
+    ".property('age', vage).property('pk', vpk)",
+    ["vid", "vname", "vage", "vpk"],
+    binder=person_bindings
+)
+# Upsert form used for incremental sync, where a document may already have a vertex
+UPSERT_PERSON = register_template(
+    "upsert_person",
+    "g.V(vid).fold().coalesce(unfold(), addV('person').property('id', vid).property('pk', vpk))"
+    ".property('name', vname).property('age', vage)",
+    ["vid", "vname", "vage", "vpk"],
+    binder=person_bindings
+)
+# Vertex properties projected from a document; other fields only live in NoSQL
+PERSON_GRAPH_PROPERTIES = {"name": "vname", "age": "vage"}
+
+
+def update_person_template(keys):
+    """Template that rewrites only the given vertex properties of an existing person"""
+    script = "g.V(vid).has('pk', vpk)" + "".join(
+        f".property('{key}', {PERSON_GRAPH_PROPERTIES[key]})" for key in keys
+    )
+    params = ["vid", "vpk"] + [PERSON_GRAPH_PROPERTIES[key] for key in keys]
+    return register_template("update_person_" + "_".join(keys), script, params, binder=person_bindings)
+
+
+
+class RuBudget:
+    """Token bucket that paces writes to a provisioned RU/s budget (0 disables it)"""
+
+    def __init__(self, ru_per_second):
+        self.ru_per_second = ru_per_second
+        self.available = ru_per_second
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self, charge):
+        if self.ru_per_second <= 0:
+            return
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.available = min(
+                    self.ru_per_second,
+                    self.available + (now - self.updated) * self.ru_per_second
+                )
+                self.updated = now
+                if self.available >= charge or self.available >= self.ru_per_second:
+                    self.available -= charge
+                    return
+                await asyncio.sleep((charge - self.available) / self.ru_per_second)
+
 class DocumentProcessor:
-    def __init__(self):
-        # Managed Identity Credential
-        self.credential = DefaultAzureCredential()
+    def __init__(self, cosmos_client=None, gremlin_client=None, async_cosmos_factory=None):
+        # Clients can be injected (e.g. the local stand-ins); AAD tokens are only needed otherwise
+        self.gremlin_auth_uri = os.getenv("GREMLIN_AUTH_URI")
+        scopes = []
+        if cosmos_client is None:
+            scopes.append(cosmos_scope(os.getenv("COSMOS_ENDPOINT")))
+        if gremlin_client is None:
+            scopes.append(self.gremlin_auth_uri)
 
-        # Debug and print token details and managed identity client ID
-        try:
-            token = self.credential.get_token("https://management.azure.com/.default")
-            print(Fore.BLUE + f"Using Managed Identity: {token.token}")
-            print(Fore.BLUE + f"Token Expires On: {token.expires_on}")
-        except Exception as e:
-            print(Fore.RED + f"Error acquiring token: {e}")
+        # Managed Identity Credential, cached per scope, refreshed in the background and
+        # shared with every other client in the process
+        self.token_provider = CLIENTS.token_provider() if scopes else None
+        self.credential = self.token_provider
+
+        # Acquire the tokens up front, in parallel, instead of on the first requests
+        if scopes:
+            try:
+                self.token_provider.prefetch(*scopes)
+            except Exception as e:
+                print(Fore.RED + f"Error acquiring token: {e}")
 
         # Connecting to Cosmos DB
         try:
-            self.cosmos_client = CosmosClient(
-                url=os.getenv("COSMOS_ENDPOINT"),
+            self.cosmos_client = cosmos_client or CLIENTS.cosmos(
+                os.getenv("COSMOS_ENDPOINT"),
                 credential=self.credential
             )
+            # Opens the azure.cosmos.aio client used by the concurrent pipeline
+            self.async_cosmos_factory = async_cosmos_factory or getattr(cosmos_client, "async_client", None)
             self.database_name = os.getenv('DATABASE_NAME')
             self.container_name = os.getenv('CONTAINER_NAME')
             self.database = self.cosmos_client.get_database_client(self.database_name)
-            self.container = self.database.get_container_client(self.container_name)
+            # Every container call records its RU, latency and payload size
+            self.container = InstrumentedContainer(self.database.get_container_client(self.container_name))
             print(Fore.GREEN + f"Successfully connected to Cosmos DB: {self.container_name}")
         except Exception as e:
             print(Fore.RED + f"Error connecting to Cosmos DB: {e}")
@@ -48,28 +154,164 @@ class DocumentProcessor:
         # Connecting to Gremlin Client
         try:
             self.gremlin_endpoint = os.getenv("GREMLIN_ENDPOINT")
-            self.gremlin_auth_uri = os.getenv("GREMLIN_AUTH_URI")
             self.gremlin_database = os.getenv("GREMLIN_DATABASE")
             self.gremlin_collection = os.getenv("GREMLIN_COLLECTION")
 
-            self.gremlin_client = client.Client(
+            # The bearer-token password is rotated on refresh without dropping in-flight requests
+            self.gremlin_client = InstrumentedGremlinClient(gremlin_client or CLIENTS.gremlin(
                 self.gremlin_endpoint,
-                "g",
-                username=f"/dbs/{self.gremlin_database}/colls/{self.gremlin_collection}",
-                password=self._get_gremlin_password(),
-                message_serializer=serializer.GraphSONMessageSerializer()
-            )
+                self.gremlin_database,
+                self.gremlin_collection,
+                token_scope=self.gremlin_auth_uri
+            ))
             print(Fore.GREEN + "Successfully connected to Gremlin API")
         except Exception as e:
             print(Fore.RED + f"Error connecting to Gremlin API: {e}")
             sys.exit(1)
 
-    def _get_gremlin_password(self):
-        # Use managed identity to acquire the token for the Gremlin API
-        token = self.credential.get_token(self.gremlin_auth_uri).token
-        return f"Bearer {token}"
+        # Batched write state; the RU estimate adapts to observed request charges
+        self.ru_per_vertex = ESTIMATED_RU_PER_VERTEX
+        self.failed_documents = []
+        # Ids whose write conflicted: already in the graph, so never counted as new
+        self.conflicted_ids = set()
+
+        # Content hashes of documents already written, per source container and target graph;
+        # unchanged ones are skipped
+        self.hash_index = ContentHashIndex(HASH_INDEX_PATH, namespace=index_namespace(
+            "documents", os.getenv("COSMOS_ENDPOINT"), self.database_name, self.container_name,
+            self.gremlin_endpoint, self.gremlin_database, self.gremlin_collection
+        )) if HASH_INDEX_PATH else None
+        self.skipped_unchanged = 0
 
-    async def process_documents(self):
+        # Read-back checks run on a sample of written ids, never per document
+        self.verifier = GraphVerifier(self.gremlin_client)
+
+        # Writes that exhaust their throttling retries are kept here for replay
+        self.dead_letter = DeadLetterQueue()
+
+        # Label counts, partition keys and theme degrees, maintained on every write
+        self.stats = open_graph_statistics(self.cosmos_client, create=True)
+
+    def _load_continuation_token(self):
+        # Resume from the last fully processed page of an interrupted run
+        if os.path.exists(CONTINUATION_TOKEN_FILE):
+            with open(CONTINUATION_TOKEN_FILE, "r", encoding="utf-8") as f:
+                token = f.read().strip()
+            return token or None
+        return None
+
+    def _save_continuation_token(self, token):
+        # Write to a temp file first so a crash never leaves a truncated token
+        tmp_file = CONTINUATION_TOKEN_FILE + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            f.write(token)
+        os.replace(tmp_file, CONTINUATION_TOKEN_FILE)
+
+    def _clear_continuation_token(self):
+        if os.path.exists(CONTINUATION_TOKEN_FILE):
+            os.remove(CONTINUATION_TOKEN_FILE)
+
+    def iter_document_pages(self, max_item_count=DEFAULT_PAGE_SIZE, continuation_token=None):
+        """Yield (documents, continuation_token) one page at a time"""
+        pages = self.container.query_items(
+            query="SELECT * FROM c",
+            enable_cross_partition_query=True,
+            max_item_count=max_item_count
+        ).by_page(continuation_token)
+        for page in pages:
+            yield list(page), pages.continuation_token
+
+    def _plan_writes(self, documents):
+        """Split documents into new ones, per-property updates and hash-only refreshes"""
+        if self.hash_index is None:
+            return documents, {}, []
+        new, updates, refresh = [], {}, []
+        for document in documents:
+            try:
+                status, changed = self.hash_index.diff(document)
+            except KeyError:
+                # No id to index by; let the writer report the document
+                new.append(document)
+                continue
+            if status == "new":
+                new.append(document)
+            elif status == "changed":
+                keys = tuple(key for key in PERSON_GRAPH_PROPERTIES if key in changed)
+                if keys:
+                    updates.setdefault(keys, []).append(document)
+                else:
+                    # Only NoSQL-side fields changed, nothing to send to the graph
+                    refresh.append(document)
+            else:
+                self.skipped_unchanged += 1
+        return new, updates, refresh
+
+    def _succeeded(self, documents, failed_before):
+        failed_ids = {doc_id for doc_id, _ in self.failed_documents[failed_before:]}
+        return [doc for doc in documents if "id" in doc and doc["id"] not in failed_ids]
+
+    def _created(self, records, failed_before):
+        # Every template writes a deterministic id, so a record that conflicted was already in the
+        # graph; that 409 is the seen-check when there is no hash index to tell new records apart
+        return [r for r in self._succeeded(records, failed_before) if r["id"] not in self.conflicted_ids]
+
+    def _record_written(self, documents, failed_before, new=()):
+        written = self._succeeded(documents, failed_before)
+        self.verifier.observe(written)
+        if self.hash_index is not None and written:
+            self.hash_index.record_many(written)
+        self._record_stats(self._created(new, failed_before))
+
+    def _record_stats(self, vertices, edges=(), label=PERSON_LABEL):
+        # Only newly created vertices and edges change the counters; label None takes each record's own
+        if self.stats is None:
+            return
+        for vertex in vertices:
+            self.stats.record_vertex(label or vertex["label"], vertex.get("pk"), vertex["id"],
+                                     vertex.get("name"))
+        for edge in edges:
+            self.stats.record_edge(CHILD_EDGE_LABEL, edge["from"], edge["to"])
+        self.stats.flush()
+
+    def write_documents(self, documents, batch_size=DEFAULT_BATCH_SIZE, template=ADD_PERSON):
+        """Batch-write new documents and only the changed properties of known ones.
+
+        Returns how many documents were written to the graph; unchanged ones and those whose
+        changes are NoSQL-only are not.
+        """
+        failed_before = len(self.failed_documents)
+        new, updates, refresh = self._plan_writes(documents)
+        for batch in self._iter_batches(new, batch_size):
+            self.process_gremlin_batch(batch, template)
+        changed = [d for docs in updates.values() for d in docs]
+        for keys, batch_documents in updates.items():
+            for batch in self._iter_batches(batch_documents, batch_size):
+                self.process_gremlin_batch(batch, update_person_template(keys))
+        self._record_written(new + changed + refresh, failed_before, new)
+        return len(self._succeeded(new + changed, failed_before))
+
+    async def write_documents_async(self, documents, batch_size=DEFAULT_BATCH_SIZE, template=ADD_PERSON):
+        failed_before = len(self.failed_documents)
+        new, updates, refresh = self._plan_writes(documents)
+        for batch in self._iter_batches(new, batch_size):
+            await self.process_gremlin_batch_async(batch, template)
+        for keys, changed in updates.items():
+            for batch in self._iter_batches(changed, batch_size):
+                await self.process_gremlin_batch_async(batch, update_person_template(keys))
+        changed = [d for docs in updates.values() for d in docs]
+        # In sample mode the verifier may submit a lookup (and stats flush), so keep it off the event loop
+        await asyncio.to_thread(self._record_written, new + changed + refresh, failed_before, new)
+        return len(self._succeeded(new + changed, failed_before))
+
+    def _iter_batches(self, documents, batch_size):
+        # Cap the batch so its estimated charge stays under the per-request RU ceiling
+        ru_cap = max(1, int(MAX_REQUEST_RU // max(self.ru_per_vertex, 1)))
+        size = max(1, min(batch_size, ru_cap))
+        for start in range(0, len(documents), size):
+            yield documents[start:start + size]
+
+    async def process_documents(self, max_item_count=DEFAULT_PAGE_SIZE, resume=True,
+                                batch_size=DEFAULT_BATCH_SIZE):
         try:
             # Create a container if it does not exist
             container = self.database.create_container_if_not_exists(
@@ -81,43 +323,368 @@ class DocumentProcessor:
             print(Fore.RED + f"Error creating container: {e}")
             sys.exit(1)
 
+        continuation_token = self._load_continuation_token() if resume else None
+        if continuation_token:
+            print(Fore.BLUE + f"Resuming from saved continuation token in {CONTINUATION_TOKEN_FILE}")
+
+        # Stream documents page by page so only one page is held in memory
+        processed = 0
+        started = time.perf_counter()
         try:
-            # Load documents from Cosmos DB
-            query = "SELECT * FROM c"
-            documents = list(self.container.query_items(
-                query=query,
-                enable_cross_partition_query=True
-            ))
-            print(Fore.BLUE + f"Processing {len(documents)} documents...")
+            for documents, continuation_token in self.iter_document_pages(
+                max_item_count=max_item_count,
+                continuation_token=continuation_token
+            ):
+                # The Gremlin driver drives its own event loop, so blocking calls run off this one
+                if batch_size > 1:
+                    await asyncio.to_thread(self.write_documents, documents, batch_size)
+                else:
+                    for document in documents:
+                        await asyncio.to_thread(self.process_gremlin, document)
+                processed += len(documents)
+                print(Fore.BLUE + f"Processed {processed} documents...")
+
+                # Persist progress only after the whole page has been written
+                if continuation_token:
+                    self._save_continuation_token(continuation_token)
         except Exception as e:
             print(Fore.RED + f"Error querying documents: {e}")
             sys.exit(1)
 
-        # Process each document
-        for document in documents:
-            self.process_gremlin(document)
+        self._clear_continuation_token()
+        elapsed = time.perf_counter() - started
+        rate = processed / elapsed if elapsed > 0 else 0.0
+        print(Fore.GREEN + f"Finished processing {processed} documents in {elapsed:.2f}s "
+                           f"({rate:.1f} docs/s, batch_size={batch_size})")
+        await asyncio.to_thread(self.verifier.finish)
+        METRICS.report()
+        if self.skipped_unchanged:
+            print(Fore.BLUE + f"Skipped {self.skipped_unchanged} unchanged documents")
+        if self.failed_documents:
+            print(Fore.RED + f"{len(self.failed_documents)} documents failed:")
+            for doc_id, error in self.failed_documents:
+                print(Fore.RED + f"  {doc_id}: {error}")
+
+    def _record_charge(self, result_set, vertex_count):
+        # Track the observed RU per vertex so batches keep fitting under the ceiling
+        charge = result_set.status_attributes.get("x-ms-total-request-charge")
+        if charge is not None and vertex_count:
+            observed = float(charge) / vertex_count
+            self.ru_per_vertex = 0.8 * self.ru_per_vertex + 0.2 * observed
+
+    def _submit_and_wait(self, template, bindings):
+        # Gremlin errors (including 429s) only surface once the result stream is read. Every write
+        # returns the element it wrote, so no rows means a g.V() step found nothing and a chained
+        # batch stopped there: nothing after that step was written.
+        result_set = template.submit(self.gremlin_client, **bindings)
+        return result_set, result_set.all().result()
+
+    async def _submit_and_wait_async(self, template, bindings):
+        # A pooled connection opens on its first write by running the driver's own event
+        # loop, which cannot happen on a thread that is already running one
+        future = await asyncio.to_thread(template.submit_async, self.gremlin_client, **bindings)
+        result_set = await asyncio.wrap_future(future)
+        return result_set, await asyncio.wrap_future(result_set.all())
+
+    def _submit_vertex(self, document, template=ADD_PERSON):
+        # Write a single document, returning WRITE_CREATED, WRITE_CONFLICT or WRITE_FAILED instead of raising
+        try:
+            bindings = template.bind_document(document)
+            result_set, rows = execute_with_retry(
+                lambda: self._submit_and_wait(template, bindings),
+                op="gremlin.submit",
+                payload={"script": template.script, "bindings": bindings},
+                dead_letter=self.dead_letter
+            )
+            self._record_charge(result_set, 1)
+            if not rows:
+                self.failed_documents.append((document.get("id"), "vertex not found, nothing written"))
+                return WRITE_FAILED
+            return WRITE_CREATED
+        except GremlinServerError as e:
+            # Already in the graph, from an earlier run or from a failed batch that wrote it before
+            # aborting; the latter goes uncounted in the statistics until they are rebuilt
+            if classify_error(e)[0] == CONFLICT_STATUS_CODE:
+                self.conflicted_ids.add(document.get("id"))
+                return WRITE_CONFLICT
+            self.failed_documents.append((document.get("id"), str(e)))
+        except Exception as e:
+            self.failed_documents.append((document.get("id"), str(e)))
+        return WRITE_FAILED
+
+    def _batch_bindings(self, documents, template=ADD_PERSON):
+        try:
+            return template.bind_batch(documents)
+        except KeyError as e:
+            print(Fore.YELLOW + f"Batch has a document missing {e}, writing one by one")
+            return None
+
+    def _write_individually(self, documents, template=ADD_PERSON):
+        # Fall back to per-document writes so each failure is attributed to its document
+        return sum(1 for document in documents if self._submit_vertex(document, template) != WRITE_FAILED)
+
+    def process_gremlin_batch(self, documents, template=ADD_PERSON):
+        """Write several vertices in one traversal by chaining addV steps"""
+        # A batch of one is the single write, so it goes straight to _submit_vertex
+        bindings = self._batch_bindings(documents, template) if len(documents) > 1 else None
+        if bindings is not None:
+            try:
+                batched = template.batched(len(documents))
+                result_set, rows = execute_with_retry(lambda: self._submit_and_wait(batched, bindings))
+                self._record_charge(result_set, len(documents))
+                if rows:
+                    return len(documents)
+                print(Fore.YELLOW + f"Batch of {len(documents)} returned nothing, retrying one by one")
+            except Exception as e:
+                print(Fore.YELLOW + f"Batch of {len(documents)} failed ({e}), retrying one by one")
+
+        return self._write_individually(documents, template)
+
+    async def process_gremlin_batch_async(self, documents, template=ADD_PERSON):
+        """Submit a batch without blocking the event loop"""
+        # A batch of one is the single write, so it goes straight to _submit_vertex
+        bindings = self._batch_bindings(documents, template) if len(documents) > 1 else None
+        if bindings is not None:
+            try:
+                batched = template.batched(len(documents))
+                result_set, rows = await execute_with_retry_async(
+                    lambda: self._submit_and_wait_async(batched, bindings)
+                )
+                self._record_charge(result_set, len(documents))
+                if rows:
+                    return len(documents)
+                print(Fore.YELLOW + f"Batch of {len(documents)} returned nothing, retrying one by one")
+            except Exception as e:
+                print(Fore.YELLOW + f"Batch of {len(documents)} failed ({e}), retrying one by one")
+
+        return await asyncio.to_thread(self._write_individually, documents, template)
+
+    async def _write_batches_async(self, records, template, batch_size):
+        # Keep at most one batch in flight per pooled Gremlin connection
+        window = asyncio.Semaphore(GREMLIN_POOL_SIZE)
+
+        async def write(batch):
+            async with window:
+                return await self.process_gremlin_batch_async(batch, template)
+
+        written = await asyncio.gather(
+            *(write(batch) for batch in self._iter_batches(records, batch_size))
+        )
+        return sum(written)
+
+    def _existing_ids(self, records, lookup, batch_size):
+        # Ids among the records that are already in the graph; a failed lookup just means writing them
+        ids = [record["id"] for record in records]
+        existing = set()
+        for start in range(0, len(ids), batch_size):
+            template, bindings = lookup(ids[start:start + batch_size])
+            try:
+                _, rows = execute_with_retry(lambda: self._submit_and_wait(template, bindings))
+            except Exception as e:
+                print(Fore.YELLOW + f"Lookup of existing ids failed ({e}), writing them anyway")
+                continue
+            existing.update(rows)
+        return existing
+
+    async def process_document(self, document, batch_size=TAXONOMY_BATCH_SIZE):
+        """Write a nested taxonomy as vertices plus parent->child edges in batched traversals"""
+        started = time.perf_counter()
+        failed_before = len(self.failed_documents)
+        vertices, edges = flatten_taxonomy(document)
+        # Ids are deterministic, so on a re-ingest most records are already there. Writing them again
+        # would fail every batch with a 409 (logged by the driver) and retry it one by one
+        existing = await asyncio.to_thread(self._existing_ids, vertices, vertex_lookup, batch_size)
+        vertices = [v for v in vertices if v["id"] not in existing]
+        # An edge needs both of its vertices, so a tree with none in the graph has no edges there either
+        if existing:
+            existing_edges = await asyncio.to_thread(self._existing_ids, edges, edge_lookup, batch_size)
+            edges = [e for e in edges if e["id"] not in existing_edges]
+            print(Fore.BLUE + f"{len(existing)} vertices and {len(existing_edges)} edges already in the graph, "
+                              "skipped")
+
+        # Every vertex must exist before the edges that reference it are written
+        for label, template in TAXONOMY_VERTEX_TEMPLATES.items():
+            records = [v for v in vertices if v["label"] == label]
+            await self._write_batches_async(records, template, batch_size)
+        self.verifier.observe(self._succeeded(vertices, failed_before))
+        await self._write_batches_async(edges, ADD_CHILD_EDGE, batch_size)
+        await asyncio.to_thread(self._record_stats, self._created(vertices, failed_before),
+                                self._created(edges, failed_before), None)
+
+        failed = self.failed_documents[failed_before:]
+        elapsed = time.perf_counter() - started
+        print(Fore.GREEN + f"Wrote {len(vertices)} vertices and {len(edges)} edges in {elapsed:.2f}s")
+        for record_id, error in failed:
+            print(Fore.RED + f"  {record_id}: {error}")
+        await asyncio.to_thread(self.verifier.finish)
+        return not failed
+
+    @contextlib.asynccontextmanager
+    async def _async_cosmos_client(self):
+        if self.async_cosmos_factory is not None:
+            async with self.async_cosmos_factory() as cosmos:
+                yield cosmos
+            return
+        async with AsyncTokenAdapter(self.token_provider) as credential:
+            async with AsyncCosmosClient(os.getenv("COSMOS_ENDPOINT"), credential=credential) as cosmos:
+                yield cosmos
+
+    async def process_documents_concurrent(self, concurrency=DEFAULT_CONCURRENCY,
+                                           max_item_count=DEFAULT_PAGE_SIZE, resume=True,
+                                           batch_size=DEFAULT_BATCH_SIZE,
+                                           queue_size=PIPELINE_QUEUE_SIZE):
+        """Producer/consumer ingestion: one async Cosmos reader feeding N Gremlin submitters"""
+        # Every in-flight submission holds a pooled connection, and the driver blocks
+        # the calling thread when the pool is empty, so never exceed the pool size
+        concurrency = max(1, min(concurrency, GREMLIN_POOL_SIZE))
+        queue = asyncio.Queue(maxsize=queue_size)
+        window = asyncio.Semaphore(concurrency)
+        budget = RuBudget(RU_BUDGET_PER_SECOND)
+
+        # Pages finish out of order, so the continuation token is only saved once
+        # every page before it has been fully written
+        page_tokens = {}
+        pending_batches = {}
+        next_page_to_commit = 0
+        written = 0
+
+        def commit_ready_pages():
+            nonlocal next_page_to_commit
+            while pending_batches.get(next_page_to_commit) == 0:
+                token = page_tokens.pop(next_page_to_commit)
+                del pending_batches[next_page_to_commit]
+                if token:
+                    self._save_continuation_token(token)
+                next_page_to_commit += 1
+
+        def batch_done(page_no, count):
+            nonlocal written
+            written += count
+            pending_batches[page_no] -= 1
+            commit_ready_pages()
+
+        async def produce():
+            try:
+                await read_pages()
+            finally:
+                # Always signal the dispatcher so it drains and stops
+                await queue.put(None)
+
+        async def read_pages():
+            continuation_token = self._load_continuation_token() if resume else None
+            if continuation_token:
+                print(Fore.BLUE + f"Resuming from saved continuation token in {CONTINUATION_TOKEN_FILE}")
+            async with self._async_cosmos_client() as cosmos:
+                container = InstrumentedContainer(
+                    cosmos.get_database_client(self.database_name).get_container_client(self.container_name)
+                )
+                pages = container.query_items(
+                    query="SELECT * FROM c",
+                    max_item_count=max_item_count
+                ).by_page(continuation_token)
+                page_no = 0
+                async for page in pages:
+                    documents = [doc async for doc in page]
+                    batches = list(self._iter_batches(documents, batch_size))
+                    page_tokens[page_no] = pages.continuation_token
+                    pending_batches[page_no] = len(batches)
+                    commit_ready_pages()
+                    for batch in batches:
+                        # Blocks when writers fall behind: backpressure on the reader
+                        await queue.put((page_no, batch))
+                    page_no += 1
+
+        async def write(page_no, batch):
+            count = 0
+            try:
+                await budget.acquire(self.ru_per_vertex * len(batch))
+                count = await self.write_documents_async(batch, batch_size)
+            except Exception as e:
+                # Caught here: finished tasks are dropped by dispatch, so a raised error would be lost
+                print(Fore.RED + f"Batch of {len(batch)} from page {page_no} failed: {e}")
+                self.failed_documents.extend((document.get("id"), str(e)) for document in batch)
+            finally:
+                batch_done(page_no, count)
+                window.release()
+
+        async def dispatch():
+            in_flight = set()
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                await window.acquire()
+                task = asyncio.create_task(write(*item))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+            if in_flight:
+                await asyncio.gather(*in_flight)
+
+        started = time.perf_counter()
+        try:
+            await asyncio.gather(produce(), dispatch())
+        except Exception as e:
+            print(Fore.RED + f"Error in ingestion pipeline: {e}")
+            sys.exit(1)
+
+        self._clear_continuation_token()
+        elapsed = time.perf_counter() - started
+        rate = written / elapsed if elapsed > 0 else 0.0
+        print(Fore.GREEN + f"Finished processing, {written} documents written in {elapsed:.2f}s "
+                           f"({rate:.1f} docs/s, batch_size={batch_size}, concurrency={concurrency})")
+        await asyncio.to_thread(self.verifier.finish)
+        METRICS.report()
+        if self.skipped_unchanged:
+            print(Fore.BLUE + f"Skipped {self.skipped_unchanged} unchanged documents")
+        if self.failed_documents:
+            print(Fore.RED + f"{len(self.failed_documents)} documents failed:")
+            for doc_id, error in self.failed_documents:
+                print(Fore.RED + f"  {doc_id}: {error}")
 
     def process_gremlin(self, document):
-        # Interaction with Gremlin API
-        gremlin_queries = [
-            ("g.addV('person').property('id', '{id}').property('name', '{name}')"
-             ".property('age', {age}).property('pk', '{pk}')"
-            ).format(**document)
-        ]
-        for query in gremlin_queries:
-            callback = self.gremlin_client.submitAsync(query)
-            if callback.result() is not None:
-                print(Fore.GREEN + f"Result: {callback.result().all().result()}")
-            else:
-                print(Fore.RED + "Query failed to execute")
+        # Interaction with Gremlin API, one document per request; like write_documents, the hash
+        # index decides between adding the vertex, updating its changed properties or skipping it
+        failed_before = len(self.failed_documents)
+        new, updates, refresh = self._plan_writes([document])
+        if new:
+            status = self._submit_vertex(document)
+        elif updates:
+            (keys,) = updates
+            status = self._submit_vertex(document, update_person_template(keys))
+        elif refresh:
+            self._record_written(refresh, failed_before)
+            return
+        else:
+            print(Fore.BLUE + f"Vertex unchanged, skipped: {document.get('id')}")
+            return
+        if status == WRITE_CREATED:
+            print(Fore.GREEN + f"Vertex written: {document.get('id')}")
+        elif status == WRITE_CONFLICT:
+            print(Fore.BLUE + f"Vertex already exists: {document.get('id')}")
+        else:
+            print(Fore.RED + f"Query failed to execute for {document.get('id')}")
+            return
+        self._record_written([document], failed_before, new)
+
+    def replay_dead_letters(self):
+        """Re-submit Gremlin writes that previously exhausted their retries"""
+        return self.dead_letter.replay({
+            "gremlin.submit": lambda payload: self.gremlin_client.submit(
+                payload["script"], payload["bindings"]
+            ).all().result()
+        })
 
-        # Sample additional Gremlin query
-        gremlin_query = "g.V().has('pk', 'value')"
-        result = self.gremlin_client.submit(gremlin_query).all().result()
-        print(Fore.GREEN + f"Gremlin query result: {result}")
+    def close(self):
+        # Registry clients and the shared token provider are closed by CLIENTS at exit
+        self.gremlin_client.close()
+        if self.hash_index is not None:
+            self.hash_index.close()
 
-    def run(self):
-        asyncio.run(self.process_documents())
+    def run(self, concurrency=DEFAULT_CONCURRENCY):
+        if concurrency > 1:
+            asyncio.run(self.process_documents_concurrent(concurrency=concurrency))
+        else:
+            asyncio.run(self.process_documents())
 
 if __name__ == "__main__":
     processor = DocumentProcessor()
@@ -1,17 +1,55 @@
 # dual_api_schema.py
 
 import os
-from azure.cosmos import CosmosClient, PartitionKey
-from gremlin_python.driver import client, serializer
+from azure.cosmos import PartitionKey
 from dotenv import load_dotenv
+from client_registry import CLIENTS
+from gremlin_streaming import stream_results
+from partition_keys import partition_strategy
+from resilience import DeadLetterQueue, execute_with_retry
+
+# Large nested blobs are stored and returned but never filtered on, so indexing them
+# only adds write RU
+INDEX_EXCLUDED_PATHS = ['/techStack/*', '/analysis/*', '/properties/*']
+
+DUAL_API_INDEXING_POLICY = {
+    'indexingMode': 'consistent',
+    'automatic': True,
+    'includedPaths': [
+        {'path': '/*'},  # Index all remaining paths
+        {'path': '/label/?'},  # For Gremlin vertex labels
+        {'path': '/id/?'},     # For vertex IDs
+        {'path': '/type/?'}    # For entity type
+    ],
+    'excludedPaths': [{'path': path} for path in INDEX_EXCLUDED_PATHS] + [{'path': '/"_etag"/?'}],
+    # Serves the type + label filters (and ORDER BY label within a type) from one index
+    'compositeIndexes': [
+        [{'path': '/type', 'order': 'ascending'}, {'path': '/label', 'order': 'ascending'}]
+    ]
+}
+
+
+def _policy_signature(policy):
+    """The parts of a policy we tune; the service adds defaults to the rest"""
+    policy = policy or {}
+    excluded = {p['path'] for p in policy.get('excludedPaths', [])} - {'/"_etag"/?'}
+    composites = sorted(
+        tuple((entry['path'], entry.get('order', 'ascending')) for entry in composite)
+        for composite in policy.get('compositeIndexes', [])
+    )
+    return policy.get('indexingMode', 'consistent'), excluded, composites
+
 
 class DualApiSchema:
-    def __init__(self):
+    def __init__(self, cosmos_client=None, gremlin_client=None, partition_keys=None):
         load_dotenv()
-        self.cosmos_client = CosmosClient(
-            url=os.getenv("COSMOS_ENDPOINT"),
-            credential=str(os.getenv("COSMOS_KEY"))
+        # Injected clients (e.g. the local stand-ins) replace the live account
+        self.cosmos_client = cosmos_client or CLIENTS.cosmos(
+            os.getenv("COSMOS_ENDPOINT"), credential=str(os.getenv("COSMOS_KEY"))
         )
+        self.gremlin_client = gremlin_client
+        # Synthetic label + bucket keys by default, so no single label becomes a hot partition
+        self.partition_keys = partition_keys or partition_strategy()
 
     def create_dual_container(self):
         """Create container with dual API compatible schema"""
@@ -22,35 +60,29 @@ class DualApiSchema:
             )
 
             # Define container with partition key that works for both APIs
+            partition_key = self.partition_keys.partition_key()
             container_definition = {
                 'id': 'DualApiContainer',
-                'partitionKey': {
-                    'paths': ['/pk'],  # Universal partition key
-                    'kind': 'Hash'
-                },
-                'indexingPolicy': {
-                    'indexingMode': 'consistent',
-                    'includedPaths': [
-                        {'path': '/*'},  # Index all paths
-                        {'path': '/label/?'},  # For Gremlin vertex labels
-                        {'path': '/id/?'},     # For vertex IDs
-                        {'path': '/type/?'}    # For entity type
-                    ]
-                }
+                'partitionKey': dict(partition_key),  # /pk, or /label + /pk when hierarchical
+                'indexingPolicy': DUAL_API_INDEXING_POLICY
             }
 
             # Create container
             container = database.create_container_if_not_exists(
                 id=container_definition['id'],
-                partition_key=PartitionKey(path='/pk')
+                partition_key=partition_key,
+                indexing_policy=container_definition['indexingPolicy']
             )
+            self.check_partition_key(container, container_definition)
+            # An existing container keeps its old policy unless it is replaced
+            container = self.apply_indexing_policy(database, container, container_definition)
 
             # Example vertex schema
             sample_vertex = {
                 "id": "theme-1",
                 "label": "Central_Theme",  # Gremlin label
                 "type": "vertex",         # Entity type
-                "pk": "central_theme",    # Partition key
+                # Partition key "pk" is assigned by the strategy, e.g. "Central_Theme-07"
                 "properties": {
                     "name": "Economic Growth",
                     "category": "Macro",
@@ -63,7 +95,6 @@ class DualApiSchema:
                 "id": "relationship-1",
                 "label": "INFLUENCES",    # Gremlin edge label
                 "type": "edge",          # Entity type
-                "pk": "relationship",    # Partition key
                 "properties": {
                     "weight": 0.8,
                     "direction": "outbound"
@@ -72,9 +103,14 @@ class DualApiSchema:
                 "_toId": "theme-2"       # Target vertex
             }
 
-            # Insert samples
-            container.upsert_item(sample_vertex)
-            container.upsert_item(sample_edge)
+            # Insert samples, retrying throttled writes
+            dead_letter = DeadLetterQueue()
+            for item in (sample_vertex, sample_edge):
+                self.partition_keys.assign(item)
+                execute_with_retry(
+                    lambda: container.upsert_item(item),
+                    op="cosmos.upsert_item", payload=item, dead_letter=dead_letter
+                )
 
             print("Dual API container created with schema")
             return container
@@ -83,6 +119,34 @@ class DualApiSchema:
             print(f"Error creating schema: {e}")
             return None
 
+    def check_partition_key(self, container, container_definition):
+        """Warn when an existing container was created with other partition key paths"""
+        current = container.read()['partitionKey']['paths']
+        desired = container_definition['partitionKey']['paths']
+        if current != desired:
+            # The key paths of a container are fixed; only a copy into a new container changes them
+            print(f"Container '{container_definition['id']}' is partitioned on {current}, not {desired}; "
+                  "run partition_migration.py to copy it into a container with the new key")
+        return current == desired
+
+    def apply_indexing_policy(self, database, container, container_definition):
+        """Replace the container's indexing policy when it differs from the definition"""
+        desired = container_definition['indexingPolicy']
+        properties = container.read()
+        if _policy_signature(properties.get('indexingPolicy')) == _policy_signature(desired):
+            return container
+        # The service re-indexes in the background using spare throughput; the key cannot change
+        current_key = properties['partitionKey']
+        container = database.replace_container(
+            container,
+            partition_key=PartitionKey(path=current_key['paths'] if len(current_key['paths']) > 1
+                                       else current_key['paths'][0],
+                                       kind=current_key.get('kind', 'Hash')),
+            indexing_policy=desired
+        )
+        print(f"Indexing policy of '{container_definition['id']}' updated")
+        return container
+
     def validate_schema(self, container):
         """Validate schema works with both APIs"""
         try:
@@ -94,18 +158,13 @@ class DualApiSchema:
             print(f"NoSQL API found {len(items)} vertices")
 
             # Test Gremlin query
-            gremlin_client = client.Client(
-                os.getenv("GREMLIN_ENDPOINT"),
-                'g',
-                username=f"/dbs/DualApiDB/colls/DualApiContainer",
-                password=os.getenv("GREMLIN_PRIMARY_KEY"),
-                message_serializer=serializer.GraphSONSerializersV2d0()
+            gremlin_client = self.gremlin_client or CLIENTS.gremlin(
+                database="DualApiDB", collection="DualApiContainer",
+                password=os.getenv("GREMLIN_PRIMARY_KEY")
             )
             
-            result = gremlin_client.submit("g.V().count()").all().result()
+            result = list(stream_results(gremlin_client, "g.V().count()"))
             print(f"Gremlin API found {result[0]} vertices")
-            
-            gremlin_client.close()
             return True
 
         except Exception as e:
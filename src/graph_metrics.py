@@ -0,0 +1,186 @@
+"""
+Whole-graph metrics over a local CSR snapshot, computed with NumPy/SciPy sparse
+
+Everything analyze_graph asks the Gremlin API for, plus the questions that would
+be too expensive to ask it, computed in bulk over the memory-mapped snapshot
+written by graph_snapshot.py: label counts, degrees and their distributions,
+weakly connected components, PageRank and k-hop neighbourhood sizes. No step
+loops over vertices in Python; each is a handful of array or sparse-matrix
+operations.
+"""
+
+import os
+import time
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+from colorama import Fore, init
+from dotenv import load_dotenv
+from graph_snapshot import GraphSnapshot, SNAPSHOT_DIR
+from taxonomy import ROOT_LABEL
+
+# Initialize colorama for colored output
+init()
+
+# Load environment variables from .env file
+load_dotenv()
+
+PAGERANK_DAMPING = float(os.getenv("PAGERANK_DAMPING", "0.85"))
+PAGERANK_TOLERANCE = float(os.getenv("PAGERANK_TOLERANCE", "1e-10"))
+PAGERANK_MAX_ITERATIONS = int(os.getenv("PAGERANK_MAX_ITERATIONS", "100"))
+NEIGHBOURHOOD_HOPS = int(os.getenv("NEIGHBOURHOOD_HOPS", "2"))
+
+
+class GraphMetrics:
+    """Bulk metrics over a GraphSnapshot; the sparse matrices are built once and reused"""
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self._adjacency = None
+        self._undirected = None
+
+    @property
+    def adjacency(self):
+        """Directed adjacency A[source, target] = number of edges, sharing the snapshot's CSR arrays"""
+        if self._adjacency is None:
+            s = self.snapshot
+            data = np.ones(s.edge_count, dtype=np.float64)
+            self._adjacency = sparse.csr_matrix((data, s.out_indices, s.out_indptr),
+                                                shape=(s.vertex_count, s.vertex_count))
+        return self._adjacency
+
+    @property
+    def undirected(self):
+        """Boolean A + A^T, for traversals that follow edges both ways"""
+        if self._undirected is None:
+            a = self.adjacency.astype(bool)
+            self._undirected = (a + a.T).tocsr()
+        return self._undirected
+
+    # Counts and degrees
+
+    def vertex_counts_by_label(self):
+        """Same result as g.V().groupCount().by(label)"""
+        labels = np.asarray(self.snapshot.vertex_label)
+        counts = np.bincount(labels[labels >= 0], minlength=len(self.snapshot.labels))
+        return {label: int(n) for label, n in zip(self.snapshot.labels, counts) if n}
+
+    def edge_counts_by_label(self):
+        counts = np.bincount(np.asarray(self.snapshot.out_label), minlength=len(self.snapshot.edge_labels))
+        return {label: int(n) for label, n in zip(self.snapshot.edge_labels, counts) if n}
+
+    def degrees(self, direction="both"):
+        """Edges per vertex; "both" matches both().count(), which sees a self-loop twice"""
+        out_degree = np.diff(self.snapshot.out_indptr)
+        in_degree = np.diff(self.snapshot.in_indptr)
+        return {"out": out_degree, "in": in_degree, "both": out_degree + in_degree}[direction]
+
+    def degree_distribution(self, direction="both", label=None):
+        """{degree: number of vertices}, optionally for the vertices of one label"""
+        degrees = self.degrees(direction)
+        if label is not None:
+            degrees = degrees[self._label_mask(label)]
+        counts = np.bincount(degrees) if len(degrees) else np.zeros(0, dtype=np.int64)
+        present = np.nonzero(counts)[0]
+        return dict(zip(present.tolist(), counts[present].tolist()))
+
+    def _label_mask(self, label):
+        code = self.snapshot.label_code(label)
+        if code is None:
+            return np.zeros(self.snapshot.vertex_count, dtype=bool)
+        return np.asarray(self.snapshot.vertex_label) == code
+
+    def _names(self, vertices):
+        if "name" in self.snapshot.meta["properties"]:
+            return [self.snapshot.property_value("name", v) for v in vertices]
+        return [self.snapshot.ids[v] for v in vertices]
+
+    def theme_connections(self, label=ROOT_LABEL):
+        """Same result as g.V().hasLabel(label)
+        .project('theme', 'connections').by('name').by(both().count())"""
+        themes = np.nonzero(self._label_mask(label))[0]
+        degrees = self.degrees("both")[themes]
+        return [{"theme": name, "connections": int(degree)}
+                for name, degree in zip(self._names(themes), degrees)]
+
+    # Structure
+
+    def connected_components(self):
+        """(component count, component number per vertex) of the weakly connected components"""
+        return connected_components(self.adjacency, directed=True, connection="weak")
+
+    def component_sizes(self):
+        """Component sizes, largest first"""
+        _, components = self.connected_components()
+        return np.sort(np.bincount(components))[::-1]
+
+    def pagerank(self, damping=PAGERANK_DAMPING, tolerance=PAGERANK_TOLERANCE,
+                 max_iterations=PAGERANK_MAX_ITERATIONS):
+        """PageRank by power iteration; rank of dangling vertices is spread uniformly"""
+        n = self.snapshot.vertex_count
+        if n == 0:
+            return np.zeros(0)
+        out_degree = np.asarray(self.adjacency.sum(axis=1)).ravel()
+        dangling = out_degree == 0
+        inverse = np.divide(1.0, out_degree, out=np.zeros(n), where=~dangling)
+        # Column-stochastic transition matrix, so one iteration is a single sparse mat-vec
+        transition = (sparse.diags(inverse) @ self.adjacency).T.tocsr()
+        rank = np.full(n, 1.0 / n)
+        for _ in range(max_iterations):
+            previous = rank
+            rank = damping * (transition @ rank + rank[dangling].sum() / n) + (1 - damping) / n
+            if np.abs(rank - previous).sum() < tolerance:
+                break
+        return rank
+
+    def k_hop_counts(self, vertices, hops=NEIGHBOURHOOD_HOPS):
+        """Distinct vertices within `hops` undirected edges of each given vertex, itself excluded.
+
+        All seeds advance together: row i of the reach matrix is seed i's neighbourhood.
+        """
+        vertices = np.asarray(vertices, dtype=np.int64)
+        n = self.snapshot.vertex_count
+        reach = sparse.csr_matrix((np.ones(len(vertices), dtype=bool), (np.arange(len(vertices)), vertices)),
+                                  shape=(len(vertices), n))
+        frontier = reach
+        for _ in range(hops):
+            frontier = (frontier @ self.undirected).astype(bool)
+            # Only vertices reached for the first time expand on the next hop
+            frontier = (frontier > reach).astype(bool)
+            if frontier.nnz == 0:
+                break
+            reach = (reach + frontier).astype(bool)
+        return np.diff(reach.indptr) - 1
+
+    def rank_themes(self, label=ROOT_LABEL, hops=NEIGHBOURHOOD_HOPS):
+        """Vertices of `label` ordered by PageRank, with their degree and k-hop neighbourhood"""
+        themes = np.nonzero(self._label_mask(label))[0]
+        rank = self.pagerank()[themes]
+        degrees = self.degrees("both")[themes]
+        neighbourhood = self.k_hop_counts(themes, hops)
+        order = np.argsort(-rank, kind="stable")
+        names = self._names(themes[order])
+        return [{"theme": name, "pagerank": float(rank[i]), "connections": int(degrees[i]),
+                 f"within_{hops}_hops": int(neighbourhood[i])} for name, i in zip(names, order)]
+
+
+def _timed(name, compute):
+    started = time.perf_counter()
+    result = compute()
+    print(Fore.GREEN + f"\n✓ {name} ({(time.perf_counter() - started) * 1000:.1f} ms):")
+    return result
+
+
+if __name__ == "__main__":
+    # The analyze_graph report, from the local snapshot instead of live traversals
+    metrics = GraphMetrics(GraphSnapshot(SNAPSHOT_DIR))
+    print(Fore.CYAN + f"Snapshot {SNAPSHOT_DIR}: {metrics.snapshot.vertex_count} vertices, "
+                      f"{metrics.snapshot.edge_count} edges")
+    print(f"  {_timed('vertex_counts_by_label', metrics.vertex_counts_by_label)}")
+    print(f"  {_timed('edge_counts_by_label', metrics.edge_counts_by_label)}")
+    for row in _timed("theme_connections", metrics.theme_connections):
+        print(f"  {row['theme']}: {row['connections']}")
+    sizes = _timed("connected_components", metrics.component_sizes)
+    print(f"  {len(sizes)} components, largest {sizes[:5].tolist()}")
+    for row in _timed("theme ranking", metrics.rank_themes)[:10]:
+        print(f"  {row}")
@@ -0,0 +1,305 @@
+"""
+Export the graph from the dual container into a memory-mapped CSR snapshot
+
+Vertices and edges are paged out through the NoSQL API, not Gremlin: edges are
+read from their _fromId/_toId (DualApiSchema documents) or _vertexId/_sink
+(documents the Gremlin API wrote), so the export costs one cross-partition scan
+instead of per-vertex traversals. Ids and labels are interned to integers and
+the adjacency is written in CSR form, out-edges and in-edges, as .npy files.
+
+Layout of a snapshot directory:
+    meta.json                       counts, label names, property columns
+    ids_data.npy, ids_offsets.npy   vertex id strings, vertex i = data[offsets[i]:offsets[i + 1]]
+    ids_sorted.npy                  vertex numbers ordered by id, for binary-search lookups
+    vertex_label.npy                label number per vertex (-1 when only seen as an endpoint)
+    out_indptr.npy, out_indices.npy, out_label.npy    out-edges per vertex, with edge labels
+    in_indptr.npy, in_indices.npy, in_label.npy       in-edges per vertex
+    prop_<name>.npy                 float64 column (NaN when missing), or int32 codes into
+    prop_<name>_data/_offsets.npy   a string table (-1 when missing)
+
+GraphSnapshot opens every array with np.load(mmap_mode="r"), so opening is
+independent of graph size and pages are only read when touched.
+"""
+
+import os
+import json
+import time
+import shutil
+from array import array
+import numpy as np
+from colorama import Fore, init
+from dotenv import load_dotenv
+from client_registry import CLIENTS
+
+# Initialize colorama for colored output
+init()
+
+# Load environment variables from .env file
+load_dotenv()
+
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "graph_snapshot")
+SNAPSHOT_DATABASE = os.getenv("SNAPSHOT_DATABASE", "DualApiDB")
+SNAPSHOT_CONTAINER = os.getenv("SNAPSHOT_CONTAINER", "DualApiContainer")
+SNAPSHOT_PAGE_SIZE = int(os.getenv("SNAPSHOT_PAGE_SIZE", "1000"))
+# Vertex properties exported as columns
+SNAPSHOT_PROPERTIES = [p for p in os.getenv("SNAPSHOT_PROPERTIES", "name,weight,category").split(",") if p]
+# Run against the in-memory stand-in instead of the live account
+SNAPSHOT_STANDIN = os.getenv("SNAPSHOT_STANDIN", "false").lower() == "true"
+SNAPSHOT_FORMAT_VERSION = 1
+
+
+def _edge_endpoints(document):
+    """(source id, target id) of an edge document, None for anything else"""
+    if document.get("_isEdge"):
+        return document.get("_vertexId"), document.get("_sink")
+    if document.get("type") == "edge" and "_fromId" in document:
+        return document["_fromId"], document.get("_toId")
+    return None
+
+
+def _property(document, name):
+    """A vertex property from the schema's properties object, a Gremlin value list or the top level"""
+    nested = document.get("properties")
+    if isinstance(nested, dict) and name in nested:
+        return nested[name]
+    value = document.get(name)
+    if isinstance(value, list) and value and isinstance(value[0], dict) and "_value" in value[0]:
+        return value[0]["_value"]
+    return value if isinstance(value, (str, int, float)) else None
+
+
+def _save_strings(directory, name, strings):
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    np.save(os.path.join(directory, f"{name}_offsets.npy"), offsets)
+    np.save(os.path.join(directory, f"{name}_data.npy"), np.frombuffer(b"".join(encoded), dtype=np.uint8))
+
+
+class StringTable:
+    """Memory-mapped list of strings written by _save_strings"""
+
+    def __init__(self, directory, name):
+        self.offsets = np.load(os.path.join(directory, f"{name}_offsets.npy"), mmap_mode="r")
+        self.data = np.load(os.path.join(directory, f"{name}_data.npy"), mmap_mode="r")
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return bytes(self.data[self.offsets[i]:self.offsets[i + 1]]).decode("utf-8")
+
+
+def _csr(keys, values, labels, size, index_dtype):
+    """Group (key -> value, label) pairs by key into indptr/indices/labels arrays"""
+    order = np.argsort(keys, kind="stable")
+    indptr = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=size), out=indptr[1:])
+    return indptr, values[order].astype(index_dtype), labels[order]
+
+
+class SnapshotExporter:
+    """Streams graph documents out of a container and writes a snapshot directory"""
+
+    def __init__(self, container, properties=SNAPSHOT_PROPERTIES, page_size=SNAPSHOT_PAGE_SIZE):
+        self.container = container
+        self.properties = list(properties)
+        self.page_size = page_size
+
+    def _intern(self, vertex_id):
+        number = self.vertex_numbers.get(vertex_id)
+        if number is None:
+            number = self.vertex_numbers[vertex_id] = len(self.vertex_ids)
+            self.vertex_ids.append(vertex_id)
+            self.vertex_labels.append(-1)
+            for column in self.columns.values():
+                column.append(None)
+        return number
+
+    def _label(self, names, numbers, label):
+        number = numbers.get(label)
+        if number is None:
+            number = numbers[label] = len(names)
+            names.append(label)
+        return number
+
+    def _read(self):
+        self.vertex_numbers, self.vertex_ids, self.vertex_labels = {}, [], array("h")
+        self.label_names, self.label_numbers = [], {}
+        self.edge_label_names, self.edge_label_numbers = [], {}
+        self.columns = {name: [] for name in self.properties}
+        self.sources, self.targets, self.edge_labels = array("q"), array("q"), array("h")
+        self.skipped = 0
+
+        pages = self.container.query_items(
+            query="SELECT * FROM c", enable_cross_partition_query=True, max_item_count=self.page_size
+        ).by_page()
+        for page in pages:
+            for document in page:
+                endpoints = _edge_endpoints(document)
+                if endpoints is not None:
+                    source, target = endpoints
+                    if source is None or target is None:
+                        self.skipped += 1
+                        continue
+                    self.sources.append(self._intern(source))
+                    self.targets.append(self._intern(target))
+                    self.edge_labels.append(self._label(
+                        self.edge_label_names, self.edge_label_numbers, document.get("label", "")
+                    ))
+                elif "label" in document and "id" in document:
+                    number = self._intern(document["id"])
+                    self.vertex_labels[number] = self._label(self.label_names, self.label_numbers,
+                                                             document["label"])
+                    for name, column in self.columns.items():
+                        column[number] = _property(document, name)
+                else:
+                    # Plain NoSQL documents that are not part of the graph
+                    self.skipped += 1
+
+    def _write_columns(self, directory):
+        meta = {}
+        for name, column in self.columns.items():
+            present = [v for v in column if v is not None]
+            if present and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in present):
+                np.save(os.path.join(directory, f"prop_{name}.npy"),
+                        np.array([np.nan if v is None else v for v in column], dtype=np.float64))
+                meta[name] = "float64"
+            else:
+                values, codes = {}, np.full(len(column), -1, dtype=np.int32)
+                for i, v in enumerate(column):
+                    if v is not None:
+                        codes[i] = values.setdefault(str(v), len(values))
+                np.save(os.path.join(directory, f"prop_{name}.npy"), codes)
+                _save_strings(directory, f"prop_{name}", list(values))
+                meta[name] = "string"
+        return meta
+
+    def export(self, path=SNAPSHOT_DIR):
+        """Write the snapshot to `path` (replacing an older one) and return its metadata"""
+        started = time.perf_counter()
+        self._read()
+        read_elapsed = time.perf_counter() - started
+
+        vertex_count, edge_count = len(self.vertex_ids), len(self.sources)
+        index_dtype = np.int32 if vertex_count < 2 ** 31 else np.int64
+        sources = np.frombuffer(self.sources, dtype=np.int64) if edge_count else np.zeros(0, np.int64)
+        targets = np.frombuffer(self.targets, dtype=np.int64) if edge_count else np.zeros(0, np.int64)
+        labels = np.frombuffer(self.edge_labels, dtype=np.int16) if edge_count else np.zeros(0, np.int16)
+
+        # Written next to the target and swapped in, so readers never see a partial snapshot
+        tmp = path.rstrip("/\\") + ".tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        _save_strings(tmp, "ids", self.vertex_ids)
+        np.save(os.path.join(tmp, "ids_sorted.npy"),
+                np.array(sorted(range(vertex_count), key=self.vertex_ids.__getitem__), dtype=index_dtype))
+        np.save(os.path.join(tmp, "vertex_label.npy"), np.frombuffer(self.vertex_labels, dtype=np.int16)
+                if vertex_count else np.zeros(0, np.int16))
+        for direction, keys, values in (("out", sources, targets), ("in", targets, sources)):
+            indptr, indices, edge_labels = _csr(keys, values, labels, vertex_count, index_dtype)
+            np.save(os.path.join(tmp, f"{direction}_indptr.npy"), indptr)
+            np.save(os.path.join(tmp, f"{direction}_indices.npy"), indices)
+            np.save(os.path.join(tmp, f"{direction}_label.npy"), edge_labels)
+        meta = {
+            "format_version": SNAPSHOT_FORMAT_VERSION,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "vertex_count": vertex_count,
+            "edge_count": edge_count,
+            "labels": self.label_names,
+            "edge_labels": self.edge_label_names,
+            "properties": self._write_columns(tmp),
+            "skipped_documents": self.skipped
+        }
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp, path)
+
+        elapsed = time.perf_counter() - started
+        print(Fore.GREEN + f"Snapshot of {vertex_count} vertices and {edge_count} edges written to {path} "
+                           f"in {elapsed:.2f}s ({read_elapsed:.2f}s reading)")
+        if self.skipped:
+            print(Fore.BLUE + f"{self.skipped} documents were not graph elements and were skipped")
+        return meta
+
+
+class GraphSnapshot:
+    """Read-only view of a snapshot directory; every array is memory-mapped"""
+
+    def __init__(self, path=SNAPSHOT_DIR):
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta["format_version"] != SNAPSHOT_FORMAT_VERSION:
+            raise ValueError(f"Snapshot format {self.meta['format_version']} is not supported")
+
+        def load(name):
+            return np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+
+        self.path = path
+        self.vertex_count = self.meta["vertex_count"]
+        self.edge_count = self.meta["edge_count"]
+        self.labels = self.meta["labels"]
+        self.edge_labels = self.meta["edge_labels"]
+        self.ids = StringTable(path, "ids")
+        self.ids_sorted = load("ids_sorted")
+        self.vertex_label = load("vertex_label")
+        self.out_indptr, self.out_indices = load("out_indptr"), load("out_indices")
+        self.in_indptr, self.in_indices = load("in_indptr"), load("in_indices")
+        # Edge label number per entry of out_indices / in_indices
+        self.out_label, self.in_label = load("out_label"), load("in_label")
+        self._columns = {}
+
+    def index_of(self, vertex_id):
+        """Vertex number of an id by binary search over the sorted order, or None"""
+        low, high = 0, self.vertex_count
+        while low < high:
+            middle = (low + high) // 2
+            if self.ids[self.ids_sorted[middle]] < vertex_id:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.vertex_count and self.ids[self.ids_sorted[low]] == vertex_id:
+            return int(self.ids_sorted[low])
+        return None
+
+    def label_code(self, label):
+        return self.labels.index(label) if label in self.labels else None
+
+    def out_neighbors(self, vertex):
+        return self.out_indices[self.out_indptr[vertex]:self.out_indptr[vertex + 1]]
+
+    def in_neighbors(self, vertex):
+        return self.in_indices[self.in_indptr[vertex]:self.in_indptr[vertex + 1]]
+
+    def property(self, name):
+        """A property column: float64 values, or (codes, StringTable) for strings"""
+        if name not in self._columns:
+            kind = self.meta["properties"][name]
+            codes = np.load(os.path.join(self.path, f"prop_{name}.npy"), mmap_mode="r")
+            if kind != "float64":
+                codes = (codes, StringTable(self.path, f"prop_{name}"))
+            self._columns[name] = codes
+        return self._columns[name]
+
+    def property_value(self, name, vertex):
+        column = self.property(name)
+        if isinstance(column, tuple):
+            codes, strings = column
+            return strings[codes[vertex]] if codes[vertex] >= 0 else None
+        value = float(column[vertex])
+        return None if np.isnan(value) else value
+
+
+if __name__ == "__main__":
+    if SNAPSHOT_STANDIN:
+        from cosmos_standin import CosmosStandIn
+        cosmos_client = CosmosStandIn()
+    else:
+        cosmos_client = CLIENTS.cosmos()
+    container = cosmos_client.get_database_client(SNAPSHOT_DATABASE).get_container_client(SNAPSHOT_CONTAINER)
+    SnapshotExporter(container).export(SNAPSHOT_DIR)
+    started = time.perf_counter()
+    snapshot = GraphSnapshot(SNAPSHOT_DIR)
+    print(Fore.CYAN + f"Opened in {(time.perf_counter() - started) * 1000:.1f} ms: "
+                      f"{snapshot.vertex_count} vertices, {snapshot.edge_count} edges")
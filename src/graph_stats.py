@@ -0,0 +1,308 @@
+"""
+Materialized graph statistics, kept up to date by the writers instead of scanned for
+
+Every writer records the vertices and edges it adds, and the deltas are applied
+with Cosmos patch "incr" operations to a few summary documents. Dashboards then
+get label counts, edge labels, partition key cardinality and Central_Theme
+degrees from a handful of point reads, not from g.V().groupCount() style
+full-graph scans whose RU grows with the graph.
+
+Statistics are opt-in: set GRAPH_STATS_CONTAINER to the container to keep them in.
+Writers create it when missing; readers only open it and treat a missing container
+as "no statistics".
+
+Documents in the stats container (partitioned on /id):
+    graph-summary       vertex and edge counts by label, partition key cardinality
+    theme-degrees|<n>   names and degrees (both().count()) of the Central_Themes in shard n
+    pk-counts|<n>       vertices per partition key value in shard n, to tell when a value is new
+
+Partition key values and themes are spread over GRAPH_STATS_SHARDS documents by a
+hash of the value, so no document grows past the item size limit and one patch
+request carries up to ten counters of a shard. Changing the shard count needs a
+rebuild().
+
+Counters assume every vertex and edge is recorded once, when it is first written.
+rebuild() recomputes them from the graph, e.g. after deleting part of it.
+"""
+
+import os
+import zlib
+import threading
+from collections import Counter
+from azure.cosmos import PartitionKey, exceptions
+from colorama import Fore, init
+from dotenv import load_dotenv
+from gremlin_templates import register_template
+from instrumentation import InstrumentedContainer
+from resilience import execute_with_retry
+from taxonomy import ROOT_LABEL
+
+# Initialize colorama for colored output
+init()
+
+# Load environment variables from .env file
+load_dotenv()
+
+GRAPH_STATS_DATABASE = os.getenv("GRAPH_STATS_DATABASE", os.getenv("GREMLIN_DATABASE") or "DualApiDB")
+# Container of the summary documents; empty (the default) disables statistics
+GRAPH_STATS_CONTAINER = os.getenv("GRAPH_STATS_CONTAINER", "")
+# Documents the partition key counters and theme degrees are each spread over
+GRAPH_STATS_SHARDS = int(os.getenv("GRAPH_STATS_SHARDS", "16"))
+SUMMARY_ID = "graph-summary"
+THEME_DEGREES_PREFIX = "theme-degrees|"
+PARTITION_KEY_COUNTS_PREFIX = "pk-counts|"
+# Operations the service accepts in one patch request
+PATCH_MAX_OPERATIONS = 10
+
+# Full-graph scans, only run by rebuild()
+VERTEX_COUNTS_BY_LABEL = register_template("graph_stats.vertex_counts", "g.V().groupCount().by(label)", [])
+EDGE_COUNTS_BY_LABEL = register_template("graph_stats.edge_counts", "g.E().groupCount().by(label)", [])
+VERTEX_COUNTS_BY_PK = register_template("graph_stats.pk_counts", "g.V().has('pk').groupCount().by('pk')", [])
+THEME_DEGREES = register_template(
+    "graph_stats.theme_degrees",
+    f"g.V().hasLabel('{ROOT_LABEL}').project('id', 'name', 'degree').by(id).by('name').by(both().count())",
+    []
+)
+
+
+def _segment(name):
+    # JSON pointer escapes, so labels and ids may contain "/" or "~"
+    return str(name).replace("~", "~0").replace("/", "~1")
+
+
+def _shard(value, shards=GRAPH_STATS_SHARDS):
+    # crc32 rather than hash(), which differs between processes
+    return zlib.crc32(str(value).encode("utf-8")) % shards
+
+
+def _empty_document(doc_id):
+    if doc_id == SUMMARY_ID:
+        return {"id": SUMMARY_ID, "vertexCount": 0, "edgeCount": 0, "partitionKeyCount": 0,
+                "vertexCounts": {}, "edgeCounts": {}}
+    if doc_id.startswith(THEME_DEGREES_PREFIX):
+        return {"id": doc_id, "names": {}, "degrees": {}}
+    return {"id": doc_id, "counts": {}}
+
+
+class GraphStatistics:
+    """Buffers vertex/edge deltas from writers and applies them to the summary documents"""
+
+    def __init__(self, container, shards=GRAPH_STATS_SHARDS):
+        self.container = container
+        self.shards = max(1, shards)
+        self.lock = threading.Lock()
+        self._reset()
+        # Degrees are kept for known themes only
+        self.themes = set(self.theme_degrees())
+
+    def _reset(self):
+        self.vertex_deltas = Counter()
+        self.edge_deltas = Counter()
+        self.pk_deltas = Counter()
+        self.degree_deltas = Counter()
+        self.new_themes = {}
+
+    # Recording
+
+    def record_vertex(self, label, pk=None, vertex_id=None, name=None):
+        with self.lock:
+            self.vertex_deltas[label] += 1
+            if pk is not None:
+                self.pk_deltas[str(pk)] += 1
+            if label == ROOT_LABEL and vertex_id is not None and vertex_id not in self.themes:
+                self.themes.add(vertex_id)
+                self.new_themes[vertex_id] = name
+
+    def record_edge(self, label, from_id, to_id):
+        with self.lock:
+            self.edge_deltas[label] += 1
+            # both().count() sees the edge from either end
+            for vertex_id in (from_id, to_id):
+                if vertex_id in self.themes:
+                    self.degree_deltas[vertex_id] += 1
+
+    # Applying
+
+    def _patch(self, doc_id, operations):
+        """Apply operations in requests of at most ten; returns the document after each request"""
+        documents = []
+        for start in range(0, len(operations), PATCH_MAX_OPERATIONS):
+            chunk = operations[start:start + PATCH_MAX_OPERATIONS]
+            try:
+                document = execute_with_retry(lambda: self.container.patch_item(
+                    doc_id, partition_key=doc_id, patch_operations=chunk))
+            except exceptions.CosmosResourceNotFoundError:
+                # First write ever: create the document, then apply the chunk to it
+                try:
+                    execute_with_retry(lambda: self.container.create_item(body=_empty_document(doc_id)))
+                except exceptions.CosmosResourceExistsError:
+                    pass
+                document = execute_with_retry(lambda: self.container.patch_item(
+                    doc_id, partition_key=doc_id, patch_operations=chunk))
+            documents.append(document)
+        return documents
+
+    def _count_partition_keys(self, pk_deltas):
+        """Apply the partition key deltas shard by shard; returns the change in distinct values"""
+        by_shard = {}
+        for value, delta in pk_deltas.items():
+            if delta:
+                by_shard.setdefault(_shard(value, self.shards), []).append((value, delta))
+        distinct = 0
+        for shard, deltas in by_shard.items():
+            operations = [{"op": "incr", "path": f"/counts/{_segment(value)}", "value": delta}
+                          for value, delta in deltas]
+            documents = self._patch(PARTITION_KEY_COUNTS_PREFIX + str(shard), operations)
+            # Each request is atomic, so the count before it is the count after minus the delta
+            for start, document in zip(range(0, len(deltas), PATCH_MAX_OPERATIONS), documents):
+                for value, delta in deltas[start:start + PATCH_MAX_OPERATIONS]:
+                    count = document["counts"][value]
+                    distinct += (count > 0) - (count - delta > 0)
+        return distinct
+
+    def _theme_operations(self, new_themes, degree_deltas):
+        by_shard = {}
+        for theme_id, name in new_themes.items():
+            # set is idempotent and incr by 0 creates a missing degree without resetting an existing
+            # one, so a theme that another process also saw as new keeps the degree counted there
+            path = _segment(theme_id)
+            by_shard.setdefault(_shard(theme_id, self.shards), []).extend([
+                {"op": "set", "path": f"/names/{path}", "value": name},
+                {"op": "incr", "path": f"/degrees/{path}", "value": degree_deltas.pop(theme_id, 0)}
+            ])
+        for theme_id, n in degree_deltas.items():
+            by_shard.setdefault(_shard(theme_id, self.shards), []).append(
+                {"op": "incr", "path": f"/degrees/{_segment(theme_id)}", "value": n})
+        return by_shard
+
+    def flush(self):
+        """Apply the buffered deltas; a failed flush leaves counts for rebuild() to correct"""
+        with self.lock:
+            vertex_deltas, edge_deltas = self.vertex_deltas, self.edge_deltas
+            pk_deltas, degree_deltas, new_themes = self.pk_deltas, self.degree_deltas, self.new_themes
+            self._reset()
+        if not (vertex_deltas or edge_deltas or pk_deltas or degree_deltas or new_themes):
+            return
+        try:
+            distinct = self._count_partition_keys(pk_deltas)
+            summary = (
+                [{"op": "incr", "path": f"/vertexCounts/{_segment(label)}", "value": n}
+                 for label, n in vertex_deltas.items()]
+                + [{"op": "incr", "path": f"/edgeCounts/{_segment(label)}", "value": n}
+                   for label, n in edge_deltas.items()]
+            )
+            for field, n in (("vertexCount", sum(vertex_deltas.values())),
+                             ("edgeCount", sum(edge_deltas.values())), ("partitionKeyCount", distinct)):
+                if n:
+                    summary.append({"op": "incr", "path": f"/{field}", "value": n})
+            if summary:
+                self._patch(SUMMARY_ID, summary)
+            for shard, operations in self._theme_operations(new_themes, Counter(degree_deltas)).items():
+                self._patch(THEME_DEGREES_PREFIX + str(shard), operations)
+        except Exception as e:
+            print(Fore.RED + f"Graph statistics not updated ({e}); run graph_stats.py to rebuild them")
+
+    # Reading
+
+    def _read(self, doc_id):
+        try:
+            return self.container.read_item(doc_id, partition_key=doc_id)
+        except exceptions.CosmosResourceNotFoundError:
+            return None
+
+    def summary(self):
+        """The graph-summary document, or None before anything was recorded"""
+        return self._read(SUMMARY_ID)
+
+    def theme_degrees(self):
+        """{theme id: {"name", "degree"}} for every recorded Central_Theme"""
+        themes = {}
+        for shard in range(self.shards):
+            document = self._read(THEME_DEGREES_PREFIX + str(shard))
+            if document:
+                degrees = document["degrees"]
+                themes.update({theme_id: {"name": name, "degree": degrees.get(theme_id, 0)}
+                               for theme_id, name in document["names"].items()})
+        return themes
+
+    def snapshot(self):
+        """What analyze_graph used to scan for, from point reads; None when not materialized"""
+        summary = self.summary()
+        if summary is None:
+            return None
+        themes = self.theme_degrees()
+        return {
+            "vertex_count": summary["vertexCount"],
+            "vertex_counts_by_label": {k: v for k, v in summary["vertexCounts"].items() if v > 0},
+            "edge_types": sorted(k for k, v in summary["edgeCounts"].items() if v > 0),
+            "partition_key_count": summary["partitionKeyCount"],
+            "central_themes": [theme["name"] for theme in themes.values()],
+            "theme_connections": [{"theme": theme["name"], "connections": theme["degree"]}
+                                  for theme in themes.values()]
+        }
+
+    # Reconciliation
+
+    def rebuild(self, gremlin_client):
+        """Recompute every counter with full-graph scans and overwrite the documents"""
+        def scan(template):
+            return execute_with_retry(lambda: template.submit(gremlin_client).all().result())
+
+        vertex_counts = (scan(VERTEX_COUNTS_BY_LABEL) or [{}])[0]
+        edge_counts = (scan(EDGE_COUNTS_BY_LABEL) or [{}])[0]
+        pk_counts = {str(k): v for k, v in ((scan(VERTEX_COUNTS_BY_PK) or [{}])[0]).items()}
+        themes = {row["id"]: {"name": row["name"], "degree": row["degree"]} for row in scan(THEME_DEGREES)}
+
+        with self.lock:
+            self._reset()
+            self.themes = set(themes)
+        # Every shard is overwritten, so values that no longer occur disappear
+        pk_shards = [_empty_document(PARTITION_KEY_COUNTS_PREFIX + str(n)) for n in range(self.shards)]
+        for value, count in pk_counts.items():
+            pk_shards[_shard(value, self.shards)]["counts"][value] = count
+        theme_shards = [_empty_document(THEME_DEGREES_PREFIX + str(n)) for n in range(self.shards)]
+        for theme_id, theme in themes.items():
+            shard = theme_shards[_shard(theme_id, self.shards)]
+            shard["names"][theme_id] = theme["name"]
+            shard["degrees"][theme_id] = theme["degree"]
+        for document in pk_shards + theme_shards:
+            execute_with_retry(lambda: self.container.upsert_item(body=document))
+        summary = {"id": SUMMARY_ID, "vertexCount": sum(vertex_counts.values()),
+                   "edgeCount": sum(edge_counts.values()), "partitionKeyCount": len(pk_counts),
+                   "vertexCounts": vertex_counts, "edgeCounts": edge_counts}
+        execute_with_retry(lambda: self.container.upsert_item(body=summary))
+        print(Fore.GREEN + f"Graph statistics rebuilt: {summary['vertexCount']} vertices, "
+                           f"{summary['edgeCount']} edges, {len(themes)} themes")
+        return summary
+
+
+def open_graph_statistics(cosmos_client, database=GRAPH_STATS_DATABASE, container=GRAPH_STATS_CONTAINER,
+                          create=False):
+    """GraphStatistics over the stats container, or None when disabled.
+
+    Writers pass create=True to create the container when missing; readers only open it,
+    and a missing container reads as no statistics.
+    """
+    if not container:
+        return None
+    try:
+        if create:
+            stats_container = cosmos_client.create_database_if_not_exists(id=database) \
+                .create_container_if_not_exists(id=container, partition_key=PartitionKey(path="/id"))
+        else:
+            stats_container = cosmos_client.get_database_client(database).get_container_client(container)
+        return GraphStatistics(InstrumentedContainer(stats_container))
+    except Exception as e:
+        print(Fore.YELLOW + f"Graph statistics disabled, could not open '{container}': {e}")
+        return None
+
+
+if __name__ == "__main__":
+    # Recompute the counters from the graph, e.g. after a bulk delete
+    from client_registry import CLIENTS
+
+    gremlin_client = CLIENTS.gremlin(password=os.getenv("GREMLIN_PRIMARY_KEY"))
+    stats = open_graph_statistics(CLIENTS.cosmos(), create=True)
+    if stats is not None:
+        stats.rebuild(gremlin_client)
+        print(Fore.CYAN + f"{stats.snapshot()}")
@@ -0,0 +1,61 @@
+"""
+Sampled post-write verification, kept off the ingestion hot path
+"""
+
+import os
+import random
+from colorama import Fore
+from gremlin_templates import vertex_lookup
+
+# off: never verify; sample: verify sampled ids in batches while running; end: verify once at the end
+VERIFY_MODE = os.getenv("VERIFY_MODE", "end")
+VERIFY_SAMPLE_RATE = float(os.getenv("VERIFY_SAMPLE_RATE", "0.01"))
+VERIFY_BATCH_SIZE = int(os.getenv("VERIFY_BATCH_SIZE", "100"))
+
+
+class GraphVerifier:
+    def __init__(self, gremlin_client, mode=VERIFY_MODE, sample_rate=VERIFY_SAMPLE_RATE,
+                 batch_size=VERIFY_BATCH_SIZE):
+        self.gremlin_client = gremlin_client
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self.batch_size = batch_size
+        self.pending = []
+        self.checked = 0
+        self.missing = []
+
+    def observe(self, records):
+        """Note successfully written records; only a sample is kept for checking"""
+        if self.mode == "off":
+            return
+        self.pending.extend(
+            r["id"] for r in records if "id" in r and random.random() < self.sample_rate
+        )
+        if self.mode == "sample" and len(self.pending) >= self.batch_size:
+            self.verify_pending()
+
+    def verify_pending(self):
+        while self.pending:
+            ids = self.pending[:self.batch_size]
+            del self.pending[:self.batch_size]
+            template, bindings = vertex_lookup(ids)
+            try:
+                found = set(template.stream(self.gremlin_client, **bindings))
+            except Exception as e:
+                print(Fore.RED + f"Verification lookup failed: {e}")
+                continue
+            self.checked += len(ids)
+            self.missing.extend(vid for vid in ids if vid not in found)
+
+    def finish(self):
+        """Verify whatever is still pending and print a summary"""
+        if self.mode == "off":
+            return True
+        self.verify_pending()
+        if self.checked:
+            if self.missing:
+                print(Fore.RED + f"Verification: {len(self.missing)} of {self.checked} sampled ids missing: "
+                                 f"{self.missing[:10]}")
+            else:
+                print(Fore.GREEN + f"Verification: all {self.checked} sampled ids present")
+        return not self.missing
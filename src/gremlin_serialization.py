@@ -0,0 +1,179 @@
+"""
+Gremlin message serializers, chosen in one place
+
+GREMLIN_SERIALIZER names the serializer every Gremlin client uses (client_registry,
+the benchmark). "graphson_v2_fast" writes requests exactly like GraphSON v2 but
+decodes responses with orjson and a light type-tag unwrapper instead of
+gremlin_python's recursive GraphSONReader: frames without type tags (what Cosmos DB
+returns for valueMap, project and plain values) come back from the JSON parser as
+they are, and tagged numbers are unwrapped inline. Anything else tagged (vertices,
+edges, paths, dates...) is still handed to the GraphSON reader, so results are the
+same objects either way. Without orjson installed the stdlib json parser is used.
+
+Run as a script for a decode micro-benchmark over large valueMap(true) frames, e.g.
+    SERIALIZER_BENCH_ROWS=50000 python gremlin_serialization.py
+"""
+
+import os
+import gc
+import json
+import time
+import tracemalloc
+from gremlin_python.driver import serializer
+from colorama import Fore, init
+from dotenv import load_dotenv
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Initialize colorama for colored output
+init()
+
+# Load environment variables from .env file
+load_dotenv()
+
+GREMLIN_SERIALIZER = os.getenv("GREMLIN_SERIALIZER", "graphson_v2_fast")
+SERIALIZER_BENCH_ROWS = int(os.getenv("SERIALIZER_BENCH_ROWS", "20000"))
+SERIALIZER_BENCH_ROUNDS = int(os.getenv("SERIALIZER_BENCH_ROUNDS", "5"))
+
+TYPE_KEY = "@type"
+VALUE_KEY = "@value"
+TYPE_MARKER = b'"@type"'
+CONTAINERS = (dict, list)
+
+
+def _loads(message):
+    if orjson is not None:
+        return orjson.loads(message)
+    return json.loads(message if isinstance(message, str) else message.decode("utf-8"))
+
+
+class FastGraphSONSerializersV2d0(serializer.GraphSONSerializersV2d0):
+    """GraphSON v2 with an orjson decode path; requests are serialized unchanged"""
+
+    def __init__(self):
+        super().__init__()
+        # Numbers are by far the most common tags; their objects are the JSON values themselves
+        self._scalars = {"g:Int32": int, "g:Int64": int, "g:Float": float, "g:Double": float}
+
+    def deserialize_message(self, message):
+        raw = message if isinstance(message, (bytes, bytearray, memoryview)) else message.encode("utf-8")
+        msg = _loads(raw)
+        if TYPE_MARKER not in raw:
+            return msg
+        result = msg.get("result")
+        if result is not None:
+            result["data"] = self._unwrap(result.get("data"))
+        return msg
+
+    def _unwrap(self, obj):
+        """Replace tagged values in place; only containers are visited, scalars are left alone"""
+        if type(obj) is dict:
+            tag = obj.get(TYPE_KEY)
+            if tag is not None and VALUE_KEY in obj:
+                convert = self._scalars.get(tag)
+                value = obj[VALUE_KEY]
+                # Non-finite doubles arrive as strings; the reader knows how to parse them
+                if convert is not None and not isinstance(value, str):
+                    return convert(value)
+                return self._graphson_reader.to_object(obj)
+            for key, value in obj.items():
+                if type(value) in CONTAINERS:
+                    unwrapped = self._unwrap(value)
+                    if unwrapped is not value:
+                        obj[key] = unwrapped
+        elif type(obj) is list:
+            for i, value in enumerate(obj):
+                if type(value) in CONTAINERS:
+                    unwrapped = self._unwrap(value)
+                    if unwrapped is not value:
+                        obj[i] = unwrapped
+        return obj
+
+
+SERIALIZERS = {
+    "graphson_v2": serializer.GraphSONSerializersV2d0,
+    "graphson_v2_fast": FastGraphSONSerializersV2d0,
+    "graphson_v3": serializer.GraphSONMessageSerializer
+}
+
+
+def serializer_class(name=GREMLIN_SERIALIZER):
+    if name not in SERIALIZERS:
+        raise ValueError(f"Unknown Gremlin serializer '{name}' (expected one of {', '.join(SERIALIZERS)})")
+    return SERIALIZERS[name]
+
+
+# Micro-benchmark
+
+def value_map_frame(rows, typed=False, fields=4, field_size=32):
+    """A GraphSON v2 response frame of g.V().valueMap(true) rows.
+
+    Cosmos DB sends plain JSON; typed=True tags the numbers the way Gremlin Server does.
+    """
+    def number(value, tag):
+        return {TYPE_KEY: tag, VALUE_KEY: value} if typed else value
+
+    data = []
+    for i in range(rows):
+        row = {"id": f"person-{i}", "label": "person", "name": [f"Person {i}"],
+               "age": [number(18 + i % 70, "g:Int32")], "score": [number(i / 7, "g:Double")],
+               "pk": [f"p{i % 16}"]}
+        for f in range(fields):
+            row[f"field{f}"] = [("abcdefghijklmnopqrstuvwxyz" * 2)[f:f + field_size]]
+        data.append(row)
+    return json.dumps({
+        "requestId": "00000000-0000-0000-0000-000000000000",
+        "status": {"code": 200, "message": "", "attributes": {"x-ms-total-request-charge": 1.0}},
+        "result": {"data": data, "meta": {}}
+    }).encode("utf-8")
+
+
+def measure_decode(message_serializer, frame, rounds=SERIALIZER_BENCH_ROUNDS):
+    """Best-of-rounds decode time, plus allocations of one decode under tracemalloc"""
+    best = float("inf")
+    for _ in range(rounds):
+        gc.collect()
+        started = time.perf_counter()
+        decoded = message_serializer.deserialize_message(frame)
+        best = min(best, time.perf_counter() - started)
+    gc.collect()
+    tracemalloc.start()
+    decoded = message_serializer.deserialize_message(frame)
+    blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return decoded, {"seconds": best, "blocks": blocks, "peak_bytes": peak}
+
+
+def run_decode_benchmark(rows=SERIALIZER_BENCH_ROWS, names=("graphson_v2", "graphson_v2_fast")):
+    results = {}
+    for typed in (False, True):
+        frame = value_map_frame(rows, typed=typed)
+        shape = "tagged" if typed else "plain"
+        reference = None
+        for name in names:
+            decoded, stats = measure_decode(SERIALIZERS[name](), frame)
+            if reference is None:
+                reference = decoded
+            elif decoded != reference:
+                raise AssertionError(f"{name} decoded the {shape} frame differently from {names[0]}")
+            stats["rows_per_second"] = rows / stats["seconds"]
+            stats["mb_per_second"] = len(frame) / stats["seconds"] / 1e6
+            results[(shape, name)] = stats
+    return results
+
+
+def print_decode_benchmark(results, rows):
+    print(Fore.CYAN + f"valueMap(true) decode, {rows} rows per frame "
+                      f"({'orjson' if orjson is not None else 'json'} fast path)")
+    print(f"{'frame':<8}{'serializer':<20}{'ms':>10}{'rows/s':>14}{'MB/s':>10}{'blocks':>12}{'peak MB':>10}")
+    for (shape, name), stats in results.items():
+        print(f"{shape:<8}{name:<20}{stats['seconds'] * 1000:>10.1f}{stats['rows_per_second']:>14,.0f}"
+              f"{stats['mb_per_second']:>10.1f}{stats['blocks']:>12,}{stats['peak_bytes'] / 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    print_decode_benchmark(run_decode_benchmark(), SERIALIZER_BENCH_ROWS)
@@ -0,0 +1,804 @@
+"""
+In-process Gremlin stand-in server for offline benchmarking
+
+Speaks the Gremlin websocket protocol (GraphSON v2 and v3) against an in-memory
+graph, for the traversal subset this project submits: addV/addE, property, V/E,
+has/hasLabel, id/label/values/valueMap, both/out/in and their E forms, count,
+dedup, fold/unfold, coalesce, limit, groupCount().by() and project().by().
+
+Responses carry Cosmos-style status attributes (x-ms-status-code,
+x-ms-total-request-charge, x-ms-retry-after-ms) so the retry, batching and
+instrumentation code behaves as it does against Cosmos DB. Latency and 429
+throttling can be injected. Point GREMLIN_ENDPOINT at `url` to use it.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import random
+import asyncio
+import threading
+from aiohttp import web, WSMsgType
+from colorama import Fore, init
+from gremlin_python.structure.io import graphsonV2d0, graphsonV3d0
+
+# Initialize colorama for colored output
+init()
+
+STANDIN_GREMLIN_PORT = int(os.getenv("STANDIN_GREMLIN_PORT", "8182"))
+STANDIN_LATENCY_MS = float(os.getenv("STANDIN_LATENCY_MS", "0"))
+STANDIN_JITTER_MS = float(os.getenv("STANDIN_JITTER_MS", "0"))
+# Provisioned throughput; requests beyond it get 429s (0 disables throttling)
+STANDIN_RU_PER_SECOND = float(os.getenv("STANDIN_RU_PER_SECOND", "0"))
+# Fraction of requests rejected with a 429 regardless of load
+STANDIN_THROTTLE_RATE = float(os.getenv("STANDIN_THROTTLE_RATE", "0"))
+# Results per response frame; larger results are streamed as 206 partial responses
+STANDIN_CHUNK_SIZE = int(os.getenv("STANDIN_CHUNK_SIZE", "64"))
+
+# Synthetic charge model, roughly in line with Cosmos DB Gremlin costs
+RU_PER_REQUEST = 1.0
+RU_PER_WRITE = 10.0
+RU_PER_PROPERTY = 1.0
+RU_PER_ELEMENT_READ = 0.1
+
+_SERIALIZERS = {
+    "application/vnd.gremlin-v2.0+json": (graphsonV2d0.GraphSONReader(), graphsonV2d0.GraphSONWriter()),
+    "application/vnd.gremlin-v3.0+json": (graphsonV3d0.GraphSONReader(), graphsonV3d0.GraphSONWriter())
+}
+
+
+class TraversalError(Exception):
+    """A script the stand-in cannot run; status is the Cosmos x-ms-status-code"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+_TOKEN = re.compile(r"""
+    \s*(?:
+      (?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+    | (?P<number>-?\d+(?:\.\d+)?)[LlDdFf]?
+    | (?P<ident>[A-Za-z_][A-Za-z0-9_]*)
+    | (?P<punct>[().,\[\]])
+    )""", re.VERBOSE)
+
+_ESCAPE = re.compile(r"\\(['\"\\])")
+
+# Steps that modify the step before them instead of running on their own
+_MODULATORS = {"by": None, "to": "addE", "from": "addE"}
+# Groovy terminal steps that only make sense in a console
+_TERMINALS = {"toList", "next", "iterate", "toSet"}
+
+
+class Step:
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+        self.modulators = []
+
+
+class Traversal:
+    def __init__(self, steps, rooted):
+        self.steps = steps
+        # A g.-rooted traversal ignores its input and starts from the graph
+        self.rooted = rooted
+
+
+class Binding:
+    def __init__(self, name):
+        self.name = name
+
+
+def _tokenize(script):
+    tokens, pos = [], 0
+    script = script.strip()
+    while pos < len(script):
+        match = _TOKEN.match(script, pos)
+        if not match or match.end() == pos:
+            raise TraversalError(f"Unexpected input at offset {pos}: {script[pos:pos + 20]!r}")
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind)))
+        pos = match.end()
+    return tokens
+
+
+class _Parser:
+    def __init__(self, script):
+        self.tokens = _tokenize(script)
+        self.pos = 0
+
+    def peek(self, offset=0):
+        index = self.pos + offset
+        return self.tokens[index] if index < len(self.tokens) else (None, None)
+
+    def take(self, value=None):
+        token = self.peek()
+        if value is not None and token[1] != value:
+            raise TraversalError(f"Expected {value!r} but found {token[1]!r}")
+        self.pos += 1
+        return token
+
+    def parse(self):
+        traversal = self.traversal()
+        if self.peek()[0] is not None:
+            raise TraversalError(f"Unexpected {self.peek()[1]!r} after traversal")
+        return traversal
+
+    def traversal(self):
+        rooted = False
+        if self.peek()[1] in ("g", "__") and self.peek(1)[1] == ".":
+            rooted = self.take()[1] == "g"
+            self.take(".")
+        steps = [self.step()]
+        while self.peek()[1] == ".":
+            self.take(".")
+            steps.append(self.step())
+
+        folded = []
+        for step in steps:
+            if step.name in _TERMINALS:
+                continue
+            if step.name in _MODULATORS and folded and \
+                    _MODULATORS[step.name] in (None, folded[-1].name):
+                folded[-1].modulators.append(step)
+            else:
+                folded.append(step)
+        return Traversal(folded, rooted)
+
+    def step(self):
+        kind, name = self.take()
+        if kind != "ident":
+            raise TraversalError(f"Expected a step name but found {name!r}")
+        self.take("(")
+        args = []
+        while self.peek()[1] != ")":
+            args.append(self.arg())
+            if self.peek()[1] == ",":
+                self.take(",")
+        self.take(")")
+        return Step(name, args)
+
+    def arg(self):
+        kind, value = self.peek()
+        if kind == "string":
+            self.take()
+            return _ESCAPE.sub(r"\1", value[1:-1])
+        if kind == "number":
+            self.take()
+            return float(value) if "." in value else int(value)
+        if value == "[":
+            self.take("[")
+            items = []
+            while self.peek()[1] != "]":
+                items.append(self.arg())
+                if self.peek()[1] == ",":
+                    self.take(",")
+            self.take("]")
+            return items
+        if kind == "ident":
+            if self.peek(1)[1] in ("(", "."):
+                return self.traversal()
+            self.take()
+            if value in ("true", "false"):
+                return value == "true"
+            return Binding(value)
+        raise TraversalError(f"Unexpected argument {value!r}")
+
+
+_PARSED = {}
+
+
+def parse_traversal(script):
+    # Templates resubmit the same script text, so parse each one once
+    traversal = _PARSED.get(script)
+    if traversal is None:
+        traversal = _PARSED[script] = _Parser(script).parse()
+    return traversal
+
+
+class Vertex:
+    def __init__(self, vertex_id, label):
+        self.id = vertex_id
+        self.label = label
+        self.properties = {}
+
+    def to_graphson(self):
+        # Cosmos returns vertex properties as lists of {id, value}
+        return {
+            "id": self.id, "label": self.label, "type": "vertex",
+            "properties": {
+                key: [{"id": f"{self.id}|{key}", "value": value}]
+                for key, value in self.properties.items()
+            }
+        }
+
+
+class Edge:
+    def __init__(self, edge_id, label, out_v, in_v):
+        self.id = edge_id
+        self.label = label
+        self.out_v = out_v
+        self.in_v = in_v
+        self.properties = {}
+
+    def to_graphson(self):
+        return {
+            "id": self.id, "label": self.label, "type": "edge",
+            "inVLabel": self.in_v.label, "outVLabel": self.out_v.label,
+            "inV": self.in_v.id, "outV": self.out_v.id,
+            "properties": dict(self.properties)
+        }
+
+
+class GraphStore:
+    """In-memory vertices and edges with adjacency lists"""
+
+    def __init__(self):
+        self.vertices = {}
+        self.edges = {}
+        self.out_edges = {}
+        self.in_edges = {}
+
+    def add_vertex(self, label, vertex_id=None):
+        vertex = Vertex(vertex_id or str(uuid.uuid4()), label)
+        if vertex.id in self.vertices:
+            raise TraversalError(f"Resource with specified id or name already exists: {vertex.id}", 409)
+        self.vertices[vertex.id] = vertex
+        self.out_edges[vertex.id] = []
+        self.in_edges[vertex.id] = []
+        return vertex
+
+    def add_edge(self, label, out_v, in_v):
+        edge = Edge(str(uuid.uuid4()), label, out_v, in_v)
+        self.edges[edge.id] = edge
+        self.out_edges[out_v.id].append(edge)
+        self.in_edges[in_v.id].append(edge)
+        return edge
+
+    def remove(self, element):
+        """Take out an element just added by a failed request, with the edges it already has"""
+        if isinstance(element, Vertex):
+            for edge in self.out_edges.pop(element.id) + self.in_edges.pop(element.id):
+                self.remove(edge)
+            del self.vertices[element.id]
+        elif self.edges.pop(element.id, None) is not None:
+            self.out_edges.get(element.out_v.id, []).remove(element)
+            self.in_edges.get(element.in_v.id, []).remove(element)
+
+    def rekey(self, element, new_id):
+        store = self.vertices if isinstance(element, Vertex) else self.edges
+        if new_id == element.id:
+            return
+        # Validate everything before the store is touched
+        if new_id in store:
+            raise TraversalError(f"Resource with specified id or name already exists: {new_id}", 409)
+        if isinstance(element, Vertex) and (self.out_edges[element.id] or self.in_edges[element.id]):
+            raise TraversalError("Cannot change the id of a vertex with edges")
+        del store[element.id]
+        if isinstance(element, Vertex):
+            self.out_edges[new_id] = self.out_edges.pop(element.id)
+            self.in_edges[new_id] = self.in_edges.pop(element.id)
+        element.id = new_id
+        store[new_id] = element
+
+    def clear(self):
+        self.__init__()
+
+
+_START = object()
+
+
+def _dedup_key(value):
+    if isinstance(value, (Vertex, Edge)):
+        return (type(value).__name__, value.id)
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return json.dumps(value, sort_keys=True, default=str)
+
+
+class _Execution:
+    """One request: resolves bindings and counts reads/writes for the charge"""
+
+    def __init__(self, graph, bindings):
+        self.graph = graph
+        self.bindings = bindings or {}
+        self.writes = 0
+        self.property_writes = 0
+        self.reads = 0
+        # Elements created by this request, still under their generated ids
+        self.added = set()
+
+    def value(self, arg):
+        if isinstance(arg, Binding):
+            if arg.name in self.bindings:
+                return self.bindings[arg.name]
+            # Bare tokens such as `label` in by(label)
+            return arg.name
+        if isinstance(arg, list):
+            return [self.value(a) for a in arg]
+        return arg
+
+    def run(self, traversal, traversers):
+        if traversal.rooted:
+            traversers = [_START]
+        for step in traversal.steps:
+            handler = getattr(self, f"step_{step.name}", None)
+            if handler is None:
+                raise TraversalError(f"Unsupported step '{step.name}'")
+            traversers = handler(traversers, step)
+        return traversers
+
+    def run_from(self, arg, traverser):
+        return self.run(arg, [traverser]) if isinstance(arg, Traversal) else [self.value(arg)]
+
+    def _by(self, modulator, traverser):
+        if not modulator.args:
+            return traverser
+        arg = modulator.args[0]
+        if isinstance(arg, Traversal):
+            results = self.run(arg, [traverser])
+            return results[0] if results else None
+        key = self.value(arg)
+        if key in ("label", "id") and isinstance(arg, Binding):
+            return getattr(traverser, key)
+        return traverser.properties.get(key) if isinstance(traverser, (Vertex, Edge)) else None
+
+    # Sources and adjacency
+
+    def _ids(self, step):
+        ids = []
+        for arg in step.args:
+            value = self.value(arg)
+            if isinstance(value, list):
+                # Cosmos accepts [id, partitionKey] pairs as well as plain ids
+                value = value[0] if len(value) == 2 and not isinstance(value[1], list) else value
+            ids.extend(value if isinstance(value, list) else [value])
+        return ids
+
+    def step_V(self, traversers, step):
+        ids = self._ids(step)
+        out = []
+        for _ in traversers:
+            if ids:
+                found = [self.graph.vertices[i] for i in ids if i in self.graph.vertices]
+                self.reads += len(found)
+            else:
+                found = list(self.graph.vertices.values())
+                self.reads += len(found)
+            out.extend(found)
+        return out
+
+    def step_inject(self, traversers, step):
+        return [self.value(a) for _ in traversers for a in step.args]
+
+    def step_E(self, traversers, step):
+        ids = self._ids(step)
+        out = []
+        for _ in traversers:
+            found = [self.graph.edges[i] for i in ids if i in self.graph.edges] if ids \
+                else list(self.graph.edges.values())
+            self.reads += len(found)
+            out.extend(found)
+        return out
+
+    def _adjacent(self, traversers, step, direction, edges_only):
+        labels = {self.value(a) for a in step.args}
+        out = []
+        for t in traversers:
+            if not isinstance(t, Vertex):
+                raise TraversalError(f"{step.name}() requires vertex traversers")
+            edges = []
+            if direction in ("out", "both"):
+                edges.extend((e, e.in_v) for e in self.graph.out_edges[t.id])
+            if direction in ("in", "both"):
+                edges.extend((e, e.out_v) for e in self.graph.in_edges[t.id])
+            for edge, other in edges:
+                if labels and edge.label not in labels:
+                    continue
+                self.reads += 1
+                out.append(edge if edges_only else other)
+        return out
+
+    def step_out(self, traversers, step):
+        return self._adjacent(traversers, step, "out", False)
+
+    def step_in(self, traversers, step):
+        return self._adjacent(traversers, step, "in", False)
+
+    def step_both(self, traversers, step):
+        return self._adjacent(traversers, step, "both", False)
+
+    def step_outE(self, traversers, step):
+        return self._adjacent(traversers, step, "out", True)
+
+    def step_inE(self, traversers, step):
+        return self._adjacent(traversers, step, "in", True)
+
+    def step_bothE(self, traversers, step):
+        return self._adjacent(traversers, step, "both", True)
+
+    def step_outV(self, traversers, step):
+        return [t.out_v for t in traversers]
+
+    def step_inV(self, traversers, step):
+        return [t.in_v for t in traversers]
+
+    # Mutations
+
+    def step_addV(self, traversers, step):
+        label = self.value(step.args[0]) if step.args else "vertex"
+        self.writes += len(traversers)
+        vertices = [self.graph.add_vertex(label) for _ in traversers]
+        self.added.update(v.id for v in vertices)
+        return vertices
+
+    def step_addE(self, traversers, step):
+        label = self.value(step.args[0])
+        ends = {m.name: m.args[0] for m in step.modulators}
+        out = []
+        for t in traversers:
+            endpoints = {}
+            for end in ("from", "to"):
+                if end in ends:
+                    found = [v for v in self.run_from(ends[end], t) if isinstance(v, Vertex)]
+                    if not found:
+                        raise TraversalError(f"addE('{label}'): the '{end}' vertex was not found", 404)
+                    endpoints[end] = found[0]
+                else:
+                    endpoints[end] = t
+            if not isinstance(endpoints["from"], Vertex) or not isinstance(endpoints["to"], Vertex):
+                raise TraversalError(f"addE('{label}') requires vertex endpoints")
+            self.writes += 1
+            edge = self.graph.add_edge(label, endpoints["from"], endpoints["to"])
+            self.added.add(edge.id)
+            out.append(edge)
+        return out
+
+    def step_property(self, traversers, step):
+        args = [self.value(a) for a in step.args]
+        # Drop an explicit cardinality; every property is single-valued here
+        if len(args) == 3 and args[0] in ("single", "list", "set"):
+            args = args[1:]
+        key, value = args[0], args[1]
+        for t in traversers:
+            if not isinstance(t, (Vertex, Edge)):
+                raise TraversalError("property() requires element traversers")
+            if key == "id":
+                try:
+                    self.graph.rekey(t, value)
+                except TraversalError:
+                    # Cosmos writes nothing on a conflict, so the element this request added goes too
+                    if t.id in self.added:
+                        self.graph.remove(t)
+                    raise
+            else:
+                t.properties[key] = value
+        self.property_writes += len(traversers)
+        return traversers
+
+    # Filters
+
+    @staticmethod
+    def _matches(element, key, value):
+        if key == "id":
+            return element.id == value
+        if key == "label":
+            return element.label == value
+        return element.properties.get(key) == value
+
+    def step_has(self, traversers, step):
+        args = [self.value(a) for a in step.args]
+        if len(args) == 1:
+            return [t for t in traversers if args[0] in t.properties]
+        if len(args) == 3:
+            traversers = [t for t in traversers if t.label == args[0]]
+            args = args[1:]
+        return [t for t in traversers if self._matches(t, args[0], args[1])]
+
+    def step_hasLabel(self, traversers, step):
+        labels = {self.value(a) for a in step.args}
+        return [t for t in traversers if t.label in labels]
+
+    def step_hasId(self, traversers, step):
+        ids = set(self._ids(step))
+        return [t for t in traversers if t.id in ids]
+
+    def step_limit(self, traversers, step):
+        return traversers[:int(self.value(step.args[0]))]
+
+    def step_dedup(self, traversers, step):
+        seen, out = set(), []
+        for t in traversers:
+            key = _dedup_key(t)
+            if key not in seen:
+                seen.add(key)
+                out.append(t)
+        return out
+
+    def step_coalesce(self, traversers, step):
+        out = []
+        for t in traversers:
+            for branch in step.args:
+                results = self.run(branch, [t])
+                if results:
+                    out.extend(results)
+                    break
+        return out
+
+    # Maps and reductions
+
+    def step_id(self, traversers, step):
+        return [t.id for t in traversers]
+
+    def step_label(self, traversers, step):
+        return [t.label for t in traversers]
+
+    def step_values(self, traversers, step):
+        keys = [self.value(a) for a in step.args]
+        out = []
+        for t in traversers:
+            for key in keys or list(t.properties):
+                if key in t.properties:
+                    out.append(t.properties[key])
+        return out
+
+    def step_valueMap(self, traversers, step):
+        include_tokens = bool(step.args) and step.args[0] is True
+        keys = [self.value(a) for a in step.args if not isinstance(a, bool)]
+        out = []
+        for t in traversers:
+            entry = {k: [v] for k, v in t.properties.items() if not keys or k in keys}
+            if include_tokens:
+                entry["id"] = t.id
+                entry["label"] = t.label
+            out.append(entry)
+        return out
+
+    def step_count(self, traversers, step):
+        return [len(traversers)]
+
+    def step_fold(self, traversers, step):
+        return [list(traversers)]
+
+    def step_unfold(self, traversers, step):
+        out = []
+        for t in traversers:
+            if isinstance(t, list):
+                out.extend(t)
+            elif isinstance(t, dict):
+                out.extend({k: v} for k, v in t.items())
+            else:
+                out.append(t)
+        return out
+
+    def step_groupCount(self, traversers, step):
+        counts = {}
+        modulator = step.modulators[0] if step.modulators else Step("by", [])
+        for t in traversers:
+            key = self._by(modulator, t)
+            key = key.id if isinstance(key, (Vertex, Edge)) else key
+            counts[key] = counts.get(key, 0) + 1
+        return [counts]
+
+    def step_project(self, traversers, step):
+        keys = [self.value(a) for a in step.args]
+        modulators = step.modulators or [Step("by", [])]
+        out = []
+        for t in traversers:
+            out.append({
+                key: self._by(modulators[i % len(modulators)], t)
+                for i, key in enumerate(keys)
+            })
+        return out
+
+    def step_identity(self, traversers, step):
+        return traversers
+
+
+def _to_result(value):
+    if isinstance(value, (Vertex, Edge)):
+        return value.to_graphson()
+    if isinstance(value, list):
+        return [_to_result(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _to_result(v) for k, v in value.items()}
+    return value
+
+
+def execute(graph, script, bindings=None):
+    """Run a script against graph; returns (results, charge)"""
+    execution = _Execution(graph, bindings)
+    results = execution.run(parse_traversal(script), [_START])
+    results = [_to_result(r) for r in results if r is not _START]
+    charge = (RU_PER_REQUEST + RU_PER_WRITE * execution.writes
+              + RU_PER_PROPERTY * execution.property_writes + RU_PER_ELEMENT_READ * execution.reads)
+    return results, round(charge, 2)
+
+
+def _timespan(seconds):
+    """Cosmos-style TimeSpan string, e.g. 00:00:00.0510000"""
+    minutes, secs = divmod(seconds, 60)
+    hours, minutes = divmod(int(minutes), 60)
+    return f"{hours:02d}:{minutes:02d}:{secs:010.7f}"
+
+
+class GremlinStandIn:
+    """Websocket Gremlin server on a background event loop.
+
+    Usage:
+        with GremlinStandIn(port=0) as server:
+            client.Client(server.url, "g", ...)
+    """
+
+    def __init__(self, host="127.0.0.1", port=STANDIN_GREMLIN_PORT, latency_ms=STANDIN_LATENCY_MS,
+                 jitter_ms=STANDIN_JITTER_MS, ru_per_second=STANDIN_RU_PER_SECOND,
+                 throttle_rate=STANDIN_THROTTLE_RATE, chunk_size=STANDIN_CHUNK_SIZE, graph=None):
+        self.host = host
+        self.port = port
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.ru_per_second = ru_per_second
+        self.throttle_rate = throttle_rate
+        self.chunk_size = chunk_size
+        self.graph = graph or GraphStore()
+        # Request counters by x-ms-status-code, for benchmark reports
+        self.requests = {}
+        self.total_charge = 0.0
+        self._available = ru_per_second
+        self._refilled = time.monotonic()
+        self._loop = None
+        self._runner = None
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"ws://{self.host}:{self.port}/gremlin"
+
+    def _throttle_delay(self):
+        """Seconds until the RU bucket refills, or None when the request may run"""
+        if self.throttle_rate and random.random() < self.throttle_rate:
+            return 0.05
+        if self.ru_per_second <= 0:
+            return None
+        now = time.monotonic()
+        self._available = min(self.ru_per_second,
+                              self._available + (now - self._refilled) * self.ru_per_second)
+        self._refilled = now
+        if self._available <= 0:
+            return -self._available / self.ru_per_second + 0.001
+        return None
+
+    async def _respond(self, ws, writer, request_id, code, attributes, data=None):
+        message = {
+            "requestId": request_id,
+            "status": {"code": code, "message": attributes.pop("message", ""), "attributes": attributes},
+            "result": {"data": writer.to_dict(data) if data is not None else None, "meta": {}}
+        }
+        await ws.send_str(json.dumps(message))
+
+    async def _handle_request(self, ws, payload):
+        mime_length = payload[0]
+        mime = payload[1:1 + mime_length].decode("utf-8")
+        reader, writer = _SERIALIZERS.get(mime, _SERIALIZERS["application/vnd.gremlin-v2.0+json"])
+        request = reader.to_object(json.loads(payload[1 + mime_length:].decode("utf-8")))
+        request_id = str(request["requestId"])
+        args = request.get("args", {})
+
+        if self.latency_ms or self.jitter_ms:
+            await asyncio.sleep((self.latency_ms + random.uniform(0, self.jitter_ms)) / 1000)
+
+        retry_after = self._throttle_delay()
+        if retry_after is not None:
+            self.requests[429] = self.requests.get(429, 0) + 1
+            await self._respond(ws, writer, request_id, 500, {
+                "message": "Request rate is large", "x-ms-status-code": 429,
+                "x-ms-retry-after-ms": _timespan(retry_after), "x-ms-total-request-charge": 0.0
+            })
+            return
+
+        started = time.perf_counter()
+        try:
+            results, charge = execute(self.graph, args.get("gremlin", ""), args.get("bindings"))
+        except TraversalError as e:
+            self.requests[e.status] = self.requests.get(e.status, 0) + 1
+            await self._respond(ws, writer, request_id, 500, {
+                "message": str(e), "x-ms-status-code": e.status, "x-ms-total-request-charge": RU_PER_REQUEST
+            })
+            return
+        except Exception as e:
+            self.requests[500] = self.requests.get(500, 0) + 1
+            await self._respond(ws, writer, request_id, 500, {
+                "message": f"{type(e).__name__}: {e}", "x-ms-status-code": 500
+            })
+            return
+
+        self._available -= charge
+        self.total_charge += charge
+        self.requests[200] = self.requests.get(200, 0) + 1
+        attributes = {
+            "x-ms-status-code": 200,
+            "x-ms-request-charge": charge,
+            "x-ms-total-request-charge": charge,
+            "x-ms-total-server-time-ms": round((time.perf_counter() - started) * 1000, 3)
+        }
+        if not results:
+            await self._respond(ws, writer, request_id, 200, attributes, [])
+            return
+        size = max(1, int(args.get("batchSize") or self.chunk_size))
+        for start in range(0, len(results), size):
+            final = start + size >= len(results)
+            await self._respond(ws, writer, request_id, 200 if final else 206,
+                                attributes if final else {}, results[start:start + size])
+
+    async def _websocket(self, http_request):
+        ws = web.WebSocketResponse(max_msg_size=0)
+        await ws.prepare(http_request)
+        # Any credentials are accepted, so no 407 authentication challenge is sent
+        async for message in ws:
+            if message.type == WSMsgType.BINARY:
+                await self._handle_request(ws, message.data)
+            elif message.type == WSMsgType.TEXT:
+                await self._handle_request(ws, message.data.encode("utf-8"))
+            elif message.type == WSMsgType.ERROR:
+                break
+        return ws
+
+    async def _start_server(self):
+        app = web.Application()
+        app.router.add_get("/", self._websocket)
+        app.router.add_get("/gremlin", self._websocket)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        # Port 0 picks a free port; report the one actually bound
+        self.port = self._runner.addresses[0][1]
+
+    def start(self):
+        """Serve on a daemon thread and return once the port is listening"""
+        ready = threading.Event()
+        self._loop = asyncio.new_event_loop()
+
+        def serve():
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self._start_server())
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=serve, daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def stop(self):
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+if __name__ == "__main__":
+    server = GremlinStandIn().start()
+    print(Fore.GREEN + f"Gremlin stand-in listening on {server.url} "
+                       f"(latency {server.latency_ms} ms, {server.ru_per_second or 'unlimited'} RU/s)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+        sys.exit(0)
@@ -0,0 +1,211 @@
+"""
+Streaming iteration over Gremlin results
+
+ResultSet.all() only resolves once the last response frame has arrived, so a scan
+holds its whole result in memory before the first row can be used. A ResultStream
+hands out each chunk as soon as its frame (206 partial content) is decoded, as a sync
+or async iterator over rows or chunks.
+
+Memory stays constant: the result set's stream is replaced by a queue bounded to
+GREMLIN_STREAM_BUFFER chunks, so when the consumer falls behind the driver's receive
+thread blocks and the websocket stops being read. Completion puts an end marker on the
+queue, so a waiting reader wakes as soon as the last frame is in. cancel() (or leaving
+the iteration early) stops delivery: the request cannot be aborted on the server, so
+the remaining frames are read and discarded, and the connection goes back to the pool
+when the response ends.
+
+Writes whose rows are thrown away have nothing to stream; they keep .all().result().
+"""
+
+import os
+import json
+import time
+import queue
+import asyncio
+from colorama import Fore, init
+from dotenv import load_dotenv
+
+# Initialize colorama for colored output
+init()
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Decoded chunks held per stream before the driver is made to wait
+GREMLIN_STREAM_BUFFER = int(os.getenv("GREMLIN_STREAM_BUFFER", "4"))
+# Results per response frame requested from the server (0 keeps the server's default)
+GREMLIN_STREAM_BATCH_SIZE = int(os.getenv("GREMLIN_STREAM_BATCH_SIZE", "0"))
+# How often a blocked receive thread checks whether its stream was cancelled
+GREMLIN_STREAM_POLL_SECONDS = float(os.getenv("GREMLIN_STREAM_POLL_SECONDS", "0.2"))
+
+_END = object()
+
+
+class BoundedChunks(queue.Queue):
+    """The queue a ResultStream puts in place of the result set's stream.
+
+    The driver delivers frames with put_nowait; here that waits for room instead, which
+    is the backpressure, but gives up (dropping the frame) once the stream is cancelled.
+    """
+
+    def __init__(self, stream, maxsize):
+        super().__init__(maxsize)
+        self._owner = stream
+
+    def put_nowait(self, item):
+        while not self._owner.cancelled:
+            try:
+                self.put(item, timeout=GREMLIN_STREAM_POLL_SECONDS)
+                return
+            except queue.Full:
+                pass
+
+    def wake(self):
+        # Ends a wait in get() without waiting for room itself
+        try:
+            self.put(_END, block=False)
+        except queue.Full:
+            pass
+
+
+class ResultStream:
+    """Rows of one Gremlin request, delivered chunk by chunk as the frames arrive"""
+
+    def __init__(self, result_set, buffer_chunks=GREMLIN_STREAM_BUFFER):
+        self.result_set = result_set
+        self.cancelled = False
+        self._chunks = BoundedChunks(self, max(1, buffer_chunks))
+        # Frames received before the swap (and one being delivered during it) stay in the
+        # driver's queue and come first
+        self._received = result_set.stream
+        self._held = None
+        result_set._stream = self._chunks
+        result_set.done.add_done_callback(self._finished)
+
+    def _finished(self, _):
+        if self.cancelled:
+            # Frames that got in while cancel() was emptying the queue
+            self._discard()
+        self._chunks.put_nowait(_END)
+
+    def _discard(self):
+        for q in (self._received, self._chunks):
+            while True:
+                try:
+                    q.get_nowait()
+                except queue.Empty:
+                    break
+
+    @property
+    def status_attributes(self):
+        """Final status attributes (x-ms-total-request-charge...), set once the stream is complete"""
+        return self.result_set.status_attributes
+
+    def _next_chunk(self):
+        while True:
+            if not self._received.empty():
+                return self._received.get_nowait()
+            if self._held is not None:
+                chunk, self._held = self._held, None
+            else:
+                chunk = self._chunks.get()
+                if not self._received.empty():
+                    self._held = chunk
+                    continue
+            if chunk is _END:
+                # Server errors (including 429s) surface here
+                self.result_set.done.result()
+            return chunk
+
+    def chunks(self):
+        """Chunks of rows, each as soon as its frame has been received"""
+        try:
+            while not self.cancelled:
+                chunk = self._next_chunk()
+                if chunk is _END:
+                    return
+                if chunk:
+                    yield chunk
+        finally:
+            self.cancel()
+
+    def __iter__(self):
+        for chunk in self.chunks():
+            yield from chunk
+
+    async def achunks(self):
+        """Async form of chunks(); waiting happens off the event loop"""
+        try:
+            while not self.cancelled:
+                chunk = await asyncio.to_thread(self._next_chunk)
+                if chunk is _END:
+                    return
+                if chunk:
+                    yield chunk
+        finally:
+            self.cancel()
+
+    async def __aiter__(self):
+        async for chunk in self.achunks():
+            for row in chunk:
+                yield row
+
+    def drain(self):
+        """Read to the end without keeping any rows, e.g. for writes; returns the status attributes"""
+        for _ in self.chunks():
+            pass
+        return self.status_attributes
+
+    def cancel(self):
+        """Stop delivering rows; frames still in flight are discarded as they arrive"""
+        if self.cancelled:
+            return
+        self.cancelled = True
+        self._discard()
+        # Wakes a reader still waiting on another thread
+        self._chunks.wake()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.cancel()
+
+
+def stream_results(gremlin_client, script, bindings=None, request_options=None,
+                   batch_size=GREMLIN_STREAM_BATCH_SIZE, buffer_chunks=GREMLIN_STREAM_BUFFER):
+    """Submit a script and return a ResultStream over its results"""
+    if batch_size:
+        request_options = {"batchSize": batch_size, **(request_options or {})}
+    result_set = gremlin_client.submit_async(script, bindings=bindings,
+                                             request_options=request_options).result()
+    return ResultStream(result_set, buffer_chunks)
+
+
+async def stream_results_async(gremlin_client, script, bindings=None, request_options=None,
+                               batch_size=GREMLIN_STREAM_BATCH_SIZE, buffer_chunks=GREMLIN_STREAM_BUFFER):
+    """stream_results for coroutines; the submit (and a first connect) runs off the event loop"""
+    return await asyncio.to_thread(stream_results, gremlin_client, script, bindings, request_options,
+                                   batch_size, buffer_chunks)
+
+
+if __name__ == "__main__":
+    # Export every vertex as JSON lines; rows are written as their frames arrive
+    from client_registry import CLIENTS
+
+    output = os.getenv("GREMLIN_EXPORT_PATH", "vertices.jsonl")
+    gremlin_client = CLIENTS.gremlin(password=os.getenv("GREMLIN_PRIMARY_KEY"))
+    started = time.perf_counter()
+    first_row = None
+    rows = 0
+    with open(output, "w", encoding="utf-8") as f, \
+            stream_results(gremlin_client, "g.V().valueMap(true)") as results:
+        for row in results:
+            if first_row is None:
+                first_row = time.perf_counter() - started
+            f.write(json.dumps(row, default=str) + "\n")
+            rows += 1
+    elapsed = time.perf_counter() - started
+    print(Fore.GREEN + f"Exported {rows} vertices to {output} in {elapsed:.2f}s "
+                       f"(first row after {first_row or elapsed:.3f}s)")
+    print(Fore.CYAN + f"Request charge: {results.status_attributes.get('x-ms-total-request-charge')}")
@@ -0,0 +1,128 @@
+"""
+Parameterized Gremlin traversal templates
+
+Every write submits a constant script plus a bindings dict, so the server sees
+the same script text for every document and can reuse its compiled traversal.
+Values never pass through string formatting, so quotes in names are harmless.
+"""
+
+import re
+from functools import lru_cache
+from gremlin_streaming import stream_results
+
+# Quoted string literals are left untouched when renaming binding parameters
+_QUOTED = re.compile(r"('(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\")")
+
+_TEMPLATES = {}
+# Script text -> template name, so instrumentation can label submissions by template
+_SCRIPT_NAMES = {}
+
+
+class TraversalTemplate:
+    """A named Gremlin script whose values are supplied as bindings"""
+
+    def __init__(self, name, script, params, binder=None):
+        self.name = name
+        self.script = script
+        self.params = tuple(params)
+        # Maps a source document to this template's binding values
+        self.binder = binder
+        _SCRIPT_NAMES.setdefault(script, name)
+
+    def bind(self, **values):
+        missing = [p for p in self.params if p not in values]
+        if missing:
+            raise KeyError(f"Template '{self.name}' is missing bindings: {missing}")
+        return {p: values[p] for p in self.params}
+
+    def bind_document(self, document):
+        if self.binder is None:
+            return self.bind(**document)
+        return self.bind(**self.binder(document))
+
+    def submit(self, gremlin_client, request_options=None, **values):
+        """Submit and return the ResultSet (blocks until the request is written)"""
+        return gremlin_client.submit(self.script, self.bind(**values),
+                                     request_options=request_options)
+
+    def submit_async(self, gremlin_client, request_options=None, **values):
+        """Submit and return a future resolving to the ResultSet"""
+        return gremlin_client.submit_async(self.script, self.bind(**values),
+                                           request_options=request_options)
+
+    def stream(self, gremlin_client, request_options=None, **values):
+        """Submit and return a ResultStream that yields rows as their frames arrive"""
+        return stream_results(gremlin_client, self.script, self.bind(**values),
+                              request_options=request_options)
+
+    def batched(self, size):
+        """Template that chains `size` copies of this traversal into one request"""
+        return _batched_template(self.name, size)
+
+    def bind_batch(self, documents):
+        """Bindings for batched(len(documents)), one source document per step"""
+        bindings = {}
+        for i, document in enumerate(documents):
+            for p, value in self.bind_document(document).items():
+                bindings[f"{p}{i}"] = value
+        return bindings
+
+
+def register_template(name, script, params, binder=None):
+    """Register (or return the already cached) template for `name`"""
+    template = _TEMPLATES.get(name)
+    if template is None:
+        template = TraversalTemplate(name, script, params, binder)
+        _TEMPLATES[name] = template
+    elif template.script != script:
+        raise ValueError(f"Template '{name}' is already registered with a different script")
+    return template
+
+
+def vertex_lookup(vertex_ids):
+    """(template, bindings) of g.V(vid0, ..., vidN).id(), which returns the given ids that exist.
+
+    One template is registered per lookup size.
+    """
+    params = [f"vid{i}" for i in range(len(vertex_ids))]
+    script = f"g.V({', '.join(params)}).id()"
+    template = register_template(f"lookup_vertex_ids[{len(params)}]", script, params)
+    return template, dict(zip(params, vertex_ids))
+
+
+def edge_lookup(edge_ids):
+    """(template, bindings) of g.E(eid0, ..., eidN).id(), the edge counterpart of vertex_lookup"""
+    params = [f"eid{i}" for i in range(len(edge_ids))]
+    script = f"g.E({', '.join(params)}).id()"
+    template = register_template(f"lookup_edge_ids[{len(params)}]", script, params)
+    return template, dict(zip(params, edge_ids))
+
+
+def get_template(name):
+    return _TEMPLATES[name]
+
+
+def template_name(script, default=None):
+    """Name of the template that produced `script`, or `default` for ad hoc scripts"""
+    return _SCRIPT_NAMES.get(script, default)
+
+
+def _rename_params(script, params, suffix):
+    pattern = re.compile(r"\b(" + "|".join(map(re.escape, params)) + r")\b")
+    parts = _QUOTED.split(script)
+    # Odd indexes are quoted literals from the capture group
+    return "".join(
+        part if i % 2 else pattern.sub(lambda m: m.group(1) + suffix, part)
+        for i, part in enumerate(parts)
+    )
+
+
+@lru_cache(maxsize=None)
+def _batched_template(name, size):
+    template = _TEMPLATES[name]
+    if not template.script.startswith("g."):
+        raise ValueError(f"Template '{name}' cannot be chained")
+    step = template.script[len("g."):]
+    steps = [_rename_params(step, template.params, str(i)) for i in range(size)]
+    params = [f"{p}{i}" for i in range(size) for p in template.params]
+    return TraversalTemplate(f"{name}[{size}]", "g." + ".".join(steps), params)
@@ -0,0 +1,108 @@
+"""
+Local content-hash index used to skip rewriting unchanged documents
+"""
+
+import os
+import json
+import hashlib
+import sqlite3
+import threading
+
+HASH_INDEX_PATH = os.getenv("HASH_INDEX_PATH", "content_hashes.db")
+
+# Cosmos system properties change on every write and say nothing about content
+SYSTEM_FIELDS = {"_rid", "_self", "_etag", "_attachments", "_ts", "_lsn"}
+
+
+def _digest(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def property_hashes(document, hash_overrides=None):
+    """Hash each top-level property; overrides supply a precomputed hash for a property"""
+    hashes = {}
+    for key, value in document.items():
+        if key in SYSTEM_FIELDS:
+            continue
+        override = hash_overrides.get(key) if hash_overrides else None
+        precomputed = override(value) if override else None
+        if precomputed is not None:
+            hashes[key] = f"hint:{precomputed}"
+        else:
+            encoded = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+            hashes[key] = _digest(encoded.encode("utf-8"))
+    return hashes
+
+
+def content_hash(prop_hashes):
+    return _digest("".join(f"{k}={prop_hashes[k]};" for k in sorted(prop_hashes)).encode("utf-8"))
+
+
+def index_namespace(name, *targets):
+    """Namespace for `name` scoped to the endpoints, databases and containers/graphs written to.
+
+    A hash recorded for one account or graph then never makes a document look unchanged
+    when the same index file is used against another one.
+    """
+    return "|".join([name] + ["" if target is None else str(target) for target in targets])
+
+
+class ContentHashIndex:
+    """Maps document id -> content hash (plus per-property hashes) in SQLite.
+
+    Each caller uses its own namespace (see index_namespace) so ids written to different
+    accounts, containers or graphs never collide.
+    """
+
+    def __init__(self, path=HASH_INDEX_PATH, namespace="documents", hash_overrides=None):
+        self.namespace = namespace
+        self.hash_overrides = hash_overrides or {}
+        # WAL plus a busy timeout lets several backfill processes share one index file;
+        # within a process, writers may run on worker threads, serialised by the lock
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS content_hashes ("
+            " namespace TEXT NOT NULL,"
+            " doc_id TEXT NOT NULL,"
+            " doc_hash TEXT NOT NULL,"
+            " prop_hashes TEXT NOT NULL,"
+            " PRIMARY KEY (namespace, doc_id))"
+        )
+        self.conn.commit()
+
+    def diff(self, document):
+        """Return (status, changed_properties) with status 'new', 'changed' or 'unchanged'"""
+        hashes = property_hashes(document, self.hash_overrides)
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT doc_hash, prop_hashes FROM content_hashes WHERE namespace = ? AND doc_id = ?",
+                (self.namespace, str(document["id"]))
+            ).fetchone()
+        if row is None:
+            return "new", set(hashes)
+        if row[0] == content_hash(hashes):
+            return "unchanged", set()
+        previous = json.loads(row[1])
+        changed = {k for k in hashes.keys() | previous.keys() if hashes.get(k) != previous.get(k)}
+        return "changed", changed
+
+    def record_many(self, documents):
+        rows = []
+        for document in documents:
+            hashes = property_hashes(document, self.hash_overrides)
+            rows.append((self.namespace, str(document["id"]), content_hash(hashes), json.dumps(hashes)))
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO content_hashes (namespace, doc_id, doc_hash, prop_hashes) "
+                "VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self.conn.commit()
+
+    def record(self, document):
+        self.record_many([document])
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,180 @@
+"""
+Write and query RU of the same workload under two indexing policies
+
+Each policy gets a scratch container in the dual-API database. The same items are
+written to both, the project's filters are run against both, and the request
+charges are printed side by side. The scratch containers are deleted afterwards.
+By default "before" is the live DualApiContainer policy and "after" is
+DUAL_API_INDEXING_POLICY.
+"""
+
+import os
+import json
+import random
+from azure.cosmos import PartitionKey, exceptions
+from colorama import Fore, init
+from dotenv import load_dotenv
+from client_registry import CLIENTS
+from dual_api_schema import DUAL_API_INDEXING_POLICY
+from resilience import execute_with_retry
+
+# Initialize colorama for colored output
+init()
+
+# Load environment variables from .env file
+load_dotenv()
+
+INDEX_COST_DATABASE = os.getenv("INDEX_COST_DATABASE", "DualApiDB")
+INDEX_COST_CONTAINER = os.getenv("INDEX_COST_CONTAINER", "DualApiContainer")
+INDEX_COST_ITEMS = int(os.getenv("INDEX_COST_ITEMS", "200"))
+# JSONL of real items (each with a pk) to write instead of the synthetic ones
+INDEX_COST_ITEMS_PATH = os.getenv("INDEX_COST_ITEMS_PATH", "")
+INDEX_COST_OUTPUT = os.getenv("INDEX_COST_OUTPUT", "")
+# Run against the in-memory stand-in instead of the live account
+INDEX_COST_STANDIN = os.getenv("INDEX_COST_STANDIN", "false").lower() == "true"
+
+# What a container gets without an explicit policy
+INDEX_EVERYTHING_POLICY = {
+    "indexingMode": "consistent",
+    "automatic": True,
+    "includedPaths": [{"path": "/*"}],
+    "excludedPaths": [{"path": '/"_etag"/?'}]
+}
+
+# (name, query, parameters) for the filters the project runs
+QUERIES = [
+    ("type", "SELECT * FROM c WHERE c.type = @type", [{"name": "@type", "value": "vertex"}]),
+    ("type_label", "SELECT * FROM c WHERE c.type = @type AND c.label = @label",
+     [{"name": "@type", "value": "vertex"}, {"name": "@label", "value": "Central_Theme"}]),
+    ("type_order_by_label", "SELECT * FROM c WHERE c.type = @type ORDER BY c.label",
+     [{"name": "@type", "value": "vertex"}]),
+    # Filters inside an excluded blob fall back to a scan; shows what exclusion costs
+    ("analysis_score", "SELECT * FROM c WHERE c.analysis.securityScore > @score",
+     [{"name": "@score", "value": 0.5}])
+]
+
+
+def sample_items(count=INDEX_COST_ITEMS, seed=42):
+    """Vertex and edge documents shaped like the DualApiSchema samples, with nested blobs"""
+    rng = random.Random(seed)
+    labels = ["Central_Theme", "Concept", "API"]
+    items = []
+    for i in range(count):
+        is_edge = i % 4 == 3
+        item = {
+            "id": f"index-cost-{i}",
+            "label": "INFLUENCES" if is_edge else rng.choice(labels),
+            "type": "edge" if is_edge else "vertex",
+            "pk": f"pk-{i % 16}",
+            "properties": {
+                "name": f"Node {i}",
+                "category": rng.choice(["Macro", "Micro", "Policy"]),
+                "weight": round(rng.random(), 3),
+                "tags": [f"tag-{rng.randint(0, 99)}" for _ in range(5)]
+            },
+            "techStack": {
+                "languages": rng.sample(["Python", "Java", "Node.js", "Go", "Rust"], 3),
+                "dependencies": [{"name": f"dep-{rng.randint(0, 999)}", "version": f"{rng.randint(1, 9)}.0"}
+                                 for _ in range(4)]
+            },
+            "analysis": {
+                "securityScore": round(rng.random(), 2),
+                "reliabilityScore": round(rng.random(), 2),
+                "maintainabilityScore": round(rng.random(), 2)
+            }
+        }
+        if is_edge:
+            item["_fromId"] = f"index-cost-{i - 1}"
+            item["_toId"] = f"index-cost-{i - 2}"
+        items.append(item)
+    return items
+
+
+def _load_items(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _charge(headers):
+    return float((headers or {}).get("x-ms-request-charge", 0) or 0)
+
+
+def measure_policy(database, name, policy, items, queries=QUERIES):
+    """Write items to a scratch container under policy and run the queries; returns the RU"""
+    container_id = f"index-cost-{name}"
+    container = database.create_container_if_not_exists(
+        id=container_id, partition_key=PartitionKey(path="/pk"), indexing_policy=policy
+    )
+    try:
+        write_charges = []
+
+        def on_write(headers, result):
+            write_charges.append(_charge(headers))
+
+        for item in items:
+            execute_with_retry(lambda: container.upsert_item(body=item, response_hook=on_write))
+
+        query_charges = {}
+        for query_name, query, parameters in queries:
+            page_charges = []
+            try:
+                execute_with_retry(lambda: list(container.query_items(
+                    query=query, parameters=parameters, enable_cross_partition_query=True,
+                    response_hook=lambda headers, result: page_charges.append(_charge(headers))
+                )))
+                query_charges[query_name] = round(sum(page_charges), 2)
+            except exceptions.CosmosHttpResponseError as e:
+                # e.g. ORDER BY on a path the policy no longer indexes
+                query_charges[query_name] = f"error {e.status_code}"
+        return {
+            "write_ru_total": round(sum(write_charges), 2),
+            "write_ru_per_item": round(sum(write_charges) / len(write_charges), 3) if write_charges else None,
+            "query_ru": query_charges
+        }
+    finally:
+        database.delete_container(container_id)
+
+
+def _change(before, after):
+    if not isinstance(before, (int, float)) or not isinstance(after, (int, float)) or not before:
+        return ""
+    return f"{(after - before) / before * 100:+.1f}%"
+
+
+def compare_policies(database, before_policy, after_policy, items, output=INDEX_COST_OUTPUT):
+    before = measure_policy(database, "before", before_policy, items)
+    after = measure_policy(database, "after", after_policy, items)
+
+    print(Fore.CYAN + f"Indexing policy cost over {len(items)} items (before -> after):")
+    for key in ("write_ru_per_item", "write_ru_total"):
+        print(Fore.CYAN + f"  {key}: {before[key]} -> {after[key]} {_change(before[key], after[key])}")
+    for query_name, _, _ in QUERIES:
+        b, a = before["query_ru"][query_name], after["query_ru"][query_name]
+        print(Fore.CYAN + f"  query {query_name}: {b} -> {a} RU {_change(b, a)}")
+
+    report = {"items": len(items), "before": dict(before, policy=before_policy),
+              "after": dict(after, policy=after_policy)}
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(Fore.BLUE + f"Results written to {output}")
+    return report
+
+
+def current_policy(database, container_id=INDEX_COST_CONTAINER):
+    """Indexing policy of the live container, or the index-everything default if it is missing"""
+    try:
+        return database.get_container_client(container_id).read()["indexingPolicy"]
+    except exceptions.CosmosResourceNotFoundError:
+        return INDEX_EVERYTHING_POLICY
+
+
+if __name__ == "__main__":
+    if INDEX_COST_STANDIN:
+        from cosmos_standin import CosmosStandIn
+        cosmos_client = CosmosStandIn()
+    else:
+        cosmos_client = CLIENTS.cosmos()
+    database = cosmos_client.create_database_if_not_exists(id=INDEX_COST_DATABASE)
+    items = _load_items(INDEX_COST_ITEMS_PATH) if INDEX_COST_ITEMS_PATH else sample_items()
+    compare_policies(database, current_policy(database), DUAL_API_INDEXING_POLICY, items)
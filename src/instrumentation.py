@@ -0,0 +1,326 @@
+"""
+Request charge, latency and payload size for every Cosmos and Gremlin call
+
+Container clients and Gremlin clients are wrapped in proxies that record each
+operation into a shared registry of histograms, keyed by API, operation type and
+status. The registry can be exported as Prometheus text or JSON.
+"""
+
+import os
+import re
+import json
+import time
+import bisect
+import inspect
+import threading
+from colorama import Fore
+from gremlin_templates import template_name
+from resilience import classify_error
+
+# Written on report() when set; a .prom suffix selects Prometheus text, anything else JSON
+METRICS_EXPORT_PATH = os.getenv("METRICS_EXPORT_PATH", "")
+
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+CHARGE_BUCKETS_RU = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+PAYLOAD_BUCKETS_BYTES = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# Container methods that reach the service; everything else passes straight through
+COSMOS_OPERATIONS = {
+    "create_item", "upsert_item", "replace_item", "patch_item", "read_item", "delete_item",
+    "query_items", "read_all_items", "query_items_change_feed", "read"
+}
+_WRITE_OPERATIONS = {"create_item", "upsert_item", "replace_item"}
+# Batched templates are reported under their base name, e.g. add_person[25] -> add_person
+_BATCH_SUFFIX = re.compile(r"\[\d+\]$")
+
+
+class Histogram:
+    """Fixed-bucket histogram with Prometheus-style cumulative export"""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th observation"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            yield bound, total
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "buckets": {("+Inf" if b == float("inf") else b): c for b, c in self.cumulative()},
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99)
+        }
+
+
+class OperationStats:
+    def __init__(self):
+        self.latency_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.charge_ru = Histogram(CHARGE_BUCKETS_RU)
+        self.payload_bytes = Histogram(PAYLOAD_BUCKETS_BYTES)
+
+
+class MetricsRegistry:
+    """Thread-safe per-(api, op, status) histograms of latency, RU and payload size"""
+
+    def __init__(self):
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, api, op, status, latency_ms, charge=None, payload_bytes=None):
+        key = (api, op, str(status))
+        with self._lock:
+            stats = self._series.get(key)
+            if stats is None:
+                stats = self._series[key] = OperationStats()
+            stats.latency_ms.observe(latency_ms)
+            if charge is not None:
+                stats.charge_ru.observe(charge)
+            if payload_bytes is not None:
+                stats.payload_bytes.observe(payload_bytes)
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def snapshot(self):
+        with self._lock:
+            return [
+                {
+                    "api": api, "op": op, "status": status,
+                    "latency_ms": stats.latency_ms.to_dict(),
+                    "charge_ru": stats.charge_ru.to_dict(),
+                    "payload_bytes": stats.payload_bytes.to_dict()
+                }
+                for (api, op, status), stats in sorted(self._series.items())
+            ]
+
+    def to_json(self, indent=2):
+        return json.dumps({"generated_at": time.time(), "operations": self.snapshot()}, indent=indent)
+
+    def to_prometheus(self, prefix="dualapi"):
+        families = [
+            ("latency_ms", "request_duration_ms", "Round-trip latency in milliseconds"),
+            ("charge_ru", "request_charge_ru", "Request charge in request units"),
+            ("payload_bytes", "request_payload_bytes", "Request payload size in bytes")
+        ]
+        with self._lock:
+            series = sorted(self._series.items())
+            lines = []
+            for attr, name, help_text in families:
+                metric = f"{prefix}_{name}"
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} histogram")
+                for (api, op, status), stats in series:
+                    histogram = getattr(stats, attr)
+                    if not histogram.count:
+                        continue
+                    labels = f'api="{api}",op="{op}",status="{status}"'
+                    for bound, total in histogram.cumulative():
+                        le = "+Inf" if bound == float("inf") else bound
+                        lines.append(f'{metric}_bucket{{{labels},le="{le}"}} {total}')
+                    lines.append(f"{metric}_sum{{{labels}}} {histogram.sum}")
+                    lines.append(f"{metric}_count{{{labels}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        text = self.to_prometheus() if path.endswith(".prom") else self.to_json()
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+    def report(self, export_path=METRICS_EXPORT_PATH):
+        """Print operations ordered by total RU, then export if a path is configured"""
+        rows = sorted(self.snapshot(), key=lambda r: r["charge_ru"]["sum"], reverse=True)
+        if rows:
+            print(Fore.CYAN + "Request charge by operation:")
+        for r in rows:
+            calls = r["latency_ms"]["count"]
+            charge = r["charge_ru"]
+            mean_ru = charge["sum"] / charge["count"] if charge["count"] else 0.0
+            print(Fore.CYAN + f"  {r['api']}.{r['op']} [{r['status']}]: {calls} calls, "
+                              f"{charge['sum']:.1f} RU total, {mean_ru:.2f} RU/call, "
+                              f"p95 {r['latency_ms']['p95']} ms")
+        if export_path:
+            self.export(export_path)
+            print(Fore.BLUE + f"Metrics written to {export_path}")
+
+
+# Process-wide registry shared by every instrumented client
+METRICS = MetricsRegistry()
+
+
+def _payload_size(value):
+    if value is None:
+        return None
+    if isinstance(value, (bytes, str)):
+        return len(value.encode("utf-8") if isinstance(value, str) else value)
+    return len(json.dumps(value, default=str).encode("utf-8"))
+
+
+def _charge(headers):
+    value = (headers or {}).get("x-ms-request-charge")
+    return float(value) if value is not None else None
+
+
+class InstrumentedContainer:
+    """Container client proxy that records RU, latency, payload size and status per call.
+
+    Works for both azure.cosmos and azure.cosmos.aio container clients. Queries are
+    recorded once per page through the SDK's response_hook.
+    """
+
+    def __init__(self, container, registry=METRICS):
+        self._container = container
+        self._registry = registry
+
+    def __getattr__(self, name):
+        attr = getattr(self._container, name)
+        if name not in COSMOS_OPERATIONS:
+            return attr
+        if name in ("query_items", "read_all_items", "query_items_change_feed"):
+            return lambda *args, **kwargs: self._query(name, attr, *args, **kwargs)
+        return lambda *args, **kwargs: self._call(name, attr, *args, **kwargs)
+
+    def _record(self, op, status, started, headers, payload_bytes=None):
+        if payload_bytes is None and headers:
+            length = headers.get("Content-Length") or headers.get("content-length")
+            payload_bytes = int(length) if length else None
+        self._registry.observe("cosmos", op, status, (time.perf_counter() - started) * 1000,
+                               _charge(headers), payload_bytes)
+
+    def _failed(self, op, started, error):
+        status, _ = classify_error(error)
+        self._record(op, status or type(error).__name__, started, getattr(error, "headers", None))
+
+    def _call(self, op, method, *args, **kwargs):
+        user_hook = kwargs.pop("response_hook", None)
+        seen = {}
+
+        def hook(headers, result):
+            seen["headers"] = headers
+            if user_hook is not None:
+                user_hook(headers, result)
+
+        body = kwargs.get("body", args[-1] if args and op in _WRITE_OPERATIONS else None)
+        payload_bytes = _payload_size(body)
+        started = time.perf_counter()
+        try:
+            result = method(*args, response_hook=hook, **kwargs)
+        except Exception as e:
+            self._failed(op, started, e)
+            raise
+        if inspect.isawaitable(result):
+            return self._await(op, result, started, seen, payload_bytes)
+        self._record(op, 200, started, seen.get("headers"), payload_bytes)
+        return result
+
+    async def _await(self, op, awaitable, started, seen, payload_bytes):
+        try:
+            result = await awaitable
+        except Exception as e:
+            self._failed(op, started, e)
+            raise
+        self._record(op, 200, started, seen.get("headers"), payload_bytes)
+        return result
+
+    def _query(self, op, method, *args, **kwargs):
+        user_hook = kwargs.pop("response_hook", None)
+        # Each page is timed from the previous page (or the call) to its response
+        last = [time.perf_counter()]
+
+        def hook(headers, result):
+            self._record(op, 200, last[0], headers)
+            last[0] = time.perf_counter()
+            if user_hook is not None:
+                user_hook(headers, result)
+
+        return method(*args, response_hook=hook, **kwargs)
+
+
+class InstrumentedGremlinClient:
+    """Gremlin client proxy that records RU, latency, payload size and status per request.
+
+    Requests are labelled by the template that produced the script (see
+    gremlin_templates.template_name); other scripts are recorded as "adhoc".
+    Latency runs until the result stream is complete, since Cosmos reports the
+    total request charge only in the final status attributes.
+    """
+
+    def __init__(self, gremlin_client, registry=METRICS):
+        self._client = gremlin_client
+        self._registry = registry
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    def _record(self, op, started, payload_bytes, attributes, error=None):
+        attributes = attributes or {}
+        if error is not None:
+            status = classify_error(error)[0] or type(error).__name__
+        else:
+            status = attributes.get("x-ms-status-code", 200)
+        charge = attributes.get("x-ms-total-request-charge")
+        self._registry.observe("gremlin", op, status, (time.perf_counter() - started) * 1000,
+                               float(charge) if charge is not None else None, payload_bytes)
+
+    def submit_async(self, message, bindings=None, request_options=None):
+        op = _BATCH_SUFFIX.sub("", template_name(message, "adhoc"))
+        payload_bytes = _payload_size(message) + (_payload_size(bindings) or 0)
+        started = time.perf_counter()
+        try:
+            future = self._client.submit_async(message, bindings=bindings, request_options=request_options)
+        except Exception as e:
+            self._record(op, started, payload_bytes, None, e)
+            raise
+
+        def on_result_set(f):
+            error = f.exception()
+            if error is not None:
+                self._record(op, started, payload_bytes, getattr(error, "status_attributes", None), error)
+                return
+            result_set = f.result()
+
+            def on_done(done):
+                error = done.exception()
+                attributes = getattr(error, "status_attributes", None) if error else result_set.status_attributes
+                self._record(op, started, payload_bytes, attributes, error)
+
+            result_set.done.add_done_callback(on_done)
+
+        future.add_done_callback(on_result_set)
+        return future
+
+    def submitAsync(self, message, bindings=None, request_options=None):
+        return self.submit_async(message, bindings, request_options)
+
+    def submit(self, message, bindings=None, request_options=None):
+        return self.submit_async(message, bindings=bindings, request_options=request_options).result()
+
+    def close(self):
+        self._client.close()
@@ -8,11 +8,11 @@ import nest_asyncio
 from typing import Dict, List, Optional
 from azure.identity import DefaultAzureCredential
 from azure.ai.projects import AIProjectClient
-from azure.cosmos import CosmosClient
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field
 from pydantic_ai import Agent, ModelRetry, RunContext, Tool
 from pydantic_ai.models.openai import OpenAIModel
+from client_registry import CLIENTS
 
 # Enable nested event loops
 nest_asyncio.apply()
@@ -22,10 +22,7 @@ load_dotenv()
 
 try:
     # Initialize Cosmos DB client
-    cosmos_client = CosmosClient(
-        url=os.getenv("COSMOS_ENDPOINT"),
-        credential=str(os.getenv("COSMOS_KEY"))
-    )
+    cosmos_client = CLIENTS.cosmos(credential=str(os.getenv("COSMOS_KEY")))
 
     database = cosmos_client.get_database_client(os.getenv("DATABASE_NAME"))
     container = database.get_container_client(os.getenv("CONTAINER_NAME"))
@@ -0,0 +1,123 @@
+"""
+Partition-parallel backfill: one worker process per feed range (physical partition)
+"""
+
+import os
+import sys
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from colorama import Fore, init
+from dotenv import load_dotenv
+from dual_api_document_processor import DocumentProcessor, DEFAULT_BATCH_SIZE, DEFAULT_PAGE_SIZE
+
+# Initialize colorama for colored output
+init()
+
+# Load environment variables from .env file
+load_dotenv()
+
+BACKFILL_WORKERS = int(os.getenv("BACKFILL_WORKERS", str(os.cpu_count() or 1)))
+
+# Per-process state, set up once by the pool initializer
+_processor = None
+_progress = None
+
+
+def _init_worker(progress_queue):
+    global _processor, _progress
+    # Each worker owns its own Cosmos and Gremlin connections
+    _processor = DocumentProcessor()
+    _progress = progress_queue
+
+
+def backfill_range(range_no, feed_range, batch_size=DEFAULT_BATCH_SIZE,
+                   max_item_count=DEFAULT_PAGE_SIZE):
+    """Stream one feed range into the graph and return its summary"""
+    started = time.perf_counter()
+    failed_before = len(_processor.failed_documents)
+    processed = 0
+    pages = _processor.container.query_items(
+        query="SELECT * FROM c",
+        feed_range=feed_range,
+        max_item_count=max_item_count
+    ).by_page()
+    for page in pages:
+        documents = list(page)
+        _processor.write_documents(documents, batch_size)
+        processed += len(documents)
+        _progress.put((range_no, processed))
+    _processor.verifier.finish()
+    return {
+        "range": range_no,
+        "processed": processed,
+        "failed": _processor.failed_documents[failed_before:],
+        "elapsed": time.perf_counter() - started
+    }
+
+
+def _report_progress(progress_queue, range_count):
+    # Aggregate per-range counters reported by the workers
+    done = {}
+    while True:
+        item = progress_queue.get()
+        if item is None:
+            break
+        range_no, processed = item
+        done[range_no] = processed
+        print(Fore.BLUE + f"Range {range_no + 1}/{range_count}: {processed} documents "
+                          f"(total {sum(done.values())})")
+
+
+def run_backfill(workers=BACKFILL_WORKERS, batch_size=DEFAULT_BATCH_SIZE,
+                 max_item_count=DEFAULT_PAGE_SIZE):
+    processor = DocumentProcessor()
+    try:
+        feed_ranges = list(processor.container.read_feed_ranges())
+    except Exception as e:
+        print(Fore.RED + f"Error reading feed ranges: {e}")
+        sys.exit(1)
+    finally:
+        processor.gremlin_client.close()
+    print(Fore.GREEN + f"Backfilling {len(feed_ranges)} feed ranges with {workers} workers")
+
+    # Spawn so workers never inherit the parent's open sockets or event loops
+    context = multiprocessing.get_context("spawn")
+    manager = context.Manager()
+    progress_queue = manager.Queue()
+    reporter = threading.Thread(target=_report_progress, args=(progress_queue, len(feed_ranges)))
+    reporter.start()
+
+    started = time.perf_counter()
+    results = []
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=_init_worker, initargs=(progress_queue,)) as pool:
+            futures = {
+                pool.submit(backfill_range, range_no, feed_range, batch_size, max_item_count): range_no
+                for range_no, feed_range in enumerate(feed_ranges)
+            }
+            for future in as_completed(futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    print(Fore.RED + f"Range {futures[future] + 1} failed: {e}")
+    finally:
+        progress_queue.put(None)
+        reporter.join()
+        manager.shutdown()
+
+    elapsed = time.perf_counter() - started
+    processed = sum(r["processed"] for r in results)
+    rate = processed / elapsed if elapsed > 0 else 0.0
+    for r in sorted(results, key=lambda r: r["range"]):
+        print(Fore.GREEN + f"Range {r['range'] + 1}: {r['processed']} documents in {r['elapsed']:.2f}s")
+        for doc_id, error in r["failed"]:
+            print(Fore.RED + f"  {doc_id}: {error}")
+    print(Fore.GREEN + f"Backfill finished: {processed} documents in {elapsed:.2f}s ({rate:.1f} docs/s)")
+    return results
+
+
+if __name__ == "__main__":
+    run_backfill()
@@ -0,0 +1,123 @@
+"""
+Partition key strategies for the dual-API containers
+
+A fixed value such as pk "relationship" puts every edge in one logical partition,
+so all of their writes land on one physical partition however much throughput
+the container has. A synthetic key appends a hash bucket of the item id to a
+prefix field (e.g. "Central_Theme-07"), spreading a label over `buckets` logical
+partitions while staying computable from (prefix, id) for point reads. A
+hierarchical key (MultiHash) adds the prefix as a first level so queries on one
+label still target a subset of partitions; it is NoSQL only, graph vertices use
+the synthetic leaf key as their 'pk' property.
+"""
+
+import os
+import zlib
+from azure.cosmos import PartitionKey
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# "synthetic", "hierarchical" or "id" (one logical partition per item, the registry default)
+PARTITION_KEY_STRATEGY = os.getenv("PARTITION_KEY_STRATEGY", "synthetic")
+# Logical partitions per prefix value; more buckets spread hot labels further but fan out reads
+PARTITION_KEY_BUCKETS = int(os.getenv("PARTITION_KEY_BUCKETS", "32"))
+# Top-level field the key starts with; also the first level of a hierarchical key
+PARTITION_KEY_PREFIX_FIELD = os.getenv("PARTITION_KEY_PREFIX_FIELD", "label")
+
+
+def bucket_of(item_id, buckets):
+    """Stable hash bucket of an id; crc32 so every process and language agrees"""
+    return zlib.crc32(str(item_id).encode("utf-8")) % buckets
+
+
+class IdKey:
+    """Partition on /id: every item is its own logical partition"""
+
+    name = "id"
+    paths = ["/id"]
+
+    def partition_key(self):
+        return PartitionKey(path="/id")
+
+    def assign(self, item):
+        return item
+
+    def partition_key_value(self, item):
+        return item["id"]
+
+    def graph_key(self, prefix, item_id):
+        return item_id
+
+
+class SyntheticKey:
+    """pk = "<prefix>-<bucket>", the bucket being a hash of the item id"""
+
+    name = "synthetic"
+
+    property = "pk"
+    paths = ["/pk"]
+
+    def __init__(self, prefix_field=PARTITION_KEY_PREFIX_FIELD, buckets=PARTITION_KEY_BUCKETS):
+        self.prefix_field = prefix_field
+        self.buckets = max(1, buckets)
+
+    def key(self, prefix, item_id):
+        return f"{prefix}-{bucket_of(item_id, self.buckets):02d}"
+
+    def key_for(self, item):
+        return self.key(item.get(self.prefix_field, "none"), item["id"])
+
+    def keys_for_prefix(self, prefix):
+        """Every key a prefix can map to, for queries that fan out over one label"""
+        return [f"{prefix}-{bucket:02d}" for bucket in range(self.buckets)]
+
+    def partition_key(self):
+        return PartitionKey(path=self.paths[0])
+
+    def assign(self, item):
+        """Set the key property on the item (in place) and return it"""
+        item[self.property] = self.key_for(item)
+        return item
+
+    def partition_key_value(self, item):
+        return self.key_for(item)
+
+    def graph_key(self, prefix, item_id):
+        return self.key(prefix, item_id)
+
+
+class HierarchicalKey:
+    """MultiHash key: /<prefix field>, then the synthetic key computed by the leaf"""
+
+    name = "hierarchical"
+
+    def __init__(self, prefix_field=PARTITION_KEY_PREFIX_FIELD, buckets=PARTITION_KEY_BUCKETS):
+        self.leaf = SyntheticKey(prefix_field, buckets)
+        self.paths = [f"/{prefix_field}"] + self.leaf.paths
+
+    def partition_key(self):
+        return PartitionKey(path=self.paths, kind="MultiHash")
+
+    def assign(self, item):
+        return self.leaf.assign(item)
+
+    def partition_key_value(self, item):
+        return [item.get(self.leaf.prefix_field), self.leaf.key_for(item)]
+
+    def graph_key(self, prefix, item_id):
+        # The Gremlin API has no hierarchical keys; vertices use the leaf value
+        return self.leaf.graph_key(prefix, item_id)
+
+
+def partition_strategy(name=PARTITION_KEY_STRATEGY, prefix_field=PARTITION_KEY_PREFIX_FIELD,
+                       buckets=PARTITION_KEY_BUCKETS):
+    """Strategy instance by name"""
+    if name == "id":
+        return IdKey()
+    if name == "synthetic":
+        return SyntheticKey(prefix_field, buckets)
+    if name == "hierarchical":
+        return HierarchicalKey(prefix_field, buckets)
+    raise ValueError(f"Unknown partition key strategy '{name}' (expected id, synthetic or hierarchical)")
@@ -0,0 +1,173 @@
+"""
+Rewrite the items of a container under a new partition key strategy
+
+In place (no MIGRATION_TARGET_CONTAINER): the container keeps its key paths, so
+only the key values change, e.g. pk "central_theme" -> "Central_Theme-07". Each
+item is written under its new key and then deleted under its old one. The paths
+of a container cannot change, so a different set of paths (e.g. /id -> /pk, or a
+hierarchical key) is a copy into a new container created with the new key; the
+source is left untouched for the switch-over.
+
+Items already under their new key are skipped, so an interrupted run is resumed
+by running it again. Documents the Gremlin API wrote itself are skipped too: the
+graph keeps edges next to their source vertex, so they are re-projected from
+NoSQL (partition_backfill.py) rather than moved here.
+"""
+
+import os
+import time
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from colorama import Fore, init
+from dotenv import load_dotenv
+from change_feed_sync import is_graph_document
+from client_registry import CLIENTS
+from partition_keys import partition_strategy, PARTITION_KEY_STRATEGY
+from resilience import DeadLetterQueue, execute_with_retry
+
+# Initialize colorama for colored output
+init()
+
+# Load environment variables from .env file
+load_dotenv()
+
+MIGRATION_DATABASE = os.getenv("MIGRATION_DATABASE", "DualApiDB")
+MIGRATION_SOURCE_CONTAINER = os.getenv("MIGRATION_SOURCE_CONTAINER", "DualApiContainer")
+# Empty rewrites the source in place
+MIGRATION_TARGET_CONTAINER = os.getenv("MIGRATION_TARGET_CONTAINER", "")
+MIGRATION_STRATEGY = os.getenv("MIGRATION_STRATEGY", PARTITION_KEY_STRATEGY)
+MIGRATION_PREFIX_FIELD = os.getenv("MIGRATION_PREFIX_FIELD", "label")
+# Throughput of a newly created target container; spread over its physical partitions
+MIGRATION_TARGET_THROUGHPUT = int(os.getenv("MIGRATION_TARGET_THROUGHPUT", "400"))
+MIGRATION_CONCURRENCY = int(os.getenv("MIGRATION_CONCURRENCY", "16"))
+MIGRATION_PAGE_SIZE = int(os.getenv("MIGRATION_PAGE_SIZE", "100"))
+# Run against the in-memory stand-in instead of the live account
+MIGRATION_STANDIN = os.getenv("MIGRATION_STANDIN", "false").lower() == "true"
+
+# Properties the service sets on every item; they are regenerated on write
+SYSTEM_PROPERTIES = {"_rid", "_self", "_etag", "_attachments", "_ts", "_lsn"}
+
+
+def _value_at(item, path):
+    value = item
+    for part in path.strip("/").split("/"):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def key_value(item, paths):
+    """Partition key value of an item for a container partitioned on `paths`"""
+    values = [_value_at(item, path) for path in paths]
+    return values[0] if len(values) == 1 else values
+
+
+class PartitionMigration:
+    def __init__(self, database, source_id, strategy, target_id=None,
+                 concurrency=MIGRATION_CONCURRENCY, page_size=MIGRATION_PAGE_SIZE,
+                 target_throughput=MIGRATION_TARGET_THROUGHPUT):
+        self.source = database.get_container_client(source_id)
+        self.source_paths = self.source.read()["partitionKey"]["paths"]
+        self.strategy = strategy
+        self.in_place = not target_id
+        if self.in_place:
+            if self.source_paths != strategy.paths:
+                raise ValueError(
+                    f"'{source_id}' is partitioned on {self.source_paths}; the {strategy.name} strategy "
+                    f"needs {strategy.paths}, so set MIGRATION_TARGET_CONTAINER to copy into a new container"
+                )
+            self.target = self.source
+        else:
+            self.target = database.create_container_if_not_exists(
+                id=target_id, partition_key=strategy.partition_key(), offer_throughput=target_throughput
+            )
+        self.page_size = page_size
+        self.pool = ThreadPoolExecutor(max_workers=max(1, concurrency))
+        self.dead_letter = DeadLetterQueue()
+        self.counts = Counter()
+        self.keys = Counter()
+        self.lock = threading.Lock()
+        # In place, rewritten items can come back in later pages of the same scan
+        self.migrated = set()
+
+    def _migrate_item(self, item):
+        if is_graph_document(item):
+            return "skipped", None
+        body = self.strategy.assign({k: v for k, v in item.items() if k not in SYSTEM_PROPERTIES})
+        new_key = self.strategy.partition_key_value(body)
+        old_key = key_value(item, self.source_paths)
+        if self.in_place and (item["id"], str(new_key)) in self.migrated:
+            return None, None
+        if self.in_place and old_key == new_key:
+            return "unchanged", new_key
+        try:
+            execute_with_retry(lambda: self.target.upsert_item(body=body), op="cosmos.upsert_item",
+                               payload=body, dead_letter=self.dead_letter)
+            if self.in_place:
+                with self.lock:
+                    self.migrated.add((item["id"], str(new_key)))
+                # Written first, so a failure here leaves a duplicate rather than a lost item
+                execute_with_retry(lambda: self.source.delete_item(item["id"], partition_key=old_key))
+        except Exception as e:
+            print(Fore.RED + f"Could not migrate '{item['id']}': {e}")
+            return "failed", None
+        return "migrated", new_key
+
+    def _record(self, outcome):
+        status, key = outcome
+        if status is None:
+            return
+        self.counts[status] += 1
+        if key is not None:
+            self.keys[str(key)] += 1
+
+    def run(self):
+        """Migrate every item; returns per-status counts and the new key distribution"""
+        started = time.perf_counter()
+        pages = self.source.query_items(
+            query="SELECT * FROM c", enable_cross_partition_query=True, max_item_count=self.page_size
+        ).by_page()
+        for page in pages:
+            for outcome in self.pool.map(self._migrate_item, list(page)):
+                self._record(outcome)
+            print(Fore.BLUE + f"{sum(self.counts.values())} items processed ({self.counts['failed']} failed)")
+        elapsed = time.perf_counter() - started
+        report = {"counts": dict(self.counts), "distinct_keys": len(self.keys),
+                  "hottest_keys": self.keys.most_common(5), "elapsed": round(elapsed, 2)}
+        self.print_report(report)
+        return report
+
+    def print_report(self, report):
+        summary = ", ".join(f"{count} {status}" for status, count in sorted(report["counts"].items()))
+        print(Fore.GREEN + f"Migration to the {self.strategy.name} key done in {report['elapsed']}s: "
+                           f"{summary}")
+        total = sum(self.keys.values())
+        print(Fore.CYAN + f"  {report['distinct_keys']} distinct partition key values")
+        for key, count in report["hottest_keys"]:
+            print(Fore.CYAN + f"  {key}: {count} items ({count / total * 100:.1f}%)")
+        if self.counts["skipped"]:
+            print(Fore.YELLOW + f"  {self.counts['skipped']} Gremlin-written documents skipped; "
+                                "re-project them with partition_backfill.py")
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+
+
+if __name__ == "__main__":
+    if MIGRATION_STANDIN:
+        from cosmos_standin import CosmosStandIn
+        cosmos_client = CosmosStandIn()
+    else:
+        cosmos_client = CLIENTS.cosmos()
+    database = cosmos_client.get_database_client(MIGRATION_DATABASE)
+    migration = PartitionMigration(
+        database, MIGRATION_SOURCE_CONTAINER,
+        partition_strategy(MIGRATION_STRATEGY, prefix_field=MIGRATION_PREFIX_FIELD),
+        target_id=MIGRATION_TARGET_CONTAINER or None
+    )
+    try:
+        migration.run()
+    finally:
+        migration.close()
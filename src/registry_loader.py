@@ -0,0 +1,292 @@
+"""
+Bulk api_registry loader: streams api_items from a JSONL file into NoSQL and the graph
+
+NoSQL items are written concurrently from a thread pool (by default the container
+is partitioned on /id, so transactional batches would hold one item each), and
+vertices are created in chained addV traversals of up to REGISTRY_VERTEX_BATCH_SIZE.
+With a RelationshipLinker, relationshipIds are then linked as edges; targets not
+loaded yet are retried at the end. Every input line gets one entry in the JSONL
+report, plus a "links" entry for items whose relationships stay incomplete.
+"""
+
+import os
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from colorama import Fore, init
+from dotenv import load_dotenv
+from createnewdualcontainer import (
+    DualContainerCreator, ADD_API_VERTEX, API_VERTEX_PROPERTIES, REGISTRY_PARTITION_KEYS,
+    update_api_vertex_template
+)
+from relationship_linker import RelationshipLinker
+from gremlin_templates import vertex_lookup
+from resilience import execute_with_retry, classify_error, CONFLICT_STATUS_CODE
+
+# Initialize colorama for colored output
+init()
+
+# Load environment variables from .env file
+load_dotenv()
+
+REGISTRY_LOAD_PATH = os.getenv("REGISTRY_LOAD_PATH", "api_registry.jsonl")
+REGISTRY_LOAD_REPORT_PATH = os.getenv("REGISTRY_LOAD_REPORT_PATH", "registry_load_report.jsonl")
+REGISTRY_LOAD_CONCURRENCY = int(os.getenv("REGISTRY_LOAD_CONCURRENCY", "16"))
+REGISTRY_VERTEX_BATCH_SIZE = int(os.getenv("REGISTRY_VERTEX_BATCH_SIZE", "25"))
+# Lines read, written and reported together; bounds memory for very large files
+REGISTRY_LOAD_CHUNK_SIZE = int(os.getenv("REGISTRY_LOAD_CHUNK_SIZE", "1000"))
+
+
+def iter_jsonl(path):
+    """Yield (line_no, item, error) for every non-blank line of a JSONL file"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_no, None, f"invalid JSON: {e}"
+                continue
+            if not isinstance(item, dict) or "id" not in item:
+                yield line_no, None, "not an api_item object with an id"
+                continue
+            yield line_no, item, None
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for entry in iterable:
+        chunk.append(entry)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class BulkRegistryLoader:
+    """Loads api_items through a DualContainerCreator's container, graph client and hash index"""
+
+    def __init__(self, creator, concurrency=REGISTRY_LOAD_CONCURRENCY,
+                 batch_size=REGISTRY_VERTEX_BATCH_SIZE, chunk_size=REGISTRY_LOAD_CHUNK_SIZE,
+                 linker=None):
+        self.creator = creator
+        # When given, relationshipIds of created and relinked items become edges after each chunk
+        self.linker = linker
+        self.batch_size = max(1, batch_size)
+        self.chunk_size = max(1, chunk_size)
+        self.pool = ThreadPoolExecutor(max_workers=max(1, concurrency))
+        self.counts = {}
+        self.deferred = []
+
+    def _plan(self, item):
+        # The key is part of the stored item, so it is set before hashing
+        REGISTRY_PARTITION_KEYS.assign(item)
+        hash_index = self.creator.hash_index
+        return hash_index.diff(item) if hash_index else ("new", set())
+
+    def _write_item(self, entry):
+        """NoSQL create (new) or upsert (changed); returns the entry with its outcome filled in"""
+        item = entry["item"]
+        op = "create_item" if entry["plan"] == "new" else "upsert_item"
+        write = getattr(self.creator.container_sql, op)
+        try:
+            execute_with_retry(lambda: write(body=item), op=f"cosmos.{op}", payload=item,
+                               dead_letter=self.creator.dead_letter)
+            entry["status"] = "created" if op == "create_item" else "updated"
+        except Exception as e:
+            # Already in NoSQL but not in the hash index, e.g. an earlier run stopped before its
+            # vertex was written; _check_existing looks the vertex up before the hash is recorded
+            if op == "create_item" and classify_error(e)[0] == CONFLICT_STATUS_CODE:
+                entry["status"] = "exists"
+            else:
+                entry["status"] = "failed"
+                entry["error"] = f"cosmos.{op}: {e}"
+        return entry
+
+    def _check_existing(self, entries):
+        """Mark "exists" entries whose vertex is missing, so it is created with the new ones"""
+        existing = [e for e in entries if e["status"] == "exists"]
+        for start in range(0, len(existing), self.batch_size):
+            batch = existing[start:start + self.batch_size]
+            template, bindings = vertex_lookup([entry["id"] for entry in batch])
+            try:
+                found = set(execute_with_retry(
+                    lambda: template.submit(self.creator.gremlin_client, **bindings).all().result()
+                ))
+            except Exception as e:
+                for entry in batch:
+                    entry["status"] = "failed"
+                    entry["error"] = f"gremlin lookup: {e}"
+                continue
+            for entry in batch:
+                if entry["id"] not in found:
+                    entry["vertex_missing"] = True
+
+    def _submit_vertex_batch(self, template, entries):
+        """One chained traversal for the batch; falls back to per-item writes on failure.
+
+        Entries whose vertex was created here are marked "vertex_created" for the statistics.
+        """
+        creates = template is ADD_API_VERTEX
+        if len(entries) > 1:
+            items = [entry["item"] for entry in entries]
+            try:
+                batched = template.batched(len(items))
+                bindings = template.bind_batch(items)
+                rows = execute_with_retry(
+                    lambda: batched.submit(self.creator.gremlin_client, **bindings).all().result()
+                )
+                # Every step returns its vertex; no rows means a g.V() step found nothing and the
+                # chain stopped there, so the steps after it were never run
+                if rows:
+                    for entry in entries:
+                        entry["vertex_created"] = creates
+                    return
+                print(Fore.YELLOW + f"Vertex batch of {len(entries)} returned nothing, retrying one by one")
+            except Exception as e:
+                print(Fore.YELLOW + f"Vertex batch of {len(entries)} failed ({e}), retrying one by one")
+        for entry in entries:
+            try:
+                rows = self.creator._submit_gremlin(template, template.bind_document(entry["item"]))
+            except Exception as e:
+                # Already written, by the failed batch before it stopped or by an earlier run
+                if classify_error(e)[0] == CONFLICT_STATUS_CODE:
+                    continue
+                entry["status"] = "failed"
+                entry["error"] = f"gremlin: {e}"
+                continue
+            if rows:
+                entry["vertex_created"] = creates
+            else:
+                entry["status"] = "failed"
+                entry["error"] = "gremlin: vertex not found, nothing written"
+
+    @staticmethod
+    def _needs_vertex(entry):
+        return entry["status"] == "created" or (entry["status"] == "exists" and entry.get("vertex_missing"))
+
+    def _vertex_batches(self, entries):
+        new = [e for e in entries if self._needs_vertex(e)]
+        by_fields = {}
+        for entry in entries:
+            if entry["status"] == "updated":
+                fields = tuple(f for f in API_VERTEX_PROPERTIES if f in entry["changed"])
+                if fields:
+                    by_fields.setdefault(fields, []).append(entry)
+        groups = [(ADD_API_VERTEX, new)] + [
+            (update_api_vertex_template(list(fields)), group) for fields, group in by_fields.items()
+        ]
+        for template, group in groups:
+            for start in range(0, len(group), self.batch_size):
+                yield template, group[start:start + self.batch_size]
+
+    def _link(self, entries):
+        created = [e for e in entries if self._needs_vertex(e)]
+        # Vertices written just now need no lookup
+        self.linker.cache.add_many(e["id"] for e in created)
+        to_link = created + [
+            e for e in entries if e["status"] == "updated" and "relationshipIds" in e["changed"]
+        ]
+        result = self.linker.link([e["item"] for e in to_link])
+        by_id = {e["id"]: e for e in to_link}
+        # The target may be an item further down the file; retried once the load is done
+        for source, target in result["unresolved"]:
+            self.deferred.append((by_id[source]["line"], source, target))
+        for source, target, error in result["failed"]:
+            by_id[source].setdefault("link_errors", []).append(f"{target}: {error}")
+
+    def _link_deferred(self, report):
+        lines = {source: line for line, source, _ in self.deferred}
+        result = self.linker.link_pairs([(source, target) for _, source, target in self.deferred])
+        self.deferred = []
+        problems = {}
+        for source, target in result["unresolved"]:
+            problems.setdefault(source, {}).setdefault("unresolved", []).append(target)
+        for source, target, error in result["failed"]:
+            problems.setdefault(source, {}).setdefault("link_errors", []).append(f"{target}: {error}")
+        # One extra line per item whose relationships are still incomplete
+        for source, problem in problems.items():
+            record = {"line": lines[source], "id": source, "status": "links"}
+            record.update(problem)
+            report.write(json.dumps(record) + "\n")
+        return len(problems)
+
+    def _load_chunk(self, chunk, report):
+        entries = []
+        for line_no, item, error in chunk:
+            entry = {"line": line_no, "id": item["id"] if item else None, "item": item}
+            if error is None:
+                try:
+                    entry["plan"], entry["changed"] = self._plan(item)
+                except Exception as e:
+                    error = f"hash index: {e}"
+            if error is not None:
+                entry["status"], entry["error"] = "failed", error
+            elif entry["plan"] == "unchanged":
+                entry["status"] = "unchanged"
+            entries.append(entry)
+
+        pending = [e for e in entries if "status" not in e]
+        list(self.pool.map(self._write_item, pending))
+        self._check_existing(pending)
+        futures = [self.pool.submit(self._submit_vertex_batch, template, batch)
+                   for template, batch in self._vertex_batches(pending)]
+        for future in futures:
+            future.result()
+        self.creator.record_api_vertices([e["item"] for e in pending if e.get("vertex_created")])
+
+        if self.linker is not None:
+            self._link(pending)
+
+        hash_index = self.creator.hash_index
+        written = [e["item"] for e in pending if e["status"] in ("created", "updated", "exists")]
+        if hash_index and written:
+            hash_index.record_many(written)
+
+        for entry in entries:
+            self.counts[entry["status"]] = self.counts.get(entry["status"], 0) + 1
+            record = {"line": entry["line"], "id": entry["id"], "status": entry["status"]}
+            for key in ("error", "link_errors"):
+                if key in entry:
+                    record[key] = entry[key]
+            report.write(json.dumps(record) + "\n")
+
+    def load(self, path=REGISTRY_LOAD_PATH, report_path=REGISTRY_LOAD_REPORT_PATH):
+        """Load every api_item in `path`; returns per-status counts"""
+        self.counts = {}
+        self.deferred = []
+        started = time.perf_counter()
+        total = 0
+        incomplete = 0
+        with open(report_path, "w", encoding="utf-8") as report:
+            for chunk in _chunks(iter_jsonl(path), self.chunk_size):
+                self._load_chunk(chunk, report)
+                total += len(chunk)
+                print(Fore.BLUE + f"{total} api_items processed ({self.counts.get('failed', 0)} failed)")
+            if self.deferred:
+                incomplete = self._link_deferred(report)
+        elapsed = time.perf_counter() - started
+        rate = total / elapsed if elapsed > 0 else 0.0
+        summary = ", ".join(f"{count} {status}" for status, count in sorted(self.counts.items()))
+        print(Fore.GREEN + f"Loaded {total} api_items in {elapsed:.2f}s ({rate:.1f} items/s): {summary}")
+        if incomplete:
+            print(Fore.YELLOW + f"{incomplete} api_items have unresolved or failed relationships")
+        print(Fore.BLUE + f"Per-item report written to {report_path}")
+        return dict(self.counts)
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+
+
+if __name__ == "__main__":
+    creator = DualContainerCreator()
+    linker = RelationshipLinker(creator.gremlin_client, dead_letter=creator.dead_letter, stats=creator.stats)
+    loader = BulkRegistryLoader(creator, linker=linker)
+    try:
+        loader.load()
+    finally:
+        loader.close()
+        linker.close()
+        creator.close_connections()
@@ -0,0 +1,234 @@
+"""
+Edges for api_item relationshipIds, written in batches with a cache of known vertex ids
+
+Each batch of (item, target) pairs costs at most two round trips: one multi-id
+g.V(...) lookup for endpoints the cache has not seen, and one traversal that
+chains every addE of the batch. Ids found in the graph are kept in the cache, so
+later batches only look up new targets.
+"""
+
+import os
+import hashlib
+import sqlite3
+import threading
+from colorama import Fore, init
+from dotenv import load_dotenv
+from gremlin_templates import register_template, vertex_lookup
+from resilience import (
+    execute_with_retry, classify_error, CONFLICT_STATUS_CODE, WRITE_CREATED, WRITE_CONFLICT, WRITE_FAILED
+)
+
+# Initialize colorama for colored output
+init()
+
+# Load environment variables from .env file
+load_dotenv()
+
+# SQLite file of vertex ids known to exist; empty keeps the cache in memory only
+VERTEX_ID_CACHE_PATH = os.getenv("VERTEX_ID_CACHE_PATH", "vertex_ids.db")
+RELATIONSHIP_BATCH_SIZE = int(os.getenv("RELATIONSHIP_BATCH_SIZE", "50"))
+RELATIONSHIP_EDGE_LABEL = "RELATES_TO"
+NOT_FOUND_STATUS_CODE = 404
+
+
+def relationship_edge_id(source, target):
+    """Deterministic edge id of a pair; hashed, since "a-b" + "c" and "a" + "b-c" would share a joined id"""
+    digest = hashlib.sha1(f"{source}\x1f{target}".encode("utf-8")).hexdigest()
+    return f"rel-{digest[:24]}"
+
+
+def relationship_edge_bindings(pair):
+    source, target = pair
+    return {"rid": relationship_edge_id(source, target), "rfrom": source, "rto": target}
+
+
+# The deterministic edge id makes re-linking an item a conflict instead of a duplicate edge
+ADD_RELATIONSHIP_EDGE = register_template(
+    "add_relationship_edge",
+    f"g.V(rfrom).addE('{RELATIONSHIP_EDGE_LABEL}').to(g.V(rto)).property('id', rid)",
+    ["rid", "rfrom", "rto"],
+    binder=relationship_edge_bindings
+)
+
+
+class VertexIdCache:
+    """Set of vertex ids known to exist, optionally persisted in SQLite.
+
+    Only positive results are cached; a missing target may be created later.
+    """
+
+    def __init__(self, path=VERTEX_ID_CACHE_PATH):
+        self.ids = set()
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False) if path else None
+        if self.conn is not None:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS vertex_ids (vertex_id TEXT PRIMARY KEY)")
+            self.conn.commit()
+            self.ids.update(row[0] for row in self.conn.execute("SELECT vertex_id FROM vertex_ids"))
+
+    def known(self, vertex_ids):
+        with self.lock:
+            return {v for v in vertex_ids if v in self.ids}
+
+    def add_many(self, vertex_ids):
+        with self.lock:
+            new = [v for v in vertex_ids if v not in self.ids]
+            if not new:
+                return
+            self.ids.update(new)
+            if self.conn is not None:
+                self.conn.executemany("INSERT OR IGNORE INTO vertex_ids (vertex_id) VALUES (?)",
+                                      [(v,) for v in new])
+                self.conn.commit()
+
+    def discard(self, vertex_ids):
+        with self.lock:
+            self.ids.difference_update(vertex_ids)
+            if self.conn is not None:
+                self.conn.executemany("DELETE FROM vertex_ids WHERE vertex_id = ?",
+                                      [(v,) for v in vertex_ids])
+                self.conn.commit()
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+
+
+def relationship_pairs(items):
+    """(item id, target id) for every distinct relationshipId other than the item itself"""
+    pairs = []
+    for item in items:
+        for target in dict.fromkeys(item.get("relationshipIds") or []):
+            if target != item["id"]:
+                pairs.append((item["id"], target))
+    return pairs
+
+
+class RelationshipLinker:
+    """Creates RELATES_TO edges from api_item vertices to their relationshipIds"""
+
+    def __init__(self, gremlin_client, cache=None, batch_size=RELATIONSHIP_BATCH_SIZE, dead_letter=None,
+                 stats=None):
+        self.gremlin_client = gremlin_client
+        self.cache = cache if cache is not None else VertexIdCache()
+        self.batch_size = max(1, batch_size)
+        self.dead_letter = dead_letter
+        # GraphStatistics to count the new edges in, if any
+        self.stats = stats
+        self.round_trips = 0
+
+    def _submit(self, template, bindings):
+        self.round_trips += 1
+        return template.submit(self.gremlin_client, **bindings).all().result()
+
+    def resolve(self, vertex_ids):
+        """Ids among `vertex_ids` that exist, looking up uncached ones in a single request"""
+        vertex_ids = set(vertex_ids)
+        known = self.cache.known(vertex_ids)
+        missing = sorted(vertex_ids - known)
+        if missing:
+            template, bindings = vertex_lookup(missing)
+            found = execute_with_retry(lambda: self._submit(template, bindings))
+            self.cache.add_many(found)
+            known.update(found)
+        return known
+
+    def _write_edge(self, pair):
+        """(WRITE_CREATED, WRITE_CONFLICT or WRITE_FAILED, error message or None)"""
+        bindings = ADD_RELATIONSHIP_EDGE.bind_document(pair)
+        try:
+            result = execute_with_retry(
+                lambda: self._submit(ADD_RELATIONSHIP_EDGE, bindings),
+                op="gremlin.submit",
+                payload={"script": ADD_RELATIONSHIP_EDGE.script, "bindings": bindings},
+                dead_letter=self.dead_letter
+            )
+        except Exception as e:
+            status = classify_error(e)[0]
+            # A conflict means an earlier run already linked the pair
+            if status == CONFLICT_STATUS_CODE:
+                return WRITE_CONFLICT, None
+            if status != NOT_FOUND_STATUS_CODE:
+                return WRITE_FAILED, str(e)
+            result = []
+        if not result:
+            # An endpoint was deleted after it was cached
+            self.cache.discard(pair)
+            return WRITE_FAILED, "endpoint vertex not found"
+        return WRITE_CREATED, None
+
+    def _write_edges(self, pairs):
+        """All edges in one chained traversal; per-edge writes only if the batch fails.
+
+        Returns the pairs whose edge was created and (source, target, error) for failed ones;
+        pairs that conflicted were linked before and are in neither.
+        """
+        try:
+            batched = ADD_RELATIONSHIP_EDGE.batched(len(pairs))
+            bindings = ADD_RELATIONSHIP_EDGE.bind_batch(pairs)
+            result = execute_with_retry(lambda: self._submit(batched, bindings))
+            # A missing endpoint empties the chain from that step on, so nothing comes back
+            if result:
+                return pairs, []
+            print(Fore.YELLOW + f"Edge batch of {len(pairs)} returned nothing, retrying one by one")
+        except Exception as e:
+            print(Fore.YELLOW + f"Edge batch of {len(pairs)} failed ({e}), retrying one by one")
+        created, failed = [], []
+        for pair in pairs:
+            status, error = self._write_edge(pair)
+            if status == WRITE_CREATED:
+                created.append(pair)
+            elif status == WRITE_FAILED:
+                failed.append((pair[0], pair[1], error))
+        return created, failed
+
+    def link(self, items):
+        """Link every item's relationshipIds; returns linked count, unresolved and failed pairs"""
+        return self.link_pairs(relationship_pairs(items))
+
+    def link_pairs(self, pairs):
+        linked, unresolved, failed = 0, [], []
+        for start in range(0, len(pairs), self.batch_size):
+            batch = pairs[start:start + self.batch_size]
+            try:
+                known = self.resolve({v for pair in batch for v in pair})
+            except Exception as e:
+                failed.extend((source, target, f"lookup: {e}") for source, target in batch)
+                continue
+            ready = [pair for pair in batch if pair[0] in known and pair[1] in known]
+            unresolved.extend(pair for pair in batch if pair[0] not in known or pair[1] not in known)
+            if not ready:
+                continue
+            created, errors = self._write_edges(ready)
+            linked += len(ready) - len(errors)
+            failed.extend(errors)
+            if self.stats is not None:
+                # Edges an earlier run already linked were counted when they were created
+                for source, target in created:
+                    self.stats.record_edge(RELATIONSHIP_EDGE_LABEL, source, target)
+        if self.stats is not None:
+            self.stats.flush()
+        return {"linked": linked, "unresolved": unresolved, "failed": failed}
+
+    def close(self):
+        self.cache.close()
+
+
+if __name__ == "__main__":
+    # Link an already loaded registry file, e.g. after changing the edge label
+    from createnewdualcontainer import DualContainerCreator
+    from registry_loader import iter_jsonl, REGISTRY_LOAD_PATH
+
+    creator = DualContainerCreator()
+    linker = RelationshipLinker(creator.gremlin_client, dead_letter=creator.dead_letter, stats=creator.stats)
+    try:
+        items = [item for _, item, error in iter_jsonl(REGISTRY_LOAD_PATH) if error is None]
+        result = linker.link(items)
+        print(Fore.GREEN + f"Linked {result['linked']} relationships in {linker.round_trips} requests")
+        for source, target in result["unresolved"]:
+            print(Fore.YELLOW + f"  {source} -> {target}: target vertex not found")
+        for source, target, error in result["failed"]:
+            print(Fore.RED + f"  {source} -> {target}: {error}")
+    finally:
+        linker.close()
+        creator.close_connections()
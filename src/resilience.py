@@ -0,0 +1,155 @@
+"""
+Throttling-aware retry and dead-letter queue shared by the Cosmos and Gremlin write paths
+"""
+
+import os
+import re
+import json
+import time
+import random
+import asyncio
+from colorama import Fore
+from azure.cosmos import exceptions
+from gremlin_python.driver.protocol import GremlinServerError
+
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "6"))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "0.1"))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "10"))
+DEAD_LETTER_PATH = os.getenv("DEAD_LETTER_PATH", "dead_letter.jsonl")
+
+# 429 request rate too large, 408 timeout, 449 retry with, 503 service unavailable
+RETRYABLE_STATUS_CODES = {408, 429, 449, 503}
+# A conflict means the record is already there, so it is never dead-lettered
+CONFLICT_STATUS_CODE = 409
+
+# Outcome of one write; a conflict succeeds without creating anything
+WRITE_CREATED = "created"
+WRITE_CONFLICT = "conflict"
+WRITE_FAILED = "failed"
+
+# Cosmos Gremlin reports retry-after as a TimeSpan string such as "00:00:00.0510000"
+_TIMESPAN = re.compile(r"^(\d+):(\d+):(\d+(?:\.\d+)?)$")
+
+
+def _parse_retry_after_ms(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    match = _TIMESPAN.match(value)
+    if match:
+        hours, minutes, seconds = match.groups()
+        return (int(hours) * 3600 + int(minutes) * 60 + float(seconds)) * 1000
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def classify_error(error):
+    """Return (status_code, retry_after_seconds) for a Cosmos or Gremlin error"""
+    if isinstance(error, exceptions.CosmosHttpResponseError):
+        headers = getattr(error, "headers", None) or {}
+        if not headers and getattr(error, "response", None) is not None:
+            headers = error.response.headers
+        retry_after = _parse_retry_after_ms(headers.get("x-ms-retry-after-ms"))
+        return error.status_code, retry_after / 1000 if retry_after is not None else None
+    if isinstance(error, GremlinServerError):
+        attributes = error.status_attributes or {}
+        status = attributes.get("x-ms-status-code", error.status_code)
+        retry_after = _parse_retry_after_ms(attributes.get("x-ms-retry-after-ms"))
+        return int(status), retry_after / 1000 if retry_after is not None else None
+    return None, None
+
+
+def backoff_delay(attempt, retry_after=None):
+    """Honour the server's retry-after when given, otherwise exponential backoff; both jittered"""
+    if retry_after is not None:
+        return retry_after + random.uniform(0, retry_after * 0.25 + RETRY_BASE_DELAY)
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+
+class DeadLetterQueue:
+    """Append-only JSONL file of operations that exhausted their retries"""
+
+    def __init__(self, path=DEAD_LETTER_PATH):
+        self.path = path
+
+    def write(self, op, payload, error, attempts):
+        status, _ = classify_error(error)
+        entry = {
+            "op": op,
+            "payload": payload,
+            "error": str(error),
+            "status": status,
+            "attempts": attempts,
+            "failed_at": time.time()
+        }
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, default=str) + "\n")
+
+    def replay(self, handlers):
+        """Re-run dead-lettered operations with handlers[op](payload); keep the ones that fail again"""
+        if not os.path.exists(self.path):
+            return 0, 0
+        with open(self.path, "r", encoding="utf-8") as f:
+            entries = [json.loads(line) for line in f if line.strip()]
+
+        remaining = []
+        replayed = 0
+        for entry in entries:
+            handler = handlers.get(entry["op"])
+            if handler is None:
+                remaining.append(entry)
+                continue
+            try:
+                execute_with_retry(lambda: handler(entry["payload"]))
+                replayed += 1
+            except Exception as e:
+                if classify_error(e)[0] == CONFLICT_STATUS_CODE:
+                    replayed += 1
+                    continue
+                entry["error"] = str(e)
+                entry["failed_at"] = time.time()
+                remaining.append(entry)
+
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for entry in remaining:
+                f.write(json.dumps(entry, default=str) + "\n")
+        os.replace(tmp_path, self.path)
+        print(Fore.GREEN + f"Replayed {replayed} dead-lettered operations, {len(remaining)} remain")
+        return replayed, len(remaining)
+
+
+def execute_with_retry(operation, op=None, payload=None, dead_letter=None,
+                       max_attempts=RETRY_MAX_ATTEMPTS):
+    """Run operation(), retrying throttled/transient failures with jittered backoff.
+
+    After the final attempt the operation is written to dead_letter (when given) and
+    the error is re-raised so the caller can still report it.
+    """
+    for attempt in range(1, max_attempts + 1):
+        try:
+            return operation()
+        except Exception as e:
+            status, retry_after = classify_error(e)
+            if status not in RETRYABLE_STATUS_CODES or attempt == max_attempts:
+                if dead_letter is not None and op is not None and status != CONFLICT_STATUS_CODE:
+                    dead_letter.write(op, payload, e, attempt)
+                raise
+            time.sleep(backoff_delay(attempt, retry_after))
+
+
+async def execute_with_retry_async(operation, op=None, payload=None, dead_letter=None,
+                                   max_attempts=RETRY_MAX_ATTEMPTS):
+    """Async variant of execute_with_retry; operation() returns an awaitable"""
+    for attempt in range(1, max_attempts + 1):
+        try:
+            return await operation()
+        except Exception as e:
+            status, retry_after = classify_error(e)
+            if status not in RETRYABLE_STATUS_CODES or attempt == max_attempts:
+                if dead_letter is not None and op is not None and status != CONFLICT_STATUS_CODE:
+                    dead_letter.write(op, payload, e, attempt)
+                raise
+            await asyncio.sleep(backoff_delay(attempt, retry_after))
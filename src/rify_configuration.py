@@ -3,8 +3,9 @@
 import os
 from dotenv import load_dotenv
 from colorama import init, Fore
-from azure.cosmos import CosmosClient
-from gremlin_python.driver import client, serializer
+from client_registry import CLIENTS
+from graph_stats import open_graph_statistics
+from gremlin_streaming import stream_results
 
 # Initialize colorama for Windows
 init()
@@ -61,16 +62,13 @@ def test_gremlin_connection():
     try:
         load_dotenv()
         
-        # Create Gremlin client with new settings
-        gremlin_client = client.Client(
-            os.getenv("GREMLIN_ENDPOINT"),
-            'g',
-            username=f"/dbs/DualApiDB/colls/DualApiContainer",
-            password=os.getenv("GREMLIN_PRIMARY_KEY"),
-            message_serializer=serializer.GraphSONSerializersV2d0()
+        # Gremlin client with new settings, shared with the rest of the process
+        gremlin_client = CLIENTS.gremlin(
+            database="DualApiDB", collection="DualApiContainer",
+            password=os.getenv("GREMLIN_PRIMARY_KEY")
         )
 
-        # Test queries
+        # Test queries; the scans are only sent when no materialized statistics exist
         queries = {
             "count": "g.V().count()",
             "labels": "g.V().label().dedup()",
@@ -82,12 +80,25 @@ def test_gremlin_connection():
         print(f"Container: DualApiContainer")
         print(f"Partition Key: /type")
 
+        # Vertex count, labels and partition key cardinality from the materialized statistics
+        stats = open_graph_statistics(CLIENTS.cosmos(credential=str(os.getenv("COSMOS_KEY"))))
+        snapshot = stats.snapshot() if stats else None
+        if snapshot is None:
+            print(f"\n{Fore.YELLOW}No materialized graph statistics, scanning the graph{Fore.RESET}")
+        else:
+            for name, value in (("count", snapshot["vertex_count"]),
+                                ("labels", sorted(snapshot["vertex_counts_by_label"])),
+                                ("partition_keys", snapshot["partition_key_count"])):
+                print(f"\n{Fore.GREEN}✓ {name} (point read):{Fore.RESET}")
+                print(f"  {value}")
+            # The connection itself still needs checking, but not a scan
+            queries = {"connection": "g.V().limit(1).count()"}
+
         for name, query in queries.items():
-            result = gremlin_client.submit(query).all().result()
             print(f"\n{Fore.GREEN}✓ {name}:{Fore.RESET}")
-            print(f"  {result}")
+            for row in stream_results(gremlin_client, query):
+                print(f"  {row}")
 
-        gremlin_client.close()
         print(f"\n{Fore.GREEN}Connection test completed successfully{Fore.RESET}")
 
     except Exception as e:
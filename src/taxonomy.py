@@ -0,0 +1,110 @@
+"""
+Flatten nested taxonomy documents into graph vertex and edge records
+"""
+
+import hashlib
+from gremlin_templates import register_template
+
+ROOT_LABEL = "Central_Theme"
+NODE_LABEL = "Concept"
+CHILD_EDGE_LABEL = "HAS_CHILD"
+
+
+def taxonomy_vertex_bindings(record):
+    return {
+        "tid": record["id"],
+        "tname": record["name"],
+        "tdepth": record["depth"],
+        "tpk": record["pk"]
+    }
+
+
+def taxonomy_edge_bindings(record):
+    return {
+        "eid": record["id"],
+        "efrom": record["from"],
+        "eto": record["to"],
+        "epk": record["pk"]
+    }
+
+
+TAXONOMY_VERTEX_TEMPLATES = {
+    label: register_template(
+        f"add_{label.lower()}",
+        f"g.addV('{label}').property('id', tid).property('name', tname)"
+        ".property('depth', tdepth).property('pk', tpk)",
+        ["tid", "tname", "tdepth", "tpk"],
+        binder=taxonomy_vertex_bindings
+    )
+    for label in (ROOT_LABEL, NODE_LABEL)
+}
+# Both endpoints share the tree's partition key, so the lookups stay in one partition
+ADD_CHILD_EDGE = register_template(
+    "add_child_edge",
+    f"g.V(efrom).has('pk', epk).addE('{CHILD_EDGE_LABEL}')"
+    ".to(g.V(eto).has('pk', epk)).property('id', eid)",
+    ["eid", "efrom", "eto", "epk"],
+    binder=taxonomy_edge_bindings
+)
+
+
+def node_id(path):
+    """Deterministic vertex id derived from the names on the path from the root"""
+    digest = hashlib.sha1("\x1f".join(path).encode("utf-8")).hexdigest()
+    return f"concept-{digest[:24]}"
+
+
+def flatten_taxonomy(tree):
+    """Iteratively flatten a nested dict/list tree of any depth.
+
+    Dict keys and list scalars become vertices; nested dicts and lists become
+    children of the key that holds them. Returns (vertices, edges) where every
+    vertex of a tree carries the root's id as its partition key.
+    """
+    vertices = []
+    edges = []
+    seen = set()
+    # (subtree, parent vertex id, partition key, names on the path to the subtree)
+    stack = [(tree, None, None, ())]
+    while stack:
+        node, parent_id, pk, path = stack.pop()
+        if isinstance(node, dict):
+            entries = list(node.items())
+        elif isinstance(node, list):
+            entries = []
+            for item in node:
+                if isinstance(item, (dict, list)):
+                    # Containers inside a list hang off the same parent
+                    stack.append((item, parent_id, pk, path))
+                else:
+                    entries.append((item, None))
+        else:
+            entries = [(node, None)]
+
+        for name, child in entries:
+            name = str(name)
+            child_path = path + (name,)
+            vertex_id = node_id(child_path)
+            if vertex_id in seen:
+                continue
+            seen.add(vertex_id)
+
+            is_root = parent_id is None
+            vertex_pk = vertex_id if is_root else pk
+            vertices.append({
+                "id": vertex_id,
+                "name": name,
+                "label": ROOT_LABEL if is_root else NODE_LABEL,
+                "depth": len(path),
+                "pk": vertex_pk
+            })
+            if not is_root:
+                edges.append({
+                    "id": f"{parent_id}-{vertex_id}",
+                    "from": parent_id,
+                    "to": vertex_id,
+                    "pk": vertex_pk
+                })
+            if child is not None:
+                stack.append((child, vertex_id, vertex_pk, child_path))
+    return vertices, edges
@@ -5,8 +5,12 @@ import sys
 import asyncio
 from colorama import init, Fore
 from dotenv import load_dotenv
-from azure.cosmos import CosmosClient, PartitionKey
-from gremlin_python.driver import client, serializer
+from azure.cosmos import PartitionKey
+from client_registry import CLIENTS
+from gremlin_streaming import stream_results
+from gremlin_templates import register_template
+from graph_stats import open_graph_statistics
+from instrumentation import InstrumentedGremlinClient, METRICS
 
 # Initialize colorama for Windows
 init()
@@ -39,10 +43,7 @@ def verify_setup():
         
         # Verify NoSQL API connection
         try:
-            cosmos_client = CosmosClient(
-                url=os.getenv("COSMOS_ENDPOINT"),
-                credential=str(os.getenv("COSMOS_KEY"))
-            )
+            cosmos_client = CLIENTS.cosmos(credential=str(os.getenv("COSMOS_KEY")))
             database = cosmos_client.get_database_client("DualApiDB")
             container = database.get_container_client("DualApiContainer")
             print(f"{Fore.GREEN}✓ NoSQL API connection successful{Fore.RESET}")
@@ -52,15 +53,11 @@ def verify_setup():
 
         # Verify Gremlin API connection
         try:
-            gremlin_client = client.Client(
-                os.getenv("GREMLIN_ENDPOINT"),
-                'g',
-                username=f"/dbs/DualApiDB/colls/DualApiContainer",
-                password=os.getenv("GREMLIN_PRIMARY_KEY"),
-                message_serializer=serializer.GraphSONSerializersV2d0()
+            gremlin_client = CLIENTS.gremlin(
+                database="DualApiDB", collection="DualApiContainer",
+                password=os.getenv("GREMLIN_PRIMARY_KEY")
             )
             print(f"{Fore.GREEN}✓ Gremlin API connection successful{Fore.RESET}")
-            gremlin_client.close()
         except Exception as e:
             print(f"{Fore.RED}× Gremlin API connection failed: {e}{Fore.RESET}")
             return False
@@ -143,10 +140,7 @@ def test_dual_container_access():
     
     try:
         # Test NoSQL API access
-        cosmos_client = CosmosClient(
-            url=os.getenv("COSMOS_ENDPOINT"),
-            credential=str(os.getenv("COSMOS_KEY"))
-        )
+        cosmos_client = CLIENTS.cosmos(credential=str(os.getenv("COSMOS_KEY")))
         
         database = cosmos_client.get_database_client("DualApiDB")
         container = database.get_container_client("DualApiContainer")
@@ -161,20 +155,16 @@ def test_dual_container_access():
         print("✅ NoSQL API write successful")
         
         # Test Gremlin API access
-        gremlin_client = client.Client(
-            os.getenv("GREMLIN_ENDPOINT"),
-            'g',
-            username=f"/dbs/DualApiDB/colls/DualApiContainer",
-            password=os.getenv("GREMLIN_PRIMARY_KEY"),
-            message_serializer=serializer.GraphSONSerializersV2d0()
+        gremlin_client = CLIENTS.gremlin(
+            database="DualApiDB", collection="DualApiContainer",
+            password=os.getenv("GREMLIN_PRIMARY_KEY")
         )
         
         # Test Gremlin query
         query = "g.V().count()"
-        result = gremlin_client.submit(query).all().result()
+        result = list(stream_results(gremlin_client, query))
         print(f"✅ Gremlin API query successful. Vertex count: {result[0]}")
         
-        gremlin_client.close()
         print("\nDual API access test completed successfully!")
         
     except Exception as e:
@@ -189,10 +179,7 @@ def test_connections():
         
         # Test NoSQL API
         print(f"\n{Fore.YELLOW}Testing NoSQL API connection:{Fore.RESET}")
-        cosmos_client = CosmosClient(
-            url=os.getenv("COSMOS_ENDPOINT"),
-            credential=str(os.getenv("COSMOS_KEY"))
-        )
+        cosmos_client = CLIENTS.cosmos(credential=str(os.getenv("COSMOS_KEY")))
         database = cosmos_client.get_database_client("DualApiDB")
         container = database.get_container_client("DualApiContainer")
         
@@ -203,12 +190,9 @@ def test_connections():
 
         # Test Gremlin API with enhanced queries
         print(f"\n{Fore.YELLOW}Testing Gremlin API connection:{Fore.RESET}")
-        gremlin_client = client.Client(
-            os.getenv("GREMLIN_ENDPOINT"),
-            'g',
-            username=f"/dbs/DualApiDB/colls/DualApiContainer",
-            password=os.getenv("GREMLIN_PRIMARY_KEY"),
-            message_serializer=serializer.GraphSONSerializersV2d0()
+        gremlin_client = CLIENTS.gremlin(
+            database="DualApiDB", collection="DualApiContainer",
+            password=os.getenv("GREMLIN_PRIMARY_KEY")
         )
 
         # Run diagnostic queries
@@ -221,10 +205,9 @@ def test_connections():
 
         print(f"\n{Fore.CYAN}Running Gremlin diagnostics:{Fore.RESET}")
         for name, query in queries.items():
-            result = gremlin_client.submit(query).all().result()
+            result = list(stream_results(gremlin_client, query))
             print(f"{Fore.GREEN}✓ {name}: {result}{Fore.RESET}")
 
-        gremlin_client.close()
         print(f"\n{Fore.GREEN}✓ Gremlin tests completed{Fore.RESET}")
         
     except Exception as e:
@@ -233,13 +216,7 @@ def test_connections():
 def test_gremlin_databases():
     print(f"\n{Fore.YELLOW}Checking Gremlin Databases:{Fore.RESET}")
     try:
-        gremlin_client = client.Client(
-            os.getenv("GREMLIN_ENDPOINT"),
-            'g',
-            username=f"/dbs/{os.getenv('GREMLIN_DATABASE')}/colls/{os.getenv('GREMLIN_COLLECTION')}",
-            password=os.getenv("GREMLIN_PRIMARY_KEY"),
-            message_serializer=serializer.GraphSONSerializersV2d0()
-        )
+        gremlin_client = CLIENTS.gremlin(password=os.getenv("GREMLIN_PRIMARY_KEY"))
 
         # List all vertices in macrographgremlin/macrograph1
         queries = {
@@ -253,13 +230,13 @@ def test_gremlin_databases():
         
         for name, query in queries.items():
             try:
-                result = gremlin_client.submit(query).all().result()
                 print(f"{Fore.GREEN}✓ {name}:{Fore.RESET}")
-                print(f"  {result}")
+                # Rows are printed as their response frames arrive
+                for row in stream_results(gremlin_client, query):
+                    print(f"  {row}")
             except Exception as query_error:
                 print(f"{Fore.RED}× {name} failed: {query_error}{Fore.RESET}")
 
-        gremlin_client.close()
         
     except Exception as e:
         print(f"{Fore.RED}Error accessing Gremlin database: {e}{Fore.RESET}")
@@ -271,13 +248,7 @@ def analyze_graph():
         load_dotenv()
         
         # Initialize Gremlin client
-        gremlin_client = client.Client(
-            os.getenv("GREMLIN_ENDPOINT"),
-            'g',
-            username=f"/dbs/{os.getenv('GREMLIN_DATABASE')}/colls/{os.getenv('GREMLIN_COLLECTION')}",
-            password=os.getenv("GREMLIN_PRIMARY_KEY"),
-            message_serializer=serializer.GraphSONSerializersV2d0()
-        )
+        gremlin_client = InstrumentedGremlinClient(CLIENTS.gremlin(password=os.getenv("GREMLIN_PRIMARY_KEY")))
 
         # Advanced diagnostic queries
         queries = {
@@ -293,20 +264,34 @@ def analyze_graph():
         }
 
         print(f"\n{Fore.YELLOW}Graph Statistics:{Fore.RESET}")
+
+        # Counters maintained by the writers replace the full-graph scans when available
+        stats = open_graph_statistics(CLIENTS.cosmos(credential=str(os.getenv("COSMOS_KEY"))))
+        snapshot = stats.snapshot() if stats else None
+        if snapshot is None:
+            print(f"{Fore.YELLOW}No materialized statistics, scanning the graph{Fore.RESET}")
+        else:
+            for name in ("vertex_counts_by_label", "edge_types", "central_themes", "theme_connections"):
+                print(f"\n{Fore.GREEN}✓ {name} (point read):{Fore.RESET}")
+                print(f"  {snapshot[name]}")
+                del queries[name]
         
         for name, query in queries.items():
             try:
-                result = gremlin_client.submit(query).all().result()
+                # Registered so each diagnostic query is reported under its own name
+                template = register_template(f"analyze_graph.{name}", query, [])
                 print(f"\n{Fore.GREEN}✓ {name}:{Fore.RESET}")
-                if isinstance(result[0], dict):
-                    for k, v in result[0].items():
-                        print(f"  {k}: {v}")
-                else:
-                    print(f"  {result}")
+                # Rows are printed as their response frames arrive, not once the whole scan is done
+                for row in template.stream(gremlin_client):
+                    if isinstance(row, dict):
+                        for k, v in row.items():
+                            print(f"  {k}: {v}")
+                    else:
+                        print(f"  {row}")
             except Exception as query_error:
                 print(f"{Fore.RED}× {name} failed: {query_error}{Fore.RESET}")
 
-        gremlin_client.close()
+        METRICS.report()
         print(f"\n{Fore.GREEN}Analysis completed successfully{Fore.RESET}")
         
     except Exception as e:
@@ -320,10 +305,7 @@ def test_dual_api_access():
 
         # Test NoSQL Connection
         print(f"\n{Fore.CYAN}Testing NoSQL API:{Fore.RESET}")
-        cosmos_client = CosmosClient(
-            url=os.getenv("COSMOS_ENDPOINT"),
-            credential=str(os.getenv("COSMOS_KEY"))
-        )
+        cosmos_client = CLIENTS.cosmos(credential=str(os.getenv("COSMOS_KEY")))
         database = cosmos_client.get_database_client("DualApiDB")
         container = database.get_container_client("DualApiContainer")
         container_properties = container.read()
@@ -332,18 +314,14 @@ def test_dual_api_access():
 
         # Test Gremlin Connection
         print(f"\n{Fore.CYAN}Testing Gremlin API:{Fore.RESET}")
-        gremlin_client = client.Client(
-            os.getenv("GREMLIN_ENDPOINT"),
-            'g',
-            username=f"/dbs/DualApiDB/colls/DualApiContainer",
-            password=os.getenv("GREMLIN_PRIMARY_KEY"),
-            message_serializer=serializer.GraphSONSerializersV2d0()
+        gremlin_client = CLIENTS.gremlin(
+            database="DualApiDB", collection="DualApiContainer",
+            password=os.getenv("GREMLIN_PRIMARY_KEY")
         )
         
-        result = gremlin_client.submit("g.V().count()").all().result()
+        result = list(stream_results(gremlin_client, "g.V().count()"))
         print(f"{Fore.GREEN}✓ Gremlin Connection Successful{Fore.RESET}")
         print(f"Vertex Count: {result[0]}")
-        gremlin_client.close()
 
     except Exception as e:
         print(f"{Fore.RED}Connection test failed: {e}{Fore.RESET}")
@@ -383,7 +361,7 @@ if __name__ == "__main__":
 # test_container_creation.py
 
 import unittest
-from azure.cosmos import CosmosClient
+from client_registry import CLIENTS
 from createnewdualcontainer import DualContainerCreator
 import os
 from dotenv import load_dotenv
@@ -396,10 +374,7 @@ class TestDualContainer(unittest.TestCase):
         cls.container = cls.creator.create_container()
         
         # Initialize test client
-        cls.cosmos_client = CosmosClient(
-            url=os.getenv("COSMOS_ENDPOINT"),
-            credential=str(os.getenv("COSMOS_KEY"))
-        )
+        cls.cosmos_client = CLIENTS.cosmos(credential=str(os.getenv("COSMOS_KEY")))
         cls.database = cls.cosmos_client.get_database_client("ProjectTechDB")
         cls.test_container = cls.database.get_container_client("ProjectTechContainer")
 
@@ -451,7 +426,7 @@ if __name__ == '__main__':
 
 import unittest
 from colorama import init, Fore
-from azure.cosmos import CosmosClient
+from client_registry import CLIENTS
 from createnewdualcontainer import DualContainerCreator
 import os
 from dotenv import load_dotenv
@@ -476,10 +451,7 @@ class TestDualContainer(unittest.TestCase):
             cls.container = cls.creator.create_container()
             
             # Initialize test client
-            cls.cosmos_client = CosmosClient(
-                url=os.getenv("COSMOS_ENDPOINT"),
-                credential=str(os.getenv("COSMOS_KEY"))
-            )
+            cls.cosmos_client = CLIENTS.cosmos(credential=str(os.getenv("COSMOS_KEY")))
             cls.database = cls.cosmos_client.get_database_client("ProjectTechDB")
             cls.test_container = cls.database.get_container_client("ProjectTechContainer")
             print(f"{Fore.GREEN}✓ Test environment ready{Fore.RESET}")
@@ -508,9 +480,8 @@ if __name__ == '__main__':
 
 import unittest
 from colorama import init, Fore
-from azure.cosmos import CosmosClient
+from client_registry import CLIENTS
 from createnewdualcontainer import DualContainerCreator
-from gremlin_python.driver import client, serializer
 import os
 from dotenv import load_dotenv
 
@@ -527,20 +498,14 @@ class TestDualContainer(unittest.TestCase):
             cls.container = cls.creator.create_container()
             
             # NoSQL Client
-            cls.cosmos_client = CosmosClient(
-                url=os.getenv("COSMOS_ENDPOINT"),
-                credential=str(os.getenv("COSMOS_KEY"))
-            )
+            cls.cosmos_client = CLIENTS.cosmos(credential=str(os.getenv("COSMOS_KEY")))
             cls.database = cls.cosmos_client.get_database_client("ProjectTechDB")
             cls.test_container = cls.database.get_container_client("ProjectTechContainer")
             
             # Gremlin Client
-            cls.gremlin_client = client.Client(
-                os.getenv("GREMLIN_ENDPOINT"),
-                'g',
-                username=f"/dbs/ProjectTechDB/colls/ProjectTechContainer",
-                password=os.getenv("GREMLIN_PRIMARY_KEY"),
-                message_serializer=serializer.GraphSONSerializersV2d0()
+            cls.gremlin_client = CLIENTS.gremlin(
+                database="ProjectTechDB", collection="ProjectTechContainer",
+                password=os.getenv("GREMLIN_PRIMARY_KEY")
             )
             print(f"{Fore.GREEN}✓ Test environment ready{Fore.RESET}")
         
@@ -625,8 +590,9 @@ class TestDualContainer(unittest.TestCase):
             
             print("\nGremlin API Check:")
             for name, query in gremlin_queries.items():
-                result = self.gremlin_client.submit(query).all().result()
-                print(f"{name}: {result}")
+                print(f"{name}:")
+                for row in stream_results(self.gremlin_client, query):
+                    print(f"  {row}")
         
         except Exception as e:
             print(f"{Fore.RED}Gremlin query failed: {e}{Fore.RESET}")
@@ -658,7 +624,7 @@ class TestDualContainer(unittest.TestCase):
             
             # Test simple query
             query = "g.V().count()"
-            result = self.gremlin_client.submit(query).all().result()
+            result = list(stream_results(self.gremlin_client, query))
             print(f"Vertex Count: {result[0]}")
             
         except Exception as e:
@@ -683,14 +649,12 @@ class TestDualContainer(unittest.TestCase):
         print(f"NoSQL Items: {len(list(items))}")
 
         # Test Gremlin Access (same container)
-        gremlin_client = client.Client(
-            os.getenv("GREMLIN_ENDPOINT"),
-            'g',
-            username=f"/dbs/ProjectTechDB/colls/ProjectTechContainer",
+        gremlin_client = CLIENTS.gremlin(
+            database="ProjectTechDB", collection="ProjectTechContainer",
             password=os.getenv("GREMLIN_PRIMARY_KEY")
         )
         
-        result = gremlin_client.submit("g.V().count()").all().result()
+        result = list(stream_results(gremlin_client, "g.V().count()"))
 
     def test_dual_api_configuration(self):
         """Verify both APIs are accessing same container"""
@@ -706,7 +670,7 @@ class TestDualContainer(unittest.TestCase):
 
             # Verify Gremlin Configuration
             gremlin_query = "g.V().count()"
-            gremlin_result = self.gremlin_client.submit(gremlin_query).all().result()
+            gremlin_result = list(stream_results(self.gremlin_client, gremlin_query))
             print(f"\n{Fore.YELLOW}Gremlin Container Configuration:{Fore.RESET}")
             print(f"Database: {GREMLIN_CONNECTION['database']}")
             print(f"Container: {GREMLIN_CONNECTION['container']}")
@@ -751,7 +715,7 @@ def test_connections(self):
         
         # Test simple query
         query = "g.V().count()"
-        result = self.gremlin_client.submit(query).all().result()
+        result = list(stream_results(self.gremlin_client, query))
         print(f"Vertex Count: {result[0]}")
         
     except Exception as e:
@@ -763,8 +727,7 @@ def test_connections(self):
 import os
 from dotenv import load_dotenv
 from colorama import init, Fore
-from azure.cosmos import CosmosClient
-from gremlin_python.driver import client, serializer
+from client_registry import CLIENTS
 
 # Initialize colorama
 init()
@@ -776,27 +739,20 @@ def verify_configuration():
         load_dotenv()
         
         # Test NoSQL API
-        cosmos_client = CosmosClient(
-            url=os.getenv("COSMOS_ENDPOINT"),
-            credential=str(os.getenv("COSMOS_KEY"))
-        )
+        cosmos_client = CLIENTS.cosmos(credential=str(os.getenv("COSMOS_KEY")))
         
         database = cosmos_client.get_database_client("DualApiDB")
         container = database.get_container_client("DualApiContainer")
         print(f"{Fore.GREEN}✓ NoSQL connection successful{Fore.RESET}")
         
         # Test Gremlin API
-        gremlin_client = client.Client(
-            os.getenv("GREMLIN_ENDPOINT"),
-            'g',
-            username=f"/dbs/DualApiDB/colls/DualApiContainer",
-            password=os.getenv("GREMLIN_PRIMARY_KEY"),
-            message_serializer=serializer.GraphSONSerializersV2d0()
+        gremlin_client = CLIENTS.gremlin(
+            database="DualApiDB", collection="DualApiContainer",
+            password=os.getenv("GREMLIN_PRIMARY_KEY")
         )
         
-        result = gremlin_client.submit("g.V().count()").all().result()
+        result = list(stream_results(gremlin_client, "g.V().count()"))
         print(f"{Fore.GREEN}✓ Gremlin connection successful{Fore.RESET}")
-        gremlin_client.close()
         
         print(f"\n{Fore.GREEN}Configuration verified successfully{Fore.RESET}")
         
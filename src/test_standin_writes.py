@@ -0,0 +1,201 @@
+# test_standin_writes.py
+#
+# Write-path checks against the local Cosmos and Gremlin stand-ins; no Azure account needed:
+#     python -m pytest -q test_standin_writes.py
+
+import json
+import pytest
+from gremlin_python.driver import client, serializer
+import createnewdualcontainer
+import dual_api_document_processor
+from cosmos_standin import CosmosStandIn
+from gremlin_standin import GremlinStandIn
+from dual_api_document_processor import DocumentProcessor
+from createnewdualcontainer import DualContainerCreator, ADD_API_VERTEX
+from registry_loader import BulkRegistryLoader
+from hash_index import ContentHashIndex, index_namespace
+from resilience import DeadLetterQueue
+from benchmark import synthetic_documents, synthetic_api_items
+
+
+@pytest.fixture
+def server():
+    with GremlinStandIn(port=0) as standin:
+        yield standin
+
+
+@pytest.fixture
+def cosmos():
+    return CosmosStandIn()
+
+
+def _gremlin_client(server):
+    return client.Client(server.url, "g", username="/dbs/TestDB/colls/TestGraph", password="standin",
+                         message_serializer=serializer.GraphSONSerializersV2d0())
+
+
+@pytest.fixture
+def make_processor(server, cosmos, tmp_path, monkeypatch):
+    """DocumentProcessor factory sharing one hash-index file; every processor is closed afterwards"""
+    monkeypatch.setenv("DATABASE_NAME", "TestDB")
+    monkeypatch.setenv("CONTAINER_NAME", "People")
+    monkeypatch.setattr(dual_api_document_processor, "HASH_INDEX_PATH", str(tmp_path / "content_hashes.db"))
+    processors = []
+
+    def make(container_name="People"):
+        monkeypatch.setenv("CONTAINER_NAME", container_name)
+        processor = DocumentProcessor(cosmos_client=cosmos, gremlin_client=_gremlin_client(server))
+        processor.dead_letter = DeadLetterQueue(str(tmp_path / "dead_letter.jsonl"))
+        processor.verifier.mode = "off"
+        processors.append(processor)
+        return processor
+
+    yield make
+    for processor in processors:
+        processor.close()
+
+
+@pytest.fixture
+def make_creator(server, cosmos, tmp_path, monkeypatch):
+    """DualContainerCreator factory; each call gets its own hash-index file"""
+    monkeypatch.setenv("DATABASE_NAME", "TestDB")
+    monkeypatch.setenv("CONTAINER_NAME", "Registry")
+    creators = []
+
+    def make():
+        path = tmp_path / f"registry_hashes_{len(creators)}.db"
+        monkeypatch.setattr(createnewdualcontainer, "HASH_INDEX_PATH", str(path))
+        creator = DualContainerCreator(cosmos_client=cosmos, gremlin_client=_gremlin_client(server))
+        creator.dead_letter = DeadLetterQueue(str(tmp_path / "dead_letter.jsonl"))
+        creators.append(creator)
+        return creator
+
+    yield make
+    for creator in creators:
+        creator.close_connections()
+
+
+def _load(creator, items, tmp_path):
+    path = tmp_path / "api_registry.jsonl"
+    path.write_text("".join(json.dumps(item) + "\n" for item in items), encoding="utf-8")
+    report_path = tmp_path / "report.jsonl"
+    loader = BulkRegistryLoader(creator, batch_size=len(items))
+    try:
+        counts = loader.load(str(path), str(report_path))
+    finally:
+        loader.close()
+    with open(report_path, encoding="utf-8") as report:
+        return counts, {entry["id"]: entry for entry in map(json.loads, report)}
+
+
+def test_batched_update_with_missing_vertex_retries_one_by_one(server, make_processor):
+    processor = make_processor()
+    documents = synthetic_documents(6)
+    assert processor.write_documents(documents) == 6
+
+    # The first vertex of the update batch is gone, which empties the whole chained traversal
+    server.graph.remove(server.graph.vertices[documents[0]["id"]])
+    for document in documents[:4]:
+        document["name"] += " renamed"
+    assert processor.write_documents(documents) == 3
+
+    assert [doc_id for doc_id, _ in processor.failed_documents] == [documents[0]["id"]]
+    for document in documents[1:4]:
+        assert server.graph.vertices[document["id"]].properties["name"] == document["name"]
+
+    # Only confirmed updates were hashed, so the failed one is tried again
+    processor.skipped_unchanged = 0
+    processor.write_documents(documents)
+    assert processor.skipped_unchanged == 5
+    assert len(processor.failed_documents) == 2
+
+
+def test_single_writes_use_the_hash_index(server, make_processor):
+    processor = make_processor()
+    documents = synthetic_documents(3)
+    for document in documents:
+        processor.process_gremlin(document)
+    assert len(server.graph.vertices) == 3
+
+    server.graph.remove(server.graph.vertices[documents[0]["id"]])
+    for document in documents[:2]:
+        document["name"] += " renamed"
+    for document in documents:
+        processor.process_gremlin(document)
+
+    assert processor.skipped_unchanged == 1
+    assert [doc_id for doc_id, _ in processor.failed_documents] == [documents[0]["id"]]
+    assert server.graph.vertices[documents[1]["id"]].properties["name"] == documents[1]["name"]
+
+
+def test_conflicting_batch_counts_existing_vertex_as_written(server, make_processor):
+    processor = make_processor()
+    documents = synthetic_documents(5)
+    # Written outside the hash index, e.g. by an earlier run with another index file
+    processor.process_gremlin_batch([documents[2]])
+
+    assert processor.write_documents(documents) == 5
+    assert processor.failed_documents == []
+    # Chained steps are not transactional: those before the conflict were written by the batch
+    assert processor.conflicted_ids == {document["id"] for document in documents[:3]}
+    assert len(server.graph.vertices) == 5
+
+    processor.write_documents(documents)
+    assert processor.skipped_unchanged == 5
+
+
+def test_registry_fallback_treats_conflicts_as_written(server, make_creator, tmp_path):
+    creator = make_creator()
+    items = synthetic_api_items(4)
+    creator._submit_gremlin(ADD_API_VERTEX, ADD_API_VERTEX.bind_document(items[1]))
+
+    counts, report = _load(creator, items, tmp_path)
+
+    assert counts == {"created": 4}
+    assert "error" not in report[items[1]["id"]]
+    assert len(server.graph.vertices) == 4
+
+
+def test_registry_items_already_in_nosql_get_their_missing_vertex(server, make_creator, tmp_path):
+    items = synthetic_api_items(4)
+    _load(make_creator(), items, tmp_path)
+    # A run that stopped between the NoSQL create and the vertex write
+    server.graph.remove(server.graph.vertices[items[2]["id"]])
+
+    # A new hash-index file, so every create conflicts in NoSQL
+    counts, _ = _load(make_creator(), items, tmp_path)
+
+    assert counts == {"exists": 4}
+    assert set(server.graph.vertices) == {item["id"] for item in items}
+
+
+def test_hash_index_namespace_covers_source_and_graph():
+    source = ("https://cosmos.example", "db", "people")
+    graph = index_namespace("documents", *source, "wss://gremlin.example", "db", "graph")
+    other_graph = index_namespace("documents", *source, "wss://gremlin.example", "db", "other")
+    assert graph != other_graph
+    assert index_namespace("documents", None, "db") == "documents||db"
+
+
+def test_hash_index_namespaces_do_not_share_hashes(tmp_path):
+    path = str(tmp_path / "content_hashes.db")
+    first = ContentHashIndex(path, namespace=index_namespace("documents", "db", "people"))
+    second = ContentHashIndex(path, namespace=index_namespace("documents", "db", "customers"))
+    document = {"id": "person-0", "name": "Person 0"}
+    try:
+        first.record(document)
+        assert first.diff(document) == ("unchanged", set())
+        assert second.diff(document)[0] == "new"
+    finally:
+        first.close()
+        second.close()
+
+
+def test_processors_for_different_containers_use_separate_namespaces(make_processor):
+    documents = synthetic_documents(2)
+    people = make_processor("People")
+    people.write_documents(documents)
+
+    customers = make_processor("Customers")
+    assert people.hash_index.namespace != customers.hash_index.namespace
+    assert customers.hash_index.diff(documents[0])[0] == "new"
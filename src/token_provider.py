@@ -0,0 +1,199 @@
+"""
+Cached AAD tokens with background refresh, and a Gremlin client that follows them
+"""
+
+import os
+import time
+import threading
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+from azure.identity import (
+    DefaultAzureCredential, ManagedIdentityCredential, AzureCliCredential, EnvironmentCredential
+)
+from colorama import Fore
+
+# Refresh this many seconds before a token's expires_on
+TOKEN_REFRESH_MARGIN = int(os.getenv("TOKEN_REFRESH_MARGIN", "300"))
+# Skip DefaultAzureCredential's probing chain when the environment is known
+AZURE_CREDENTIAL = os.getenv("AZURE_CREDENTIAL", "default")
+# How long a retired Gremlin client may keep serving in-flight requests
+GREMLIN_RETIRE_TIMEOUT = float(os.getenv("GREMLIN_RETIRE_TIMEOUT", "60"))
+
+
+def build_credential(kind=AZURE_CREDENTIAL):
+    if kind == "managed_identity":
+        return ManagedIdentityCredential(client_id=os.getenv("AZURE_CLIENT_ID"))
+    if kind == "cli":
+        return AzureCliCredential()
+    if kind == "environment":
+        return EnvironmentCredential()
+    return DefaultAzureCredential()
+
+
+def cosmos_scope(endpoint):
+    """AAD scope the Cosmos SDK requests for an account endpoint"""
+    parsed = urlparse(endpoint)
+    return f"{parsed.scheme}://{parsed.hostname}/.default"
+
+
+class CachedTokenProvider:
+    """Caches one token per scope and refreshes it in the background before expiry.
+
+    Implements get_token() so it can be passed anywhere a TokenCredential is expected.
+    """
+
+    def __init__(self, credential=None, refresh_margin=TOKEN_REFRESH_MARGIN):
+        self.credential = credential or build_credential()
+        self.refresh_margin = refresh_margin
+        self._tokens = {}
+        self._listeners = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._refresh_loop, daemon=True)
+        self._thread.start()
+
+    def prefetch(self, *scopes):
+        """Fetch tokens for several scopes in parallel so the first request does not wait"""
+        with ThreadPoolExecutor(max_workers=max(1, len(scopes))) as pool:
+            list(pool.map(self._fetch, scopes))
+
+    def get_token(self, *scopes, **kwargs):
+        scope = " ".join(scopes)
+        with self._lock:
+            token = self._tokens.get(scope)
+        if token is None or token.expires_on - time.time() < self.refresh_margin:
+            token = self._fetch(scope)
+        return token
+
+    def on_refresh(self, scope, callback):
+        """Call callback(token) whenever the token for scope is refreshed"""
+        with self._lock:
+            self._listeners.setdefault(scope, []).append(callback)
+
+    def _fetch(self, scope):
+        token = self.credential.get_token(*scope.split(" "))
+        with self._lock:
+            self._tokens[scope] = token
+            listeners = list(self._listeners.get(scope, []))
+        # A new expiry may be earlier than the one the refresher is sleeping towards
+        self._wakeup.set()
+        for callback in listeners:
+            try:
+                callback(token)
+            except Exception as e:
+                print(Fore.RED + f"Token refresh listener failed for {scope}: {e}")
+        return token
+
+    def _refresh_loop(self):
+        while not self._stopped:
+            with self._lock:
+                due = {
+                    scope: token.expires_on - self.refresh_margin
+                    for scope, token in self._tokens.items()
+                }
+            now = time.time()
+            for scope, refresh_at in due.items():
+                if refresh_at <= now:
+                    try:
+                        self._fetch(scope)
+                    except Exception as e:
+                        print(Fore.RED + f"Background token refresh failed for {scope}: {e}")
+            with self._lock:
+                upcoming = [t.expires_on - self.refresh_margin for t in self._tokens.values()]
+            # Retry failed refreshes after a short pause rather than spinning
+            timeout = max(5.0, min(upcoming) - time.time()) if upcoming else None
+            self._wakeup.wait(timeout)
+            self._wakeup.clear()
+
+    def close(self):
+        self._stopped = True
+        self._wakeup.set()
+
+
+class AsyncTokenAdapter:
+    """Async credential view over a CachedTokenProvider for azure.cosmos.aio clients"""
+
+    def __init__(self, provider):
+        self.provider = provider
+
+    async def get_token(self, *scopes, **kwargs):
+        return self.provider.get_token(*scopes, **kwargs)
+
+    async def close(self):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+
+class RotatingGremlinClient:
+    """Gremlin client whose bearer-token password follows the token provider.
+
+    On refresh a new client is built with the new token and new requests go to it;
+    the old client keeps its in-flight requests and is closed once they complete.
+    """
+
+    def __init__(self, client_factory, token_provider, scope):
+        self._factory = client_factory
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._client = self._factory(f"Bearer {token_provider.get_token(scope).token}")
+        self._in_flight[id(self._client)] = 0
+        token_provider.on_refresh(scope, self._rotate)
+
+    def _rotate(self, token):
+        # Connect the replacement before swapping so submitters never wait on it
+        replacement = self._factory(f"Bearer {token.token}")
+        with self._lock:
+            retired = self._client
+            self._client = replacement
+            self._in_flight[id(replacement)] = 0
+        threading.Thread(target=self._retire, args=(retired,), daemon=True).start()
+
+    def _retire(self, retired):
+        deadline = time.monotonic() + GREMLIN_RETIRE_TIMEOUT
+        while self._in_flight.get(id(retired)) and time.monotonic() < deadline:
+            time.sleep(0.1)
+        retired.close()
+        with self._lock:
+            self._in_flight.pop(id(retired), None)
+
+    def _finished(self, key):
+        with self._lock:
+            if key in self._in_flight:
+                self._in_flight[key] -= 1
+
+    def submit_async(self, message, bindings=None, request_options=None):
+        with self._lock:
+            current = self._client
+            key = id(current)
+            self._in_flight[key] += 1
+        try:
+            future = current.submit_async(message, bindings=bindings, request_options=request_options)
+        except Exception:
+            self._finished(key)
+            raise
+
+        def track(f):
+            # The request stays in flight until its result stream is complete
+            if f.exception() is not None:
+                self._finished(key)
+            else:
+                f.result().done.add_done_callback(lambda _: self._finished(key))
+
+        future.add_done_callback(track)
+        return future
+
+    def submitAsync(self, message, bindings=None, request_options=None):
+        return self.submit_async(message, bindings, request_options)
+
+    def submit(self, message, bindings=None, request_options=None):
+        return self.submit_async(message, bindings=bindings, request_options=request_options).result()
+
+    def close(self):
+        with self._lock:
+            self._client.close()